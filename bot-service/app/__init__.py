@@ -0,0 +1,4 @@
+import time
+
+# Start of the startup report (app.startup), taken on the first app import
+STARTED = time.perf_counter()
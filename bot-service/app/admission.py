@@ -0,0 +1,150 @@
+"""Admission control and per-user fair queuing for LLM calls."""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted; maps to HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bound the number of concurrent LLM calls.
+
+    Calls over ``max_concurrency`` wait in a bounded queue that is served
+    round-robin across keys (telegram ids), so one busy user cannot starve
+    the others. Calls are rejected right away when the queue, or the key's
+    share of it, is full, and after waiting ``queue_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        max_queue_per_key: int,
+        queue_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.active = 0
+        self.queued = 0
+        # Keys in round-robin order, each with its waiters in arrival order
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Moving average of how long a slot is held, used for Retry-After
+        self._hold_avg = 1.0
+
+    @asynccontextmanager
+    async def admit(self, key: str) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of the block."""
+        await self._acquire(key)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self._hold_avg += 0.1 * (self.clock() - started - self._hold_avg)
+            self._release()
+
+    async def _acquire(self, key: str) -> None:
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            self._record_wait(0.0)
+            return
+
+        waiters = self._waiters.get(key)
+        if self.queued >= self.max_queue:
+            self._reject("Too many pending requests")
+        if waiters and len(waiters) >= self.max_queue_per_key:
+            self._reject("Too many pending requests for this user")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        self.queued += 1
+        queued_at = self.clock()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                self._forget(key, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected(
+                    "Timed out waiting for analysis capacity", self._retry_after()
+                )
+            raise
+        self._record_wait(self.clock() - queued_at)
+
+    def _release(self) -> None:
+        """Hand the slot to the next waiter in round-robin order, or free it."""
+        while self._waiters:
+            key, waiters = next(iter(self._waiters.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            self.queued -= 1
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _forget(self, key: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiters.get(key)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self._waiters[key]
+
+    def _reject(self, reason: str) -> None:
+        self.rejected += 1
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain."""
+        drain = self._hold_avg * (self.queued + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(drain))
+
+    def _record_wait(self, waited: float) -> None:
+        self.admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_avg": (
+                round(self._wait_total / self.admitted, 4) if self.admitted else 0.0
+            ),
+            "wait_max": round(self._wait_max, 4),
+        }
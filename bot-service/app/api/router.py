@@ -1,8 +1,18 @@
+from typing import Annotated, Any, Dict
+
+from fastapi import Depends, HTTPException, Request, Response
 from fastapi.routing import APIRouter
 
-from app.db import check_db_health
-from app.models.healthcheck import HealthcheckResponse
+from app.api.v1.dependencies import get_analyzer
+from app.auth import get_api_key
+from app.circuit_breaker import CircuitState
+from app.db import check_db_health, pool_stats, pool_telemetry
+from app.expense_analyzer import ExpenseAnalyzer
+from app.metrics import CONTENT_TYPE, registry
+from app.models.healthcheck import HealthcheckResponse, HealthStatus
 from app.settings import settings
+from app.startup import startup
+from app.user_cache import user_cache
 
 from .v1 import router as v1_router
 
@@ -11,14 +21,43 @@ router.include_router(v1_router)
 
 
 @router.get("/health")
-async def health_check() -> HealthcheckResponse:
+async def health_check(request: Request) -> HealthcheckResponse:
     """Health check endpoint."""
-    db_healthy = check_db_health()
+    db_healthy = await check_db_health()
+    analyzer = getattr(request.app.state, "expense_analyzer", None)
+    breaker = getattr(analyzer, "breaker", None)
+    llm_circuit = breaker.state if breaker else None
 
+    status = HealthStatus.HEALTHY if db_healthy else HealthStatus.UNHEALTHY
+    if db_healthy and llm_circuit not in (None, CircuitState.CLOSED):
+        status = HealthStatus.DEGRADED
     return HealthcheckResponse(
-        status="healthy" if db_healthy else "unhealthy",
+        status=status,
         service=settings.app_name,
         version=settings.version,
         database="connected" if db_healthy else "disconnected",
         expense_categories=settings.expense_categories,
+        llm_circuit=llm_circuit,
     )
+
+
+@router.get("/stats")
+async def analyzer_stats(
+    analyzer: Annotated[ExpenseAnalyzer, Depends(get_analyzer)],
+    api_key: str = Depends(get_api_key),
+) -> Dict[str, Dict[str, Any]]:
+    """Runtime counters of the analyzer, user lookup cache and DB pool, and startup."""
+    return {
+        **analyzer.stats(),
+        "user_cache": user_cache.stats(),
+        "db_pool": {**pool_telemetry(), **pool_stats()},
+        "startup": startup.as_dict(),
+    }
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Metrics in the Prometheus text format."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
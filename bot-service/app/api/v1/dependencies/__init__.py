@@ -1,24 +1,58 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import Depends, HTTPException, Request
-from sqlmodel import Session, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db import get_session
 from app.expense_analyzer import ExpenseAnalyzer
+from app.jobs import ExpenseJobWorker
 from app.models.users import Users
+from app.tracing import span
+from app.user_cache import user_cache
 
 
 async def validate_telegram_id(
-    telegram_id: str, session: Annotated[Session, Depends(get_session)]
+    telegram_id: str, session: Annotated[AsyncSession, Depends(get_session)]
 ) -> Users:
     """
     Validate Telegram ID.
     """
-    user = session.exec(select(Users).where(Users.telegram_id == telegram_id)).first()
+    with span("validate_telegram_id"):
+        user = await user_cache.lookup(
+            telegram_id, lambda: _select_user(session, telegram_id)
+        )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+async def find_user(
+    telegram_id: str, session_maker: async_sessionmaker[AsyncSession]
+) -> Optional[Users]:
+    """
+    Look up a user on a short-lived session, returning its connection to the
+    pool as soon as the query is done.
+    """
+
+    async def load() -> Optional[Users]:
+        async with session_maker() as session:
+            return await _select_user(session, telegram_id)
+
+    with span("find_user"):
+        return await user_cache.lookup(telegram_id, load)
+
+
+async def _select_user(session: AsyncSession, telegram_id: str) -> Optional[Users]:
+    return (
+        await session.exec(select(Users).where(Users.telegram_id == telegram_id))
+    ).first()
+
+
 def get_analyzer(request: Request) -> ExpenseAnalyzer:
     return request.app.state.expense_analyzer
+
+
+def get_job_worker(request: Request) -> Optional[ExpenseJobWorker]:
+    return getattr(request.app.state, "expense_job_worker", None)
@@ -1,37 +1,109 @@
 import logging
-from typing import Annotated, Sequence
+import time
+from datetime import date, datetime
+from typing import Annotated, Optional, Sequence
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.routing import APIRouter
-from sqlmodel import Session, select
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.v1.dependencies import get_analyzer, validate_telegram_id
+from app.admission import AdmissionRejected
+from app.api.v1.dependencies import (
+    find_user,
+    get_analyzer,
+    get_job_worker,
+    validate_telegram_id,
+)
 from app.auth import get_api_key
-from app.db import get_session
+from app.db import get_session, get_session_maker
 from app.expense_analyzer import ExpenseAnalyzer
-from app.models.expenses import Expenses
-from app.models.messages import MessageRequest
+from app.export import MEDIA_TYPES, ExportFormat, stream_expenses
+from app.jobs import ExpenseJobWorker, enqueue_expense_job
+from app.models.expense_imports import ExpenseImportResponse, StatementColumns
+from app.models.expense_jobs import ExpenseJobAccepted, JobStatus
+from app.models.expense_rollups import ExpenseSummary, SummaryGroupBy
+from app.models.expenses import (
+    BatchExpenseItem,
+    BatchExpenseResponse,
+    BatchItemStatus,
+    Expenses,
+)
+from app.models.messages import BatchMessageRequest, MessageRequest
 from app.models.users import Users
+from app.pagination import decode_cursor, encode_cursor, to_naive_utc
+from app.rollups import add_to_rollups, ensure_rollups, summarize
+from app.settings import settings
+from app.statement_import import (
+    ImportConflict,
+    InvalidStatement,
+    StatementImporter,
+    start_import,
+)
+from app.tracing import span
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
 logger = logging.getLogger(__name__)
 
 
-@router.post("/{telegram_id}")
+def _too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+@router.post(
+    "/{telegram_id}",
+    responses={202: {"model": ExpenseJobAccepted, "description": "Job queued"}},
+)
 async def add_expense_to_user(
-    user: Annotated[Users, Depends(validate_telegram_id)],
+    telegram_id: str,
     payload: MessageRequest,
     analyzer: Annotated[ExpenseAnalyzer, Depends(get_analyzer)],
-    session: Annotated[Session, Depends(get_session)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(get_session_maker)
+    ],
+    worker: Annotated[Optional[ExpenseJobWorker], Depends(get_job_worker)],
+    async_job: Annotated[
+        bool,
+        Query(
+            alias="async",
+            description="Queue the message and answer 202 with a job id instead "
+            "of waiting for the analysis",
+        ),
+    ] = False,
     api_key: str = Depends(get_api_key),
 ) -> Expenses:
     """
     Add expense to user.
     """
+    # Before the analysis, so unknown users never reach the LLM
+    user = await find_user(telegram_id, session_maker)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if async_job:
+        job = await enqueue_expense_job(
+            session_maker, user.id, telegram_id, payload.message
+        )
+        if worker:
+            worker.notify()
+        return JSONResponse(  # type: ignore
+            status_code=202,
+            content=ExpenseJobAccepted(
+                job_id=job.id, status=JobStatus.PENDING
+            ).model_dump(),
+            headers={"Location": f"/v1/jobs/{job.id}"},
+        )
+
     # Process the message
     try:
-        result = await analyzer.analyze_message(payload.message)
+        result = await analyzer.analyze_message(payload.message, telegram_id)
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
     except Exception as e:
         logger.error(f"Error in expense_analyzer.analyze_message: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -39,20 +111,220 @@ async def add_expense_to_user(
         if not result:
             raise HTTPException(status_code=400, detail="Invalid message")
         new_expense = Expenses(user_id=user.id, **result)
-        session.add(new_expense)
-        session.commit()
-        session.refresh(new_expense)
+        with span("store_expense"):
+            async with session_maker() as session:
+                session.add(new_expense)
+                await add_to_rollups(session, user.id, [new_expense])
+                await session.commit()
+                await session.refresh(new_expense)
         return new_expense
 
 
+@router.post("/{telegram_id}/batch")
+async def add_expenses_batch_to_user(
+    telegram_id: str,
+    payload: BatchMessageRequest,
+    analyzer: Annotated[ExpenseAnalyzer, Depends(get_analyzer)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(get_session_maker)
+    ],
+    api_key: str = Depends(get_api_key),
+) -> BatchExpenseResponse:
+    """
+    Add several expenses to user, analyzing the messages in packed LLM calls
+    and inserting every accepted expense in a single transaction.
+    """
+    user = await find_user(telegram_id, session_maker)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        results = await analyzer.analyze_messages(payload.messages, telegram_id)
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        logger.error(f"Error in expense_analyzer.analyze_messages: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    new_expenses = {
+        index: Expenses(user_id=user.id, **result)
+        for index, result in enumerate(results)
+        if result
+    }
+    # Nothing accepted, nothing to write: no pooled connection needed
+    if new_expenses:
+        async with session_maker() as session:
+            session.add_all(new_expenses.values())
+            # Flush to get the generated ids in one round trip instead of a
+            # refresh per row
+            await session.flush()
+            await add_to_rollups(session, user.id, list(new_expenses.values()))
+            await session.commit()
+
+    items = [
+        (
+            BatchExpenseItem(
+                index=index,
+                status=BatchItemStatus.CREATED,
+                expense=Expenses.model_validate(new_expenses[index]),
+            )
+            if index in new_expenses
+            else BatchExpenseItem(
+                index=index, status=BatchItemStatus.REJECTED, detail="Invalid message"
+            )
+        )
+        for index in range(len(results))
+    ]
+    return BatchExpenseResponse(
+        created=len(new_expenses),
+        rejected=len(results) - len(new_expenses),
+        results=items,
+    )
+
+
+@router.post("/{telegram_id}/import")
+async def import_user_statement(
+    telegram_id: str,
+    request: Request,
+    columns: Annotated[StatementColumns, Depends()],
+    analyzer: Annotated[ExpenseAnalyzer, Depends(get_analyzer)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(get_session_maker)
+    ],
+    import_id: Annotated[
+        Optional[int],
+        Query(description="Resume this import, sending the same file again"),
+    ] = None,
+    api_key: str = Depends(get_api_key),
+) -> ExpenseImportResponse:
+    """
+    Import the expenses of a bank statement CSV sent as the request body.
+
+    The body is parsed as it arrives. Rows are categorized locally when
+    possible and by the LLM in packed batches otherwise, and committed in
+    chunks with the import's progress: a failed import is resumed with its
+    ``import_id`` and the same file, skipping the rows already imported.
+    """
+    user = await find_user(telegram_id, session_maker)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        job = await start_import(session_maker, user.id, columns, import_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Import not found")
+    except ImportConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    importer = StatementImporter(analyzer, session_maker, job, telegram_id)
+    start = time.perf_counter()
+    try:
+        await importer.run(request.stream())
+    except InvalidStatement as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        logger.error(f"Error importing statement {job.id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Import {job.id} failed after {job.rows_done} rows, "
+            "resume it with import_id",
+        )
+    return importer.response(time.perf_counter() - start)
+
+
+@router.get("/{telegram_id}/export")
+async def export_user_expenses(
+    telegram_id: str,
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(get_session_maker)
+    ],
+    format: ExportFormat = ExportFormat.NDJSON,
+    api_key: str = Depends(get_api_key),
+) -> StreamingResponse:
+    """
+    Stream every expense of a user as NDJSON or CSV.
+    """
+    user = await find_user(telegram_id, session_maker)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return StreamingResponse(
+        stream_expenses(session_maker, user.id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="expenses-{telegram_id}.{format.value}"'
+            )
+        },
+    )
+
+
+@router.get("/{telegram_id}/summary")
+async def get_user_expenses_summary(
+    user: Annotated[Users, Depends(validate_telegram_id)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    group_by: SummaryGroupBy = SummaryGroupBy.CATEGORY,
+    start: Annotated[
+        Optional[date], Query(description="Include expenses from this day")
+    ] = None,
+    end: Annotated[
+        Optional[date], Query(description="Include expenses before this day")
+    ] = None,
+    category: Optional[str] = None,
+    api_key: str = Depends(get_api_key),
+) -> ExpenseSummary:
+    """
+    Get user spending totals grouped by category, day, week or month.
+    """
+    await ensure_rollups(session, user.id)
+    return await summarize(session, user.id, group_by, start, end, category)
+
+
 @router.get("/{telegram_id}")
 async def get_user_expenses(
     user: Annotated[Users, Depends(validate_telegram_id)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    response: Response,
+    limit: Annotated[
+        int, Query(ge=1, le=settings.expenses_max_page_size)
+    ] = settings.expenses_page_size,
+    cursor: Optional[str] = None,
+    start: Annotated[
+        Optional[datetime], Query(description="Include expenses created at or after")
+    ] = None,
+    end: Annotated[
+        Optional[datetime], Query(description="Include expenses created before")
+    ] = None,
+    category: Optional[str] = None,
     api_key: str = Depends(get_api_key),
 ) -> Sequence[Expenses]:
     """
-    Get user expenses.
+    Get user expenses, oldest first, one page at a time.
+
+    Pages are keyset-paginated on ``(created_at, id)``. When more expenses
+    are available, the ``X-Next-Cursor`` response header holds the ``cursor``
+    for the next page.
     """
-    expenses = session.exec(select(Expenses).where(Expenses.user_id == user.id)).all()
+    query = select(Expenses).where(Expenses.user_id == user.id)
+    if start:
+        query = query.where(Expenses.created_at >= to_naive_utc(start))
+    if end:
+        query = query.where(Expenses.created_at < to_naive_utc(end))
+    if category:
+        query = query.where(Expenses.category == category)
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(Expenses.created_at, Expenses.id) > after)
+
+    # Fetch one extra row to know whether there is a next page
+    query = query.order_by(Expenses.created_at, Expenses.id).limit(limit + 1)  # type: ignore
+    expenses = (await session.exec(query)).all()
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        last = expenses[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     return expenses
@@ -0,0 +1,36 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException
+from fastapi.routing import APIRouter
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth import get_api_key
+from app.db import get_session
+from app.models.expense_jobs import ExpenseJobResponse, ExpenseJobs
+from app.models.expenses import Expenses
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+async def get_expense_job(
+    job_id: int,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    api_key: str = Depends(get_api_key),
+) -> ExpenseJobResponse:
+    """
+    Get the status of an asynchronous expense job, with its expense once done.
+    """
+    job = await session.get(ExpenseJobs, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    expense = await session.get(Expenses, job.expense_id) if job.expense_id else None
+    return ExpenseJobResponse(
+        id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        expense=expense,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
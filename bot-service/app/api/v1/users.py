@@ -2,30 +2,32 @@ from typing import Sequence
 
 from fastapi import Depends
 from fastapi.routing import APIRouter
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.auth import get_api_key
 from app.db import get_session
 from app.models.users import UserCreate, UserResponse, Users
+from app.user_cache import user_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/", response_model=list[UserResponse])
 async def get_all_users(
-    session: Session = Depends(get_session), api_key: str = Depends(get_api_key)
+    session: AsyncSession = Depends(get_session), api_key: str = Depends(get_api_key)
 ) -> Sequence[Users]:
     """
     Get all users.
     """
-    users = session.exec(select(Users)).all()
+    users = (await session.exec(select(Users))).all()
     return users
 
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user: UserCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     api_key: str = Depends(get_api_key),
 ) -> Users:
     """
@@ -33,6 +35,7 @@ async def create_user(
     """
     created_user = Users(**user.model_dump())
     session.add(created_user)
-    session.commit()
-    session.refresh(created_user)
+    await session.commit()
+    await session.refresh(created_user)
+    user_cache.invalidate(created_user.telegram_id)
     return created_user
@@ -0,0 +1,238 @@
+"""Caching layers for expense analysis results."""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import utcnow
+from app.models.analysis_cache import AnalysisCacheEntries
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache with per-entry TTL and size-based eviction."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DatabaseCacheTier:
+    """Persistent cache tier stored in the ``analysis_cache`` table."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+
+    async def get(self, key: str) -> Any:
+        async with AsyncSession(self.engine) as session:
+            entry = await session.get(AnalysisCacheEntries, key)
+            if entry is None:
+                return MISSING
+            if entry.expires_at <= utcnow():
+                await session.delete(entry)
+                await session.commit()
+                return MISSING
+            return _loads(entry.result)
+
+    async def set(
+        self, key: str, fingerprint: str, value: Optional[Dict], ttl: float
+    ) -> None:
+        async with AsyncSession(self.engine) as session:
+            await session.merge(
+                AnalysisCacheEntries(
+                    key=key,
+                    fingerprint=fingerprint,
+                    result=_dumps(value),
+                    expires_at=utcnow() + timedelta(seconds=ttl),
+                )
+            )
+            await session.commit()
+
+    async def purge(self, fingerprint: str) -> None:
+        """Delete entries written under any other prompt fingerprint."""
+        async with AsyncSession(self.engine) as session:
+            await session.exec(  # type: ignore
+                delete(AnalysisCacheEntries).where(
+                    AnalysisCacheEntries.fingerprint != fingerprint  # type: ignore
+                )
+            )
+            await session.commit()
+
+
+class AnalysisCache:
+    """Two-tier cache of ``ExpenseAnalyzer`` results.
+
+    Keys combine the normalized message with a fingerprint of the system
+    prompt, category set and model, so changing any of them invalidates
+    previous entries. Negative (non-expense) results are cached as well,
+    with their own TTL.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float,
+        db_tier: Optional[DatabaseCacheTier] = None,
+    ):
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_tier = db_tier
+        self.db_hits = 0
+        self.db_errors = 0
+
+    @staticmethod
+    def make_fingerprint(system_prompt: str, categories: list, model: str) -> str:
+        payload = json.dumps([system_prompt, sorted(categories), model])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        return " ".join(message.lower().split())
+
+    def key(self, message: str) -> str:
+        payload = f"{self.fingerprint}\x00{self.normalize(message)}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def update_fingerprint(self, fingerprint: str) -> None:
+        """Switch to a new prompt fingerprint, dropping stale memory entries."""
+        if fingerprint != self.fingerprint:
+            logger.info("Analysis cache fingerprint changed, clearing cache")
+            self.fingerprint = fingerprint
+            self.memory.clear()
+
+    async def purge_stale(self) -> None:
+        """Drop persisted entries written under another prompt fingerprint."""
+        if self.db_tier is None:
+            return
+        try:
+            await self.db_tier.purge(self.fingerprint)
+        except Exception as e:
+            self.db_errors += 1
+            logger.error(f"Analysis cache purge failed: {e}")
+
+    async def get(self, message: str) -> Any:
+        """Return the cached result (possibly None) or ``MISSING``."""
+        key = self.key(message)
+        value = self.memory.get(key)
+        if value is not MISSING or self.db_tier is None:
+            return value
+        try:
+            value = await self.db_tier.get(key)
+        except Exception as e:
+            self.db_errors += 1
+            logger.error(f"Analysis cache database lookup failed: {e}")
+            return MISSING
+        if value is not MISSING:
+            self.db_hits += 1
+            self.memory.set(key, value, ttl=self._ttl_for(value))
+        return value
+
+    async def set(self, message: str, value: Optional[Dict]) -> None:
+        key = self.key(message)
+        ttl = self._ttl_for(value)
+        self.memory.set(key, value, ttl=ttl)
+        if self.db_tier is None:
+            return
+        try:
+            await self.db_tier.set(key, self.fingerprint, value, ttl)
+        except Exception as e:
+            self.db_errors += 1
+            logger.error(f"Analysis cache database write failed: {e}")
+
+    def _ttl_for(self, value: Optional[Dict]) -> float:
+        return self.ttl if value is not None else self.negative_ttl
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        # A memory miss answered by the database tier is still a cache hit
+        stats["db_hits"] = self.db_hits
+        stats["db_errors"] = self.db_errors
+        stats["misses"] = self.memory.misses - self.db_hits
+        lookups = self.memory.hits + self.memory.misses
+        hits = self.memory.hits + self.db_hits
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _dumps(value: Optional[Dict]) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps({**value, "amount": str(value["amount"])})
+
+
+def _loads(raw: Optional[str]) -> Optional[Dict]:
+    if raw is None:
+        return None
+    value = json.loads(raw)
+    value["amount"] = Decimal(value["amount"])
+    return value
@@ -0,0 +1,144 @@
+"""Circuit breaker around calls to the LLM provider."""
+
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Deque, Dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("LLM circuit is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing or slow provider for a while.
+
+    The outcomes of the last ``window`` calls are kept; a call fails when it
+    raises or takes longer than ``slow_call_threshold`` seconds. Once at
+    least ``min_calls`` were seen and the failure rate reaches
+    ``failure_rate_threshold`` the circuit opens, and calls fail right away
+    with ``CircuitOpen`` for ``open_duration`` seconds. Then up to
+    ``half_open_probes`` calls go through at a time: the first success
+    closes the circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float,
+        slow_call_threshold: float,
+        window: int,
+        min_calls: int,
+        open_duration: float,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._state = CircuitState.CLOSED
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.OPEN
+            and self.clock() - self._opened_at >= self.open_duration
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run the block as a provider call, or raise ``CircuitOpen``."""
+        state = self.state
+        if state is CircuitState.OPEN or (
+            state is CircuitState.HALF_OPEN and self._probes >= self.half_open_probes
+        ):
+            self.short_circuited += 1
+            raise CircuitOpen(self._retry_after())
+        probe = state is CircuitState.HALF_OPEN
+        if probe:
+            self._probes += 1
+        started = self.clock()
+        try:
+            yield
+        except Exception:
+            self._record(False, probe)
+            raise
+        finally:
+            if probe:
+                self._probes -= 1
+        self._record(self.clock() - started <= self.slow_call_threshold, probe)
+
+    def _record(self, ok: bool, probe: bool) -> None:
+        if self._state is CircuitState.HALF_OPEN and probe:
+            if ok:
+                logger.info("LLM circuit closed")
+                self._state = CircuitState.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+        if self._state is not CircuitState.CLOSED:
+            # A call started before the circuit opened
+            return
+        self._outcomes.append(ok)
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        logger.warning(
+            f"LLM circuit opened for {self.open_duration}s "
+            f"(failure rate {self.failure_rate:.0%})"
+        )
+        self._state = CircuitState.OPEN
+        self._opened_at = self.clock()
+        self.times_opened += 1
+
+    def _retry_after(self) -> float:
+        if self._state is not CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_duration - self.clock())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_rate": round(self.failure_rate, 4),
+            "calls_in_window": len(self._outcomes),
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_after": round(self._retry_after(), 3),
+        }
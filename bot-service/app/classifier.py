@@ -0,0 +1,523 @@
+"""Expense category classifier learned from stored expenses."""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+import numpy as np
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.expenses import TRUSTED_CATEGORY_SOURCES, Expenses
+from app.models.users import Users
+from app.settings import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class NaiveBayesModel:
+    """
+    Multinomial naive Bayes over hashed tokens.
+
+    Tokens are hashed into ``n_features`` buckets with CRC32, which is stable
+    across processes, so the arrays are the whole model: one row of token
+    counts per category plus the number of examples of each category.
+    ``alpha`` is the additive smoothing; with thousands of buckets the usual
+    1.0 would drown the few counts of a short description.
+    """
+
+    def __init__(self, categories: Iterable[str], n_features: int, alpha: float = 0.1):
+        self.categories: List[str] = []
+        self.n_features = n_features
+        self.alpha = alpha
+        self.feature_counts = self._new_counts(0)
+        self.feature_totals = np.zeros(0, dtype=np.float32)
+        self.class_counts = np.zeros(0, dtype=np.float32)
+        for category in categories:
+            self._category_index(category)
+
+    @property
+    def examples(self) -> int:
+        return int(self.class_counts.sum())
+
+    def features(self, tokens: List[str]) -> np.ndarray:
+        return np.fromiter(
+            (zlib.crc32(token.encode()) % self.n_features for token in tokens),
+            dtype=np.int64,
+            count=len(tokens),
+        )
+
+    def _category_index(self, category: str) -> int:
+        if category in self.categories:
+            return self.categories.index(category)
+        self.categories.append(category)
+        self.feature_counts = np.vstack([self.feature_counts, self._new_counts(1)])
+        self.feature_totals = np.append(self.feature_totals, np.float32(0))
+        self.class_counts = np.append(self.class_counts, np.float32(0))
+        return len(self.categories) - 1
+
+    def _new_counts(self, rows: int) -> np.ndarray:
+        return np.zeros((rows, self.n_features), dtype=np.float32)
+
+    def _columns(self, features: np.ndarray) -> np.ndarray:
+        """Columns of ``feature_counts`` to add the counts of ``features`` to."""
+        return features
+
+    def _counts(self, features: np.ndarray) -> np.ndarray:
+        """Counts of ``features`` per category."""
+        return self.feature_counts[:, features]
+
+    def partial_fit(self, tokens: List[str], category: str) -> None:
+        index = self._category_index(category)
+        # Before indexing, the sparse model may grow ``feature_counts``
+        columns = self._columns(self.features(tokens))
+        np.add.at(self.feature_counts[index], columns, 1)
+        self.feature_totals[index] += len(tokens)
+        self.class_counts[index] += 1
+
+    def predict_proba(self, tokens: List[str]) -> np.ndarray:
+        """Posterior probability of each category, in ``categories`` order."""
+        features = self.features(tokens)
+        log_prior = np.log(self.class_counts + self.alpha)
+        log_totals = np.log(self.feature_totals + self.alpha * self.n_features)
+        log_likelihood = (
+            np.log(self._counts(features) + self.alpha).sum(axis=1)
+            - len(features) * log_totals
+        )
+        joint = log_prior + log_likelihood
+        joint -= joint.max()
+        proba = np.exp(joint)
+        return proba / proba.sum()
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}_feature_counts": self.feature_counts,
+            f"{prefix}_class_counts": self.class_counts,
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, categories: List[str], arrays: Any, prefix: str
+    ) -> "NaiveBayesModel":
+        feature_counts = arrays[f"{prefix}_feature_counts"]
+        model = cls([], n_features=feature_counts.shape[1])
+        model.categories = list(categories)
+        model.feature_counts = feature_counts.astype(np.float32)
+        model.feature_totals = model.feature_counts.sum(axis=1)
+        model.class_counts = arrays[f"{prefix}_class_counts"].astype(np.float32)
+        return model
+
+
+class SparseNaiveBayesModel(NaiveBayesModel):
+    """
+    ``NaiveBayesModel`` keeping columns only for the buckets it has seen,
+    in ``feature_ids`` order. Per-user models see a few hundred tokens, so
+    this takes a few KB per user instead of ``n_features`` counts for every
+    category.
+    """
+
+    def __init__(self, categories: Iterable[str], n_features: int, alpha: float = 0.1):
+        self.feature_ids = np.zeros(0, dtype=np.int64)
+        super().__init__(categories, n_features, alpha)
+
+    def _new_counts(self, rows: int) -> np.ndarray:
+        return np.zeros((rows, len(self.feature_ids)), dtype=np.float32)
+
+    def _columns(self, features: np.ndarray) -> np.ndarray:
+        new = np.setdiff1d(features, self.feature_ids)
+        if len(new):
+            feature_ids = np.union1d(self.feature_ids, new)
+            feature_counts = np.zeros(
+                (len(self.categories), len(feature_ids)), dtype=np.float32
+            )
+            feature_counts[:, np.searchsorted(feature_ids, self.feature_ids)] = (
+                self.feature_counts
+            )
+            self.feature_ids, self.feature_counts = feature_ids, feature_counts
+        return np.searchsorted(self.feature_ids, features)
+
+    def _counts(self, features: np.ndarray) -> np.ndarray:
+        columns = np.searchsorted(self.feature_ids, features)
+        seen = columns < len(self.feature_ids)
+        seen[seen] = self.feature_ids[columns[seen]] == features[seen]
+        counts = np.zeros((len(self.categories), len(features)), dtype=np.float32)
+        counts[:, seen] = self.feature_counts[:, columns[seen]]
+        return counts
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            **super().arrays(prefix),
+            f"{prefix}_feature_ids": self.feature_ids,
+            f"{prefix}_n_features": np.array(self.n_features),
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, categories: List[str], arrays: Any, prefix: str
+    ) -> "SparseNaiveBayesModel":
+        feature_counts = arrays[f"{prefix}_feature_counts"]
+        if f"{prefix}_feature_ids" in arrays:
+            n_features = int(arrays[f"{prefix}_n_features"])
+            feature_ids = arrays[f"{prefix}_feature_ids"].astype(np.int64)
+        else:
+            # Saved by a dense model
+            n_features = feature_counts.shape[1]
+            feature_ids = np.flatnonzero(feature_counts.any(axis=0))
+            feature_counts = feature_counts[:, feature_ids]
+        model = cls([], n_features=n_features)
+        model.categories = list(categories)
+        model.feature_ids = feature_ids
+        model.feature_counts = feature_counts.astype(np.float32)
+        model.feature_totals = model.feature_counts.sum(axis=1)
+        model.class_counts = arrays[f"{prefix}_class_counts"].astype(np.float32)
+        return model
+
+
+class Prediction(NamedTuple):
+    category: str
+    confidence: float
+    scope: str  # "user" or "global"
+
+
+class ClassifierStats:
+    """Prediction latency, LLM agreement and test-then-train accuracy."""
+
+    def __init__(self):
+        self.predictions = 0
+        self.confident = 0
+        self.latency_total = 0.0
+        self.validated = 0
+        self.disagreements = 0
+        # Every training example is predicted before being learned
+        self.evaluated = 0
+        self.correct = 0
+        self.evaluated_confident = 0
+        self.correct_confident = 0
+        self.trainings = 0
+        self.last_training_seconds = 0.0
+        self.user_models_evicted = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        def rate(part: int, total: int) -> float:
+            return round(part / total, 4) if total else 0.0
+
+        return {
+            "predictions": self.predictions,
+            "confident": self.confident,
+            "latency_avg_us": (
+                round(self.latency_total / self.predictions * 1e6, 1)
+                if self.predictions
+                else 0.0
+            ),
+            "validated": self.validated,
+            "llm_agreement": rate(self.validated - self.disagreements, self.validated),
+            "accuracy": rate(self.correct, self.evaluated),
+            "confident_accuracy": rate(
+                self.correct_confident, self.evaluated_confident
+            ),
+            "confident_coverage": rate(self.evaluated_confident, self.evaluated),
+            "trainings": self.trainings,
+            "last_training_seconds": round(self.last_training_seconds, 3),
+            "user_models_evicted": self.user_models_evicted,
+        }
+
+
+class CategoryClassifier:
+    """
+    Global and per-user naive Bayes models over expense descriptions.
+
+    A user's own model answers once it has seen ``min_user_examples`` of
+    their expenses; otherwise, or when it is not confident, the global model
+    does once it has seen ``min_global_examples``. Only predictions with a
+    confidence of at least ``threshold`` are used to skip the LLM. Beyond
+    ``max_user_models`` users, the least recently trained model is evicted.
+
+    Ids are not committed in order, so training rescans the last
+    ``train_overlap`` ids before the last one learned and skips those it
+    already learned.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.classifier_threshold,
+        min_user_examples: int = settings.classifier_min_user_examples,
+        min_global_examples: int = settings.classifier_min_global_examples,
+        global_features: int = settings.classifier_global_features,
+        user_features: int = settings.classifier_user_features,
+        max_user_models: int = settings.classifier_max_user_models,
+        train_overlap: int = settings.classifier_train_overlap,
+    ):
+        self.threshold = threshold
+        self.min_user_examples = min_user_examples
+        self.min_global_examples = min_global_examples
+        self.user_features = user_features
+        self.max_user_models = max_user_models
+        self.train_overlap = train_overlap
+        self.global_model = NaiveBayesModel(
+            settings.expense_categories, global_features
+        )
+        # Least recently trained first
+        self.user_models: "OrderedDict[str, SparseNaiveBayesModel]" = OrderedDict()
+        # Id of the last expense learned, and the ids learned within
+        # train_overlap of it
+        self.trained_through = 0
+        self.recent_ids: Set[int] = set()
+        self.stats = ClassifierStats()
+
+    def predict(
+        self, telegram_id: Optional[str], description: str
+    ) -> Optional[Prediction]:
+        started = time.perf_counter()
+        prediction = self._predict(telegram_id, tokenize(description))
+        self.stats.predictions += 1
+        self.stats.latency_total += time.perf_counter() - started
+        return prediction
+
+    def _predict(
+        self, telegram_id: Optional[str], tokens: List[str]
+    ) -> Optional[Prediction]:
+        if not tokens:
+            return None
+        prediction = None
+        user_model = self.user_models.get(telegram_id) if telegram_id else None
+        if user_model and user_model.examples >= self.min_user_examples:
+            prediction = self._best(user_model, tokens, "user")
+            if prediction.confidence >= self.threshold:
+                return prediction
+        if self.global_model.examples >= self.min_global_examples:
+            global_prediction = self._best(self.global_model, tokens, "global")
+            if (
+                prediction is None
+                or global_prediction.confidence > prediction.confidence
+            ):
+                prediction = global_prediction
+        return prediction
+
+    @staticmethod
+    def _best(model: NaiveBayesModel, tokens: List[str], scope: str) -> Prediction:
+        proba = model.predict_proba(tokens)
+        index = int(proba.argmax())
+        return Prediction(model.categories[index], float(proba[index]), scope)
+
+    def confident_category(
+        self, telegram_id: Optional[str], description: str
+    ) -> Optional[str]:
+        """The predicted category if confident and still configured, else None."""
+        prediction = self.predict(telegram_id, description)
+        if (
+            prediction is None
+            or prediction.confidence < self.threshold
+            or prediction.category not in settings.expense_categories
+        ):
+            return None
+        self.stats.confident += 1
+        return prediction.category
+
+    def validate(self, telegram_id: Optional[str], expense: Dict[str, Any]) -> bool:
+        """Check an LLM answer against a confident prediction; False if they differ."""
+        category = self.confident_category(telegram_id, expense["description"])
+        if category is None:
+            return True
+        self.stats.validated += 1
+        if category != expense["category"]:
+            self.stats.disagreements += 1
+            logger.info(
+                f"Classifier predicted {category} for '{expense['description']}', "
+                f"the LLM answered {expense['category']}"
+            )
+            return False
+        return True
+
+    def learn(self, telegram_id: str, description: str, category: str) -> None:
+        tokens = tokenize(description)
+        if not tokens:
+            return
+        prediction = self._predict(telegram_id, tokens)
+        if prediction is not None:
+            self.stats.evaluated += 1
+            self.stats.correct += prediction.category == category
+            if prediction.confidence >= self.threshold:
+                self.stats.evaluated_confident += 1
+                self.stats.correct_confident += prediction.category == category
+
+        self.global_model.partial_fit(tokens, category)
+        user_model = self.user_models.get(telegram_id)
+        if user_model is not None:
+            self.user_models.move_to_end(telegram_id)
+        elif self.max_user_models > 0:
+            if len(self.user_models) >= self.max_user_models:
+                self.user_models.popitem(last=False)
+                self.stats.user_models_evicted += 1
+            user_model = self.user_models[telegram_id] = SparseNaiveBayesModel(
+                [], self.user_features
+            )
+        if user_model is not None:
+            user_model.partial_fit(tokens, category)
+
+    async def train(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int = settings.export_batch_size,
+    ) -> int:
+        """Learn the expenses stored since the last training; return how many."""
+        started = time.perf_counter()
+        query = (
+            select(
+                Expenses.id,
+                Users.telegram_id,
+                Expenses.description,
+                Expenses.category,
+            )
+            .join(Users, Users.id == Expenses.user_id)  # type: ignore
+            .where(
+                Expenses.id > self.trained_through - self.train_overlap,  # type: ignore
+                # Not the fast path's, the classifier's own or degraded guesses
+                Expenses.category_source.in_(TRUSTED_CATEGORY_SOURCES),  # type: ignore
+            )
+            .order_by(Expenses.id)  # type: ignore
+            .execution_options(yield_per=batch_size)
+        )
+        learned = 0
+        async with session_maker() as session:
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                for row in rows:
+                    if row.id in self.recent_ids:
+                        continue
+                    self.learn(row.telegram_id, row.description, row.category)
+                    self.recent_ids.add(row.id)
+                    self.trained_through = max(self.trained_through, row.id)
+                    learned += 1
+                # Let request handlers run between batches
+                await asyncio.sleep(0)
+        horizon = self.trained_through - self.train_overlap
+        self.recent_ids = {id_ for id_ in self.recent_ids if id_ > horizon}
+        self.stats.trainings += 1
+        self.stats.last_training_seconds = time.perf_counter() - started
+        return learned
+
+    def save(self, path: str) -> None:
+        """
+        Write every model to one compressed ``.npz`` file. Blocking, run it
+        in a thread.
+        """
+        users = list(self.user_models.items())
+        meta = {
+            "trained_through": self.trained_through,
+            "recent_ids": sorted(self.recent_ids),
+            "global": self.global_model.categories,
+            "users": [[telegram_id, model.categories] for telegram_id, model in users],
+        }
+        arrays = self.global_model.arrays("global")
+        for index, (_, model) in enumerate(users):
+            arrays.update(model.arrays(f"user{index}"))
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, meta=np.frombuffer(json.dumps(meta).encode(), np.uint8), **arrays
+        )
+        # Replace the previous file atomically
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporary, path)
+
+    def load(self, path: str) -> None:
+        with np.load(path) as arrays:
+            meta = json.loads(arrays["meta"].tobytes())
+            self.global_model = NaiveBayesModel.from_arrays(
+                meta["global"], arrays, "global"
+            )
+            self.user_models = OrderedDict(
+                (
+                    telegram_id,
+                    SparseNaiveBayesModel.from_arrays(
+                        categories, arrays, f"user{index}"
+                    ),
+                )
+                for index, (telegram_id, categories) in enumerate(meta["users"])
+            )
+        self.trained_through = meta["trained_through"]
+        # Files written before the overlap was kept learned every id up to
+        # trained_through
+        self.recent_ids = set(
+            meta.get(
+                "recent_ids",
+                range(
+                    max(self.trained_through - self.train_overlap, 0) + 1,
+                    self.trained_through + 1,
+                ),
+            )
+        )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "examples": self.global_model.examples,
+            "user_models": len(self.user_models),
+            "trained_through": self.trained_through,
+        }
+
+
+class ClassifierTrainer:
+    """Periodically train the classifier on newly stored expenses."""
+
+    def __init__(
+        self,
+        classifier: CategoryClassifier,
+        session_maker: async_sessionmaker[AsyncSession],
+        interval: float = settings.classifier_retrain_interval,
+        model_path: Optional[str] = settings.classifier_model_path,
+    ):
+        self.classifier = classifier
+        self.session_maker = session_maker
+        self.interval = interval
+        self.model_path = model_path
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="classifier-trainer")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _load(self) -> None:
+        if self.model_path and os.path.exists(self.model_path):
+            try:
+                await asyncio.to_thread(self.classifier.load, self.model_path)
+            except Exception as e:
+                logger.error(f"Could not load classifier model: {e}")
+
+    async def _run(self) -> None:
+        await self._load()
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Classifier training error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        learned = await self.classifier.train(self.session_maker)
+        if learned:
+            logger.info(f"Classifier learned {learned} expenses")
+            if self.model_path:
+                await asyncio.to_thread(self.classifier.save, self.model_path)
+        return learned
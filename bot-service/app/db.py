@@ -1,25 +1,236 @@
 import logging
+import time
+import uuid
 from datetime import datetime, timezone
-from typing import Generator
+from typing import Any, AsyncGenerator, Dict, NamedTuple, Optional
 
-from sqlalchemy import QueuePool, create_engine, event, text
-from sqlmodel import Field, Session, SQLModel
+from sqlalchemy import (
+    AsyncAdaptedQueuePool,
+    NullPool,
+    QueuePool,
+    event,
+    exc,
+    make_url,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlmodel import Field, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.settings import settings
+from app import metrics, tracing
+from app.settings import Settings, settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Database engine with connection pooling
-engine = create_engine(
-    settings.database_url,
-    poolclass=QueuePool,
-    pool_size=20,
-    max_overflow=30,
-    pool_pre_ping=True,
-    pool_recycle=3600,
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(database_url: str) -> str:
+    """Translate a sync DATABASE_URL into the URL of its async driver."""
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class PoolProfile(NamedTuple):
+    """
+    Connection pool configuration. ``pre_ping`` is ``always`` (a round trip
+    on every checkout), ``idle`` (only for connections unused for
+    ``pre_ping_idle`` seconds) or ``never``. ``null_pool`` opens a connection
+    per checkout and disables server-side prepared statements, for
+    transaction poolers such as PgBouncer that do the pooling themselves.
+    """
+
+    pool_size: int = 20
+    max_overflow: int = 30
+    pool_timeout: float = 30.0  # seconds
+    pool_recycle: int = 3600  # seconds
+    pre_ping: str = "always"
+    pre_ping_idle: float = 30.0  # seconds
+    null_pool: bool = False
+
+
+POOL_PROFILES: Dict[str, PoolProfile] = {
+    # Previous hard-coded pool
+    "default": PoolProfile(),
+    # Single worker against a local database that does not drop connections
+    "dev": PoolProfile(pool_size=5, max_overflow=5, pool_timeout=10, pre_ping="never"),
+    # Several replicas sharing max_connections, behind a network that may
+    # drop idle connections
+    "production": PoolProfile(
+        pool_size=10,
+        max_overflow=10,
+        pool_timeout=10,
+        pool_recycle=1800,
+        pre_ping="idle",
+    ),
+    "pgbouncer": PoolProfile(pre_ping="never", null_pool=True),
+}
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+
+def pool_profile(settings: Settings) -> PoolProfile:
+    """``DB_POOL_PROFILE`` with the ``DB_POOL_*`` settings that are set applied."""
+    if settings.db_pool_profile not in POOL_PROFILES:
+        raise ValueError(f"Unknown database pool profile: {settings.db_pool_profile}")
+    overrides = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pre_ping": settings.db_pool_pre_ping,
+        "pre_ping_idle": settings.db_pool_pre_ping_idle,
+    }
+    profile = POOL_PROFILES[settings.db_pool_profile]._replace(
+        **{name: value for name, value in overrides.items() if value is not None}
+    )
+    if profile.pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"Unknown pre-ping strategy: {profile.pre_ping}")
+    return profile
+
+
+def engine_options(profile: PoolProfile, database_url: str) -> Dict[str, Any]:
+    """Keyword arguments of ``create_async_engine`` for a pool profile."""
+    if profile.null_pool:
+        options: Dict[str, Any] = {"poolclass": TimedNullPool}
+        if make_url(async_database_url(database_url)).drivername.endswith("asyncpg"):
+            # Transaction poolers hand each transaction to any server
+            # connection, where statements prepared by another one are unknown
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+    else:
+        options = {
+            "poolclass": TimedQueuePool,
+            "pool_size": profile.pool_size,
+            "max_overflow": profile.max_overflow,
+            "pool_timeout": profile.pool_timeout,
+            "pool_recycle": profile.pool_recycle,
+        }
+    options["pool_pre_ping"] = profile.pre_ping == "always"
+    return options
+
+
+class _TimedCheckout:
+    """Observes how long each checkout takes, and counts timeouts."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        span = tracing.start_span("db.checkout")
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            metrics.DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            metrics.DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+            if span:
+                span.finish()
+
+
+class TimedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """Queue pool counting the checkouts that wait for a free connection."""
+
+    def _do_get(self):
+        # Neither an idle connection nor room for an overflow one
+        if (
+            self._pool.empty()
+            and self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+        ):
+            metrics.DB_POOL_WAITS.inc()
+        return super()._do_get()
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    """Pool opening a connection per checkout, timed like ``TimedQueuePool``."""
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Observe the execution time of every statement run by ``engine``, and
+    record it as a span when the statement runs within a trace.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, *args):
+        span = tracing.start_span("sql", statement=statement[:200])
+        conn.info.setdefault("queries", []).append((time.perf_counter(), span))
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, *args):
+        start, span = conn.info["queries"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper()
+        metrics.DB_QUERY_SECONDS.labels(kind).observe(time.perf_counter() - start)
+        if span:
+            span.finish()
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        queries = context.connection.info.get("queries") if context.connection else None
+        if queries:
+            _, span = queries.pop()
+            if span:
+                span.error = type(context.original_exception).__name__
+                span.finish()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        metrics.DB_POOL_CONNECTS.inc()
+
+
+def ping_idle_connections(engine: AsyncEngine, idle: float) -> None:
+    """
+    Ping connections unused for ``idle`` seconds when they are checked out,
+    replacing those that fail, instead of pinging on every checkout.
+    """
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            metrics.DB_POOL_PRE_PINGS.labels("failed").inc()
+            # The pool invalidates the connection and checks out another one
+            raise exc.DisconnectionError(f"Idle connection failed its ping: {e}")
+        metrics.DB_POOL_PRE_PINGS.labels("ok").inc()
+
+
+POOL_PROFILE = pool_profile(settings)
+
+# Async database engine with connection pooling
+engine: AsyncEngine = create_async_engine(
+    async_database_url(settings.database_url),
+    **engine_options(POOL_PROFILE, settings.database_url),
     echo=settings.log_level == "DEBUG",
 )
+instrument_engine(engine)
+if POOL_PROFILE.pre_ping == "idle" and not POOL_PROFILE.null_pool:
+    ping_idle_connections(engine, POOL_PROFILE.pre_ping_idle)
+
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime.
+
+    Audit columns are ``TIMESTAMP WITHOUT TIME ZONE``; asyncpg refuses to bind
+    timezone-aware values to them, so timestamps are stored as naive UTC.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class SQLBaseModel(SQLModel):
@@ -27,32 +238,87 @@ class SQLBaseModel(SQLModel):
 
 
 class SQLBaseModelAudit(SQLBaseModel):
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
 
 
 @event.listens_for(SQLBaseModelAudit, "before_update", propagate=True)
 def updated_at(mapper, connection, target):
-    target.updated_at = datetime.now(timezone.utc)
+    target.updated_at = utcnow()
+
 
+async_session_maker = async_sessionmaker(
+    engine, class_=AsyncSession, autoflush=True, expire_on_commit=False
+)
 
-def get_session() -> Generator[Session, None, None]:
-    session = Session(engine, autoflush=True)
-    yield session
-    session.close()
 
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    """Session factory for routes that open short-lived sessions themselves."""
+    return async_session_maker
 
-def get_session_no_transaction() -> Generator[Session, None, None]:
-    session = Session(engine)
-    yield session
-    session.close()
+
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_maker() as session:
+        yield session
+
+
+async def get_session_no_transaction() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(engine) as session:
+        yield session
+
+
+def pool_stats() -> Dict[str, int]:
+    """Connections of the engine pool; empty for pools that do not keep any."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+def pool_telemetry() -> Dict[str, Any]:
+    """Pool profile and checkout counters since startup."""
+    checkouts = metrics.DB_POOL_CHECKOUT_SECONDS.labels()
+    return {
+        "profile": settings.db_pool_profile,
+        "pre_ping": POOL_PROFILE.pre_ping,
+        "null_pool": POOL_PROFILE.null_pool,
+        "checkouts": checkouts.count,
+        "mean_checkout_ms": (
+            round(checkouts.sum / checkouts.count * 1000, 3) if checkouts.count else 0.0
+        ),
+        "waits": int(metrics.DB_POOL_WAITS.value()),
+        "timeouts": int(metrics.DB_POOL_TIMEOUTS.value()),
+        "connects": int(metrics.DB_POOL_CONNECTS.value()),
+    }
+
+
+metrics.registry.gauge(
+    "db_pool_size",
+    "Connections kept open by the pool",
+    lambda: pool_stats().get("size"),
+)
+metrics.registry.gauge(
+    "db_pool_checked_out",
+    "Connections currently in use",
+    lambda: pool_stats().get("checked_out"),
+)
+metrics.registry.gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size",
+    lambda: pool_stats().get("overflow"),
+)
 
 
-def check_db_health() -> bool:
+async def check_db_health() -> bool:
     """Check database health."""
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         return True
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
@@ -1,49 +1,185 @@
 """Expense analysis using LangChain LLM."""
 
+import asyncio
 import json
 import logging
 import re
+from contextlib import aclosing, contextmanager, nullcontext
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Optional
-
-from langchain.schema import HumanMessage, SystemMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langchain_openai import ChatOpenAI
-
+from typing import (
+    Any,
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app import metrics, tracing
+from app.admission import AdmissionController, AdmissionRejected
+from app.cache import MISSING, AnalysisCache, DatabaseCacheTier
+from app.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.classifier import CategoryClassifier
+from app.db import engine
+from app.fast_parser import FastPathParser
+from app.llm_providers import LazyChatModel
+from app.llm_router import LLMRouter
+from app.microbatch import MicroBatcher
+from app.models.expenses import CategorySource
+from app.prefilter import PreFilter
 from app.settings import settings
+from app.singleflight import SingleFlight
+from app.streaming import JsonObjectScanner
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """Time an analysis stage in the metrics and, within a trace, as a span."""
+    with metrics.ANALYZER_STAGE_SECONDS.labels(name).time():
+        with tracing.span(f"analyzer.{name}"):
+            yield
+
+
 class ExpenseAnalyzer:
     """Analyzes messages to extract expense information using LLM."""
 
-    def __init__(self, dev: bool = settings.dev):
+    def __init__(
+        self,
+        dev: bool = settings.dev,
+        fast_path: bool = settings.fast_path_enabled,
+        cache: bool = settings.analysis_cache_enabled,
+        admission: bool = settings.admission_enabled,
+        micro_batch: bool = settings.microbatch_enabled,
+        streaming: bool = settings.llm_streaming_enabled,
+        circuit_breaker: bool = settings.circuit_breaker_enabled,
+        classifier: bool = settings.classifier_enabled,
+    ):
         self.dev = dev
+        self.streaming = streaming
+        self.stream_stats = {"calls": 0, "early_stops": 0}
+        self.prefilter = PreFilter.from_settings()
+        self.fast_parser = FastPathParser() if fast_path else None
+        # Extraction for the classifier and the degraded mode, even without
+        # the fast path
+        self.local_parser = self.fast_parser or FastPathParser()
+        self.classifier = CategoryClassifier() if classifier else None
         """Initialize the expense analyzer."""
-        if self.dev:
-
-            llm = HuggingFaceEndpoint(
-                model=settings.huggingfacehub_model,
-                task="text-generation",
-                max_new_tokens=512,
-                do_sample=False,
-                temperature=0.0,
-                repetition_penalty=1.03,
-                huggingfacehub_api_token=settings.huggingfacehub_api_token,
-            )
-            self.llm = ChatHuggingFace(llm=llm)
+        self.router: Optional[LLMRouter] = None
+        if settings.llm_providers:
+            providers = [
+                (spec, self._create_llm(*spec.split(":", 1)))
+                for spec in settings.llm_providers
+            ]
+            self.llm = providers[0][1]
+            self.model_name = ",".join(settings.llm_providers)
+            if len(providers) > 1:
+                self.router = LLMRouter(
+                    providers,
+                    hedge_budget=settings.llm_hedge_budget,
+                    initial_hedge_delay=settings.llm_hedge_initial_delay_ms / 1000,
+                )
         else:
-
-            self.llm = ChatOpenAI(
-                model=settings.llm_model,
-                api_key=settings.openai_api_key,
-                temperature=0.1,
-                max_tokens=500,  # type: ignore
+            backend = settings.llm_backend or ("huggingface" if self.dev else "openai")
+            self.model_name = (
+                settings.huggingfacehub_model
+                if backend == "huggingface"
+                else settings.llm_model
             )
+            self.llm = self._create_llm(backend, self.model_name)
 
+        self._prompt_inputs = (list(settings.expense_categories), self.model_name)
         self.system_prompt = self._create_system_prompt()
+        self.batch_system_prompt = self._create_batch_system_prompt()
+        self.prompt_version = self._prompt_fingerprint()
+        self.cache = self._create_cache() if cache else None
+        self.in_flight: SingleFlight[Optional[Dict[str, Any]]] = SingleFlight()
+        self.micro_batch_fallbacks = 0
+        self.micro_batcher: Optional[MicroBatcher[str, Optional[Dict[str, Any]]]] = (
+            MicroBatcher(
+                self._ask_llm_micro_batch,
+                max_size=settings.microbatch_max_size,
+                window=settings.microbatch_window_ms / 1000,
+            )
+            if micro_batch
+            else None
+        )
+        self.breaker = (
+            CircuitBreaker(
+                failure_rate_threshold=settings.circuit_breaker_failure_rate,
+                slow_call_threshold=settings.circuit_breaker_slow_call_ms / 1000,
+                window=settings.circuit_breaker_window,
+                min_calls=settings.circuit_breaker_min_calls,
+                open_duration=settings.circuit_breaker_open_seconds,
+            )
+            if circuit_breaker
+            else None
+        )
+        self.degraded = 0
+        self.admission = (
+            AdmissionController(
+                max_concurrency=settings.admission_max_concurrency,
+                max_queue=settings.admission_max_queue,
+                max_queue_per_key=settings.admission_max_queue_per_user,
+                queue_timeout=settings.admission_queue_timeout,
+            )
+            if admission
+            else None
+        )
+
+    @staticmethod
+    def _create_llm(backend: str, model: str) -> Any:
+        """Chat model of a backend, whose package is imported on first use."""
+        return LazyChatModel(backend, model)
+
+    def preload_llm(self) -> None:
+        """Create the chat models now rather than on the first message."""
+        models = self.router.providers.values() if self.router else [self.llm]
+        for llm in models:
+            if not isinstance(llm, LazyChatModel):
+                continue
+            try:
+                llm.load()
+            except Exception as e:
+                # The first message tries again and reports the error
+                logger.warning(f"Failed to preload LLM backend {llm.backend}: {e}")
+
+    def _create_cache(self) -> AnalysisCache:
+        """Create the LLM result cache, with the database tier if enabled."""
+        db_tier = (
+            DatabaseCacheTier(engine) if settings.analysis_cache_db_enabled else None
+        )
+        return AnalysisCache(
+            fingerprint=self.prompt_version,
+            maxsize=settings.analysis_cache_size,
+            ttl=settings.analysis_cache_ttl,
+            negative_ttl=settings.analysis_cache_negative_ttl,
+            db_tier=db_tier,
+        )
+
+    def _prompt_fingerprint(self) -> str:
+        return AnalysisCache.make_fingerprint(
+            self.system_prompt, settings.expense_categories, self.model_name
+        )
+
+    def _sync_prompt(self) -> None:
+        """Rebuild the prompt and cache fingerprint if categories or model changed."""
+        prompt_inputs = (list(settings.expense_categories), self.model_name)
+        if prompt_inputs == self._prompt_inputs:
+            return
+        self._prompt_inputs = prompt_inputs
+        self.system_prompt = self._create_system_prompt()
+        self.batch_system_prompt = self._create_batch_system_prompt()
+        self.prompt_version = self._prompt_fingerprint()
+        if self.cache:
+            self.cache.update_fingerprint(self.prompt_version)
 
     def _create_system_prompt(self) -> str:
         """Create the system prompt for the LLM."""
@@ -87,71 +223,473 @@ class ExpenseAnalyzer:
         Now process the next message.
         """
 
-    async def analyze_message(self, message: str) -> Optional[Dict[str, Any]]:
+    def _create_batch_system_prompt(self) -> str:
+        """Create the system prompt for packed multi-message LLM calls."""
+        categories_str = ", ".join(settings.expense_categories)
+
+        return f"""
+        You are an intelligent expense parsing assistant.
+
+        You will receive a JSON array of user messages, each one with an "id".
+        Analyze every message independently and determine if it represents an expense.
+
+        Return a **single-line JSON array** with exactly one object per input message,
+        in the same order, each one including the "id" of its message:
+        - For an expense: {{"id": 0, "is_expense": true, "description": "short summary of the expense", "amount": number_only, "category": one_of({settings.expense_categories})}}
+        - For anything else: {{"id": 1, "is_expense": false}}
+
+        **IMPORTANT RULES**:
+        - Return ONLY the JSON array — no extra text, no explanations.
+        - Do NOT wrap it in markdown or backticks.
+        - Categories must be one of: {categories_str}
+        - Amount must be a valid number (no currency symbols, no words like "dollars").
+
+        Example:
+
+        Input: [{{"id": 0, "message": "Dinner with friends 45"}}, {{"id": 1, "message": "hello there!"}}]
+        Output: [{{"id": 0, "is_expense": true, "description": "Dinner with friends", "amount": 45.00, "category": "Food"}}, {{"id": 1, "is_expense": false}}]
+
+        Now process the next messages.
+        """
+
+    async def analyze_message(
+        self,
+        message: str,
+        telegram_id: Optional[str] = None,
+        raise_errors: bool = False,
+    ) -> Optional[Dict[str, Any]]:
         """
         Analyze a message to extract expense information.
 
         Args:
             message: The user message to analyze
+            telegram_id: The sender, used to queue LLM calls fairly per user
+            raise_errors: Raise LLM and provider errors instead of returning
+                None, for callers that retry them
 
         Returns:
             Dictionary with expense details or None if not an expense
+
+        Raises:
+            AdmissionRejected: The LLM is saturated and the call was not queued
         """
-        try:
-            # First, do a quick regex check for obvious non-expenses
-            if self._is_obviously_not_expense(message):
-                logger.debug(f"Message obviously not an expense: {message}")
+        with tracing.span("analyzer.analyze_message"):
+            try:
+                result = await self._analyze_locally(message, telegram_id)
+                if result is not MISSING:
+                    return self._count_outcome(result)
+
+                # Use LLM to analyze the message, sharing the call with concurrent
+                # duplicates (retries, double taps)
+                key = (self.prompt_version, AnalysisCache.normalize(message))
+                result = await self.in_flight.do(
+                    key, lambda: self._analyze_with_llm(message, telegram_id)
+                )
+                return self._count_outcome(dict(result) if result else None)
+
+            except AdmissionRejected:
+                raise
+            except CircuitOpen:
+                return self._analyze_degraded(message)
+            except Exception as e:
+                metrics.ANALYSES.labels("error").inc()
+                logger.error(f"Error analyzing message '{message}': {e}")
+                if raise_errors:
+                    raise
                 return None
 
-            # Use LLM to analyze the message
-            messages = [
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=message.strip()),
-            ]
+    async def analyze_messages(
+        self,
+        messages: List[str],
+        telegram_id: Optional[str] = None,
+        raise_errors: bool = False,
+        prefilter: bool = True,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Analyze several messages, packing the ones that need the LLM into as
+        few calls as possible.
 
-            response = await self.llm.ainvoke(messages)
-            logger.info(response)
-            if self.dev:
-                result = self._parse_llm_response(response.content)  # type: ignore
-                logger.info(result)
+        Args:
+            messages: The user messages to analyze
+            telegram_id: The sender, used to queue LLM calls fairly per user
+            raise_errors: Raise LLM and provider errors instead of returning
+                None, for callers that must not mistake them for non-expenses
+            prefilter: Screen the messages as chat messages first (prefilter,
+                fast path, classifier); off for rows known to be transactions
+
+        Returns:
+            One entry per message: expense details or None if not an expense
+
+        Raises:
+            AdmissionRejected: The LLM is saturated and a call was not queued
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        pending: List[int] = []
+        for index, message in enumerate(messages):
+            try:
+                result = await self._analyze_locally(message, telegram_id, prefilter)
+            except Exception as e:
+                metrics.ANALYSES.labels("error").inc()
+                logger.error(f"Error analyzing message '{message}': {e}")
+                if raise_errors:
+                    raise
+                continue
+            if result is MISSING:
+                pending.append(index)
             else:
-                result = self._parse_llm_response(response.text())
+                results[index] = self._count_outcome(result)
 
-            if result and result.get("is_expense"):
-                # Validate and clean the result
-                return self._validate_expense_data(result)
+        batch_size = settings.llm_batch_size
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start : start + batch_size]
+            try:
+                async with self._admit(telegram_id):
+                    answers = await self._ask_llm_batch([messages[i] for i in chunk])
+                for index, answer in zip(chunk, answers):
+                    results[index] = await self._store_result(messages[index], answer)
+                    self._validate_category(telegram_id, results[index])
+                    self._count_outcome(results[index])
+            except AdmissionRejected:
+                raise
+            except CircuitOpen:
+                for index in chunk:
+                    results[index] = self._analyze_degraded(messages[index])
+            except Exception as e:
+                metrics.ANALYSES.labels("error").inc(len(chunk))
+                logger.error(f"Error analyzing batch of {len(chunk)} messages: {e}")
+                if raise_errors:
+                    raise
+
+        return results
+
+    def categorize(
+        self, description: str, telegram_id: Optional[str] = None
+    ) -> Optional[Tuple[str, CategorySource]]:
+        """
+        Category of an already extracted description and where it came
+        from, the fast path keywords or a confident classifier prediction;
+        None when it takes the LLM.
+        """
+        if self.fast_parser:
+            with _stage("fast_path"):
+                category = self.fast_parser.category(description)
+            if category is not None:
+                return category, CategorySource.FAST_PATH
+        if self.classifier:
+            with _stage("classifier"):
+                category = self.classifier.confident_category(telegram_id, description)
+            if category is not None:
+                return category, CategorySource.CLASSIFIER
+        return None
+
+    async def _analyze_locally(
+        self, message: str, telegram_id: Optional[str] = None, prefilter: bool = True
+    ) -> Any:
+        """
+        Answer without the LLM when possible, otherwise return ``MISSING``.
+        Without ``prefilter`` only the cache is consulted.
+        """
+        if prefilter:
+            result = self._screen(message, telegram_id)
+            if result is not MISSING:
+                return result
+
+        # Repeated messages are answered from the cache
+        self._sync_prompt()
+        if self.cache:
+            with _stage("cache"):
+                cached = await self.cache.get(message)
+            if cached is not MISSING:
+                logger.debug(f"Analysis cache hit: {message}")
+                return dict(cached) if cached else None
+
+        return MISSING
+
+    def _screen(self, message: str, telegram_id: Optional[str]) -> Any:
+        """Answer a chat message by rules or local parsers, else ``MISSING``."""
+        # First, do a quick regex check for obvious non-expenses
+        if self._is_obviously_not_expense(message):
+            logger.debug(f"Message obviously not an expense: {message}")
+            return None
 
+        # Then try the deterministic parser for short, unambiguous messages
+        if self.fast_parser:
+            with _stage("fast_path"):
+                fast_result = self.fast_parser.parse(message)
+            if fast_result:
+                return self._with_source(
+                    self._validate_expense_data(fast_result), CategorySource.FAST_PATH
+                )
+
+        # Then let the classifier pick the category the fast path could not
+        if self.classifier:
+            with _stage("classifier"):
+                draft = self.local_parser.parse_uncategorized(message)
+                category = draft and self.classifier.confident_category(
+                    telegram_id, draft["description"]
+                )
+            if category:
+                return self._with_source(
+                    self._validate_expense_data({**draft, "category": category}),
+                    CategorySource.CLASSIFIER,
+                )
+
+        return MISSING
+
+    def _analyze_degraded(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Guess the expense locally while the LLM circuit is open. The result
+        is not cached and is marked so the expense is analyzed again later.
+        """
+        self.degraded += 1
+        metrics.ANALYSES.labels("degraded").inc()
+        guess = self.local_parser.guess(message)
+        expense = self._validate_expense_data(guess) if guess else None
+        if expense is None:
             return None
+        expense["needs_reanalysis"] = True
+        expense["category_source"] = CategorySource.DEGRADED
+        return expense
+
+    @staticmethod
+    def _with_source(
+        expense: Optional[Dict[str, Any]], source: CategorySource
+    ) -> Optional[Dict[str, Any]]:
+        """Record that a local answer's category was not given by the LLM."""
+        if expense is not None:
+            expense["category_source"] = source
+        return expense
+
+    async def _analyze_with_llm(
+        self, message: str, telegram_id: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        # Admitted per caller, also when micro-batched, so a packed call
+        # holds one slot per message and users keep their fair share
+        async with self._admit(telegram_id):
+            if self.micro_batcher:
+                answer = await self.micro_batcher.submit(message)
+            else:
+                answer = await self._ask_llm(message)
+        result = await self._store_result(message, answer)
+        self._validate_category(telegram_id, result)
+        return result
+
+    def _validate_category(
+        self, telegram_id: Optional[str], expense: Optional[Dict[str, Any]]
+    ) -> None:
+        """Count LLM categories that disagree with a confident classifier."""
+        if self.classifier and expense:
+            self.classifier.validate(telegram_id, expense)
+
+    async def _ask_llm_micro_batch(
+        self, messages: List[str]
+    ) -> List[Optional[Dict[str, Any]] | BaseException]:
+        """
+        Answer messages of concurrent callers with one packed LLM call. The
+        callers were admitted already.
 
-        except Exception as e:
-            logger.error(f"Error analyzing message '{message}': {e}")
+        Messages the packed answer misses, or all of them if the packed call
+        fails, are sent again one by one.
+        """
+        answers: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        if len(messages) > 1:
+            try:
+                answers = await self._ask_llm_batch(messages)
+            except Exception as e:
+                logger.error(f"Error analyzing micro-batch of {len(messages)}: {e}")
+
+        missing = [index for index, answer in enumerate(answers) if answer is None]
+        if len(messages) > 1:
+            self.micro_batch_fallbacks += len(missing)
+        if missing:
+            retried = await asyncio.gather(
+                *(self._ask_llm(messages[index]) for index in missing),
+                return_exceptions=True,
+            )
+            for index, answer in zip(missing, retried):
+                answers[index] = answer  # type: ignore
+        return answers  # type: ignore
+
+    def _guard(self) -> AsyncContextManager:
+        """Fail fast instead of calling the LLM while its circuit is open."""
+        if not self.breaker:
+            return nullcontext()
+        return self.breaker.guard()
+
+    def _admit(self, telegram_id: Optional[str]) -> AsyncContextManager:
+        """Wait for an LLM slot, queued fairly behind other users' calls."""
+        if not self.admission:
+            return nullcontext()
+        return self.admission.admit(telegram_id or "")
+
+    async def _store_result(
+        self, message: str, result: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Validate a parsed LLM answer and cache it."""
+        if not result:
+            # Unparseable responses are not cached
             return None
 
-    def _is_obviously_not_expense(self, message: str) -> bool:
-        """Quick check for obviously non-expense messages."""
-        message_lower = message.lower().strip()
-
-        # Common greetings and non-expense phrases
-        non_expense_patterns = [
-            r"^(hi|hello|hey|good morning|good afternoon|good evening)",
-            r"^(how are you|what\'s up|how\'s it going)",
-            r"^(thank you|thanks|thx)",
-            r"^(yes|no|ok|okay)",
-            r"^\?",  # Questions starting with ?
-            r"^(help|start|stop)",
+        expense = None
+        if result.get("is_expense"):
+            # Validate and clean the result
+            with _stage("validate"):
+                expense = self._validate_expense_data(result)
+            if expense is None:
+                return None
+
+        if self.cache:
+            await self.cache.set(message, expense)
+        return expense
+
+    async def _ask_llm(self, message: str) -> Optional[Dict[str, Any]]:
+        """Send a single message to the LLM and parse its JSON answer."""
+        messages = [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=message.strip()),
         ]
 
-        for pattern in non_expense_patterns:
-            if re.match(pattern, message_lower):
-                return True
+        result = await self._call_llm(lambda llm: self._invoke_llm(llm, messages))
+        if self.dev:
+            logger.info(result)
+        return result
 
-        # Check if message has any numbers (expenses usually have amounts)
-        if not re.search(r"\d", message):
-            return True
+    async def _call_llm(self, invoke: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Run ``invoke`` on the chat model, through the router if configured.
 
-        return False
+        Raises:
+            CircuitOpen: Recent calls failed or were too slow
+        """
+        async with self._guard():
+            if self.router:
+                return await self.router.call(invoke)
+            return await invoke(self.llm)
+
+    async def _invoke_llm(self, llm: Any, messages: List[BaseMessage]) -> Any:
+        with _stage("llm"):
+            if self.streaming:
+                text = await self._stream_llm(llm, messages)
+            else:
+                response = await llm.ainvoke(messages)
+                logger.info(response)
+                text = self._response_text(response)
+        with _stage("parse"):
+            return self._parse_llm_response(text)
 
-    def _parse_llm_response(self, response: str) -> Optional[Dict[str, Any]]:
+    async def _stream_llm(self, llm: Any, messages: List[BaseMessage]) -> str:
+        """
+        Stream the answer and stop as soon as its JSON object is complete,
+        or as soon as it says the message is not an expense. Closing the
+        stream early cancels the rest of the generation.
+        """
+        scanner = JsonObjectScanner()
+        self.stream_stats["calls"] += 1
+        async with aclosing(llm.astream(messages)) as stream:
+            async for chunk in stream:
+                answer = scanner.feed(self._response_text(chunk))
+                if answer is not None:
+                    # Only a stream cut before the provider finished saved time
+                    if not self._is_last_chunk(chunk):
+                        self.stream_stats["early_stops"] += 1
+                    logger.info(answer)
+                    return answer
+        return scanner.text()
+
+    @staticmethod
+    def _is_last_chunk(chunk: Any) -> bool:
+        """Whether the provider marked ``chunk`` as the end of its answer."""
+        metadata = getattr(chunk, "response_metadata", None)
+        return isinstance(metadata, dict) and bool(metadata.get("finish_reason"))
+
+    async def _ask_llm_batch(
+        self, messages: List[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Send several messages in one packed prompt and split the answers."""
+        payload = json.dumps(
+            [{"id": i, "message": m.strip()} for i, m in enumerate(messages)],
+            ensure_ascii=False,
+        )
+        llm_messages = [
+            SystemMessage(content=self.batch_system_prompt),
+            HumanMessage(content=payload),
+        ]
+        # The single-message token limit is too small for a packed answer
+        kwargs = {} if self.dev else {"max_tokens": 60 * len(messages)}
+
+        async def invoke(llm: Any) -> Any:
+            with _stage("llm_batch"):
+                response = await llm.ainvoke(llm_messages, **kwargs)
+            logger.info(response)
+            with _stage("parse"):
+                return self._parse_llm_response(self._response_text(response))
+
+        parsed = await self._call_llm(invoke)
+
+        answers: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        if not isinstance(parsed, list):
+            logger.error(f"Batch LLM response is not a JSON array: {parsed}")
+            return answers
+        for position, item in enumerate(parsed):
+            if not isinstance(item, dict):
+                continue
+            index = item.get("id", position)
+            if isinstance(index, int) and 0 <= index < len(messages):
+                answers[index] = item
+        return answers
+
+    def _response_text(self, response: Any) -> str:
+        if self.dev:
+            return response.content
+        return response.text()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return runtime counters for the analyzer's shortcut layers."""
+        stats: Dict[str, Dict[str, Any]] = {
+            "prefilter": self.prefilter.stats.as_dict(),
+            "singleflight": self.in_flight.stats(),
+        }
+        if self.fast_parser:
+            stats["fast_path"] = self.fast_parser.stats.as_dict()
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        if self.admission:
+            stats["admission"] = self.admission.stats()
+        if self.classifier:
+            stats["classifier"] = self.classifier.report()
+        if self.breaker:
+            stats["circuit_breaker"] = {
+                **self.breaker.stats(),
+                "degraded": self.degraded,
+            }
+        if self.router:
+            stats["router"] = self.router.stats()
+        if self.streaming:
+            stats["streaming"] = dict(self.stream_stats)
+        if self.micro_batcher:
+            stats["microbatch"] = {
+                **self.micro_batcher.stats(),
+                "fallbacks": self.micro_batch_fallbacks,
+            }
+        return stats
+
+    def _is_obviously_not_expense(self, message: str) -> bool:
+        """Quick check for obviously non-expense messages."""
+        with _stage("prefilter"):
+            rule = self.prefilter.match(message)
+        if rule is None:
+            return False
+        metrics.PREFILTER_REJECTIONS.labels(rule).inc()
+        return True
+
+    @staticmethod
+    def _count_outcome(
+        result: Optional[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        metrics.ANALYSES.labels("expense" if result else "not_expense").inc()
+        return result
+
+    def _parse_llm_response(self, response: str) -> Any:
         """Parse the LLM response JSON."""
         try:
             # Clean the response (remove markdown code blocks if present, new lines, etc.)
@@ -171,11 +709,13 @@ class ExpenseAnalyzer:
             return result
 
         except json.JSONDecodeError as e:
+            metrics.LLM_PARSE_ERRORS.inc()
             logger.error(
                 f"Failed to parse LLM response as JSON: {response}. Error: {e}"
             )
             return None
         except Exception as e:
+            metrics.LLM_PARSE_ERRORS.inc()
             logger.error(f"Error parsing LLM response: {e}")
             return None
 
@@ -195,6 +735,7 @@ class ExpenseAnalyzer:
             category = data["category"].strip()
             if category not in settings.expense_categories:
                 logger.warning(f"Invalid category '{category}', using 'Other'")
+                metrics.CATEGORY_COERCED.inc()
                 category = "Other"
 
             # Validate and convert amount
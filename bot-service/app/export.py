@@ -0,0 +1,86 @@
+"""Streaming serialization of a user's expenses."""
+
+import csv
+import io
+import json
+from enum import Enum
+from typing import AsyncIterator, Iterable, Sequence
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.expenses import Expenses
+from app.settings import settings
+
+EXPORT_COLUMNS = ("id", "created_at", "description", "amount", "category")
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def stream_expenses(
+    session_maker: async_sessionmaker[AsyncSession],
+    user_id: int,
+    export_format: ExportFormat,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a user's expenses encoded as NDJSON or CSV, one chunk per batch.
+
+    Rows are read as plain columns through a server-side cursor, so memory
+    use does not depend on how many expenses the user has.
+    """
+    encode = _encode_ndjson
+    if export_format == ExportFormat.CSV:
+        encode = _encode_csv_rows
+        yield _encode_csv([EXPORT_COLUMNS])
+
+    query = (
+        select(*(getattr(Expenses, column) for column in EXPORT_COLUMNS))
+        .where(Expenses.user_id == user_id)
+        .order_by(Expenses.created_at, Expenses.id)  # type: ignore
+        .execution_options(yield_per=settings.export_batch_size)
+    )
+    async with session_maker() as session:
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            yield encode(rows)
+
+
+def _encode_ndjson(rows: Sequence[Row]) -> bytes:
+    lines = (
+        json.dumps(
+            {
+                "id": row.id,
+                "created_at": row.created_at.isoformat(),
+                "description": row.description,
+                "amount": row.amount,
+                "category": row.category,
+            },
+            ensure_ascii=False,
+        )
+        for row in rows
+    )
+    return "".join(line + "\n" for line in lines).encode()
+
+
+def _encode_csv_rows(rows: Sequence[Row]) -> bytes:
+    return _encode_csv(
+        (row.id, row.created_at.isoformat(), row.description, row.amount, row.category)
+        for row in rows
+    )
+
+
+def _encode_csv(rows: Iterable[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
@@ -0,0 +1,412 @@
+"""Deterministic fast-path expense extraction that runs before the LLM."""
+
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.settings import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Shared by the categories that were renamed over time (Bills/Utilities,
+# Healthcare/Medical/Healthcare), so their keywords cannot drift apart.
+_UTILITY_KEYWORDS = ["electricity", "internet", "phone", "water"]
+_MEDICAL_KEYWORDS = [
+    "doctor",
+    "dentist",
+    "pharmacy",
+    "medicine",
+    "pills",
+    "hospital",
+    "clinic",
+]
+
+# Default keyword map. Only categories present in ``settings.expense_categories``
+# are used, so the map can safely cover every category we have ever shipped.
+DEFAULT_CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "Food": [
+        "breakfast",
+        "brunch",
+        "lunch",
+        "dinner",
+        "coffee",
+        "cafe",
+        "café",
+        "tea",
+        "snack",
+        "snacks",
+        "meal",
+        "food",
+        "restaurant",
+        "pizza",
+        "burger",
+        "sushi",
+        "bakery",
+        "takeout",
+        "groceries",
+        "grocery",
+        "supermarket",
+    ],
+    "Transportation": [
+        "uber",
+        "lyft",
+        "cabify",
+        "taxi",
+        "cab",
+        "bus",
+        "metro",
+        "subway",
+        "train",
+        "gas",
+        "fuel",
+        "petrol",
+        "parking",
+        "toll",
+        "tolls",
+        "fare",
+    ],
+    "Entertainment": [
+        "movie",
+        "movies",
+        "cinema",
+        "netflix",
+        "spotify",
+        "concert",
+        "theater",
+        "theatre",
+        "videogame",
+        "videogames",
+    ],
+    "Shopping": [
+        "clothes",
+        "shoes",
+        "shirt",
+        "jeans",
+        "amazon",
+        "mall",
+        "shopping",
+    ],
+    "Bills": ["bill", "bills", *_UTILITY_KEYWORDS],
+    "Utilities": [*_UTILITY_KEYWORDS, "utilities"],
+    "Housing": ["rent", "mortgage"],
+    "Insurance": ["insurance"],
+    "Healthcare": _MEDICAL_KEYWORDS,
+    "Medical/Healthcare": _MEDICAL_KEYWORDS,
+    "Education": ["tuition", "course", "books", "school", "university"],
+}
+
+# A single amount token, optionally prefixed by a currency symbol and/or
+# suffixed with a "k" multiplier. Separators are resolved in parse_amount.
+_AMOUNT_RE = re.compile(
+    r"(?<![\w.,])(?P<symbol>[$€£¥₹])?\s?(?P<number>\d(?:[\d.,]*\d)?)"
+    r"(?P<multiplier>[kK])?(?!\w)(?![.,]\d)"
+)
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+_CURRENCY_WORDS = {
+    "usd",
+    "eur",
+    "gbp",
+    "ars",
+    "dollar",
+    "dollars",
+    "buck",
+    "bucks",
+    "euro",
+    "euros",
+    "peso",
+    "pesos",
+}
+_LEADING_FILLERS = {
+    "spent",
+    "paid",
+    "pay",
+    "bought",
+    "for",
+    "on",
+    "at",
+    "a",
+    "an",
+    "the",
+    "of",
+    "in",
+}
+_TRAILING_FILLERS = {"for", "on", "at", "of", "in", "with", "a", "the"}
+# Words that change the meaning of the amount; leave those messages to the LLM.
+_AMBIGUOUS_WORDS = {
+    "each",
+    "per",
+    "split",
+    "half",
+    "refund",
+    "refunded",
+    "owe",
+    "owes",
+    "owed",
+    "lent",
+    "borrowed",
+    "received",
+    "earned",
+    "salary",
+    "income",
+    "not",
+    "no",
+    "never",
+    "will",
+    "budget",
+}
+_MAX_DESCRIPTION_WORDS = 6
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+# Category of guessed expenses whose words match no single category
+_FALLBACK_CATEGORY = "Other"
+
+
+class FastPathStats:
+    """Counters describing how often the fast path avoided an LLM call."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+
+    @property
+    def misses(self) -> int:
+        return self.attempts - self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class FastPathParser:
+    """Rule-based extractor for short, unambiguous expense messages.
+
+    The parser only answers when it is confident: exactly one amount, a short
+    description and exactly one matching category. Anything else returns None
+    so the caller can fall back to the LLM.
+    """
+
+    def __init__(
+        self,
+        categories: Iterable[str] = settings.expense_categories,
+        extra_keywords: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.stats = FastPathStats()
+        categories = list(categories)
+        self.fallback_category = (
+            _FALLBACK_CATEGORY
+            if _FALLBACK_CATEGORY in categories or not categories
+            else categories[-1]
+        )
+        self.keyword_categories = self._build_keyword_index(
+            categories, extra_keywords or settings.fast_path_keywords
+        )
+
+    @staticmethod
+    def _build_keyword_index(
+        categories: Iterable[str], extra_keywords: Dict[str, List[str]]
+    ) -> Dict[str, set]:
+        """Map each lowercase keyword to the active categories it implies."""
+        active = set(categories)
+        index: Dict[str, set] = {}
+        for source in (DEFAULT_CATEGORY_KEYWORDS, extra_keywords):
+            for category, keywords in source.items():
+                if category not in active:
+                    continue
+                for keyword in keywords:
+                    index.setdefault(keyword.lower(), set()).add(category)
+        return index
+
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        """Return expense data for ``message`` or None when not confident."""
+        self.stats.attempts += 1
+        result = self._extract(message)
+        if result is not None:
+            self.stats.hits += 1
+            logger.debug(f"Fast path parsed '{message}': {result}")
+        return result
+
+    def guess(self, message: str) -> Optional[Dict[str, Any]]:
+        """Best-effort expense data for when the LLM is unavailable.
+
+        Unlike ``parse``, the first valid amount is used even if there are
+        several, ambiguous words are kept and a message matching no single
+        category gets the fallback one. Only messages without any amount
+        return None.
+        """
+        text = message.strip()
+        for match in _AMOUNT_RE.finditer(text):
+            amount = self.parse_amount(match.group("number"))
+            if amount is None:
+                continue
+            if match.group("multiplier"):
+                amount *= 1000
+            if amount > 0:
+                break
+        else:
+            return None
+
+        words = [
+            token
+            for token in (
+                token.strip(".,;:!?¿¡()[]{}\"'-$€£¥₹")
+                for token in (text[: match.start()] + " " + text[match.end() :]).split()
+            )
+            if _WORD_RE.fullmatch(token) and token.lower() not in _CURRENCY_WORDS
+        ]
+        while words and words[0].lower() in _LEADING_FILLERS:
+            words.pop(0)
+        while words and words[-1].lower() in _TRAILING_FILLERS:
+            words.pop()
+        words = words[:_MAX_DESCRIPTION_WORDS]
+
+        return {
+            "description": self._description(words or ["Expense"]),
+            "amount": amount,
+            "category": self._match_category(words) or self.fallback_category,
+        }
+
+    def parse_uncategorized(self, message: str) -> Optional[Dict[str, Any]]:
+        """Description and amount of ``message`` when confident, else None.
+
+        Same rules as ``parse`` except for the category, which is left to
+        the caller.
+        """
+        parts = self._extract_parts(message)
+        if parts is None:
+            return None
+        words, amount = parts
+        return {"description": self._description(words), "amount": amount}
+
+    def category(self, text: str) -> Optional[str]:
+        """The single category implied by the words of ``text``, else None.
+
+        Meant for descriptions extracted elsewhere, such as bank statement
+        lines: digits, punctuation and unknown words are ignored.
+        """
+        return self._match_category(_LETTERS_RE.findall(text))
+
+    def _extract(self, message: str) -> Optional[Dict[str, Any]]:
+        parts = self._extract_parts(message)
+        if parts is None:
+            return None
+        words, amount = parts
+
+        category = self._match_category(words)
+        if category is None:
+            return None
+
+        return {
+            "description": self._description(words),
+            "amount": amount,
+            "category": category,
+        }
+
+    def _extract_parts(self, message: str) -> Optional[Tuple[List[str], Decimal]]:
+        text = message.strip()
+        if not text or "?" in text:
+            return None
+
+        matches = list(_AMOUNT_RE.finditer(text))
+        if len(matches) != 1:
+            return None
+        match = matches[0]
+
+        amount = self.parse_amount(match.group("number"))
+        if amount is None:
+            return None
+        if match.group("multiplier"):
+            amount *= 1000
+        if amount <= 0:
+            return None
+
+        remainder = text[: match.start()] + " " + text[match.end() :]
+        words = self._description_words(remainder)
+        if not words or len(words) > _MAX_DESCRIPTION_WORDS:
+            return None
+        return words, amount
+
+    @staticmethod
+    def _description(words: List[str]) -> str:
+        description = " ".join(words)
+        return description[0].upper() + description[1:]
+
+    @staticmethod
+    def parse_amount(raw: str) -> Optional[Decimal]:
+        """Parse a number written with either locale's separators.
+
+        "1.234,56" and "1,234.56" are both 1234.56, "3,50" is 3.50 and
+        "1.234.567" is 1234567. A single separator followed by exactly three
+        digits ("1.234") is ambiguous between locales, so it is rejected.
+        """
+        has_comma = "," in raw
+        has_dot = "." in raw
+        try:
+            if has_comma and has_dot:
+                decimal_sep = "," if raw.rfind(",") > raw.rfind(".") else "."
+                thousands_sep = "." if decimal_sep == "," else ","
+                integer, fraction = raw.rsplit(decimal_sep, 1)
+                groups = integer.split(thousands_sep)
+                if decimal_sep in integer or not _valid_groups(groups):
+                    return None
+                if not 1 <= len(fraction) <= 2:
+                    return None
+                return Decimal(f"{''.join(groups)}.{fraction}")
+
+            if has_comma or has_dot:
+                separator = "," if has_comma else "."
+                parts = raw.split(separator)
+                if len(parts) > 2:
+                    return Decimal("".join(parts)) if _valid_groups(parts) else None
+                integer, fraction = parts
+                if 1 <= len(fraction) <= 2:
+                    return Decimal(f"{integer}.{fraction}")
+                return None
+
+            return Decimal(raw)
+        except InvalidOperation:
+            return None
+
+    @staticmethod
+    def _description_words(text: str) -> Optional[List[str]]:
+        words = []
+        for token in text.split():
+            token = token.strip(".,;:!()[]{}\"'-$€£¥₹")
+            if not token:
+                continue
+            if not _WORD_RE.fullmatch(token):
+                return None
+            lowered = token.lower()
+            if lowered in _AMBIGUOUS_WORDS:
+                return None
+            if lowered in _CURRENCY_WORDS:
+                continue
+            words.append(token)
+
+        while words and words[0].lower() in _LEADING_FILLERS:
+            words.pop(0)
+        while words and words[-1].lower() in _TRAILING_FILLERS:
+            words.pop()
+        return words
+
+    def _match_category(self, words: List[str]) -> Optional[str]:
+        matched = set()
+        for word in words:
+            matched.update(self.keyword_categories.get(word.lower(), ()))
+        if len(matched) != 1:
+            return None
+        return matched.pop()
+
+
+def _valid_groups(groups: List[str]) -> bool:
+    """Check thousands grouping: 1-3 leading digits, then groups of three."""
+    return 1 <= len(groups[0]) <= 3 and all(len(g) == 3 for g in groups[1:])
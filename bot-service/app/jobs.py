@@ -0,0 +1,231 @@
+"""Background processing of asynchronous expense jobs."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.admission import AdmissionRejected
+from app.db import utcnow
+from app.expense_analyzer import ExpenseAnalyzer
+from app.models.expense_jobs import ExpenseJobs, JobStatus
+from app.models.expenses import Expenses
+from app.rollups import add_to_rollups
+from app.settings import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_expense_job(
+    session_maker: async_sessionmaker[AsyncSession],
+    user_id: int,
+    telegram_id: str,
+    message: str,
+) -> ExpenseJobs:
+    """Store a message to be analyzed by the job workers."""
+    job = ExpenseJobs(user_id=user_id, telegram_id=telegram_id, message=message)
+    async with session_maker() as session:
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+    return job
+
+
+class ExpenseJobWorker:
+    """
+    Pool of coroutines analyzing pending expense jobs.
+
+    Jobs are claimed with ``FOR UPDATE SKIP LOCKED``, so any number of
+    replicas can run workers against the same table without processing a
+    job twice. A claimed job is leased for ``lease`` seconds; jobs of a
+    worker that died are claimed again once their lease expires, and the
+    expense insert only commits while the claim is still current.
+    """
+
+    def __init__(
+        self,
+        analyzer: ExpenseAnalyzer,
+        session_maker: async_sessionmaker[AsyncSession],
+        workers: int = settings.expense_job_workers,
+        poll_interval: float = settings.expense_job_poll_interval,
+        lease: int = settings.expense_job_lease,
+        max_attempts: int = settings.expense_job_max_attempts,
+    ):
+        self.analyzer = analyzer
+        self.session_maker = session_maker
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"expense-job-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers instead of waiting for the next poll."""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Expense job worker error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> bool:
+        """Claim and process one job. Returns False when there is none."""
+        job = await self._claim()
+        if job is None:
+            return False
+        await self._process(job)
+        return True
+
+    async def _claim(self) -> Optional[ExpenseJobs]:
+        now = utcnow()
+        async with self.session_maker() as session:
+            claimed = await session.exec(self._claim_statement(now))  # type: ignore
+            job = claimed.scalar_one_or_none()
+            if job is None:
+                await session.exec(self._expire_statement(now))  # type: ignore
+            await session.commit()
+        return job
+
+    def _claim_statement(self, now: datetime):
+        """Lease the oldest claimable job, skipping rows other workers hold."""
+        next_job = (
+            select(ExpenseJobs.id)
+            .where(
+                ExpenseJobs.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),  # type: ignore
+                ExpenseJobs.attempts < self.max_attempts,  # type: ignore
+                or_(
+                    ExpenseJobs.locked_until.is_(None),  # type: ignore
+                    ExpenseJobs.locked_until <= now,  # type: ignore
+                ),
+            )
+            .order_by(ExpenseJobs.id)  # type: ignore
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return (
+            update(ExpenseJobs)  # type: ignore
+            .where(ExpenseJobs.id == next_job)  # type: ignore
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=ExpenseJobs.attempts + 1,
+                locked_until=now + timedelta(seconds=self.lease),
+                updated_at=now,
+            )
+            .returning(ExpenseJobs)
+        )
+
+    def _expire_statement(self, now: datetime):
+        """
+        Fail jobs whose workers kept dying: their lease expired on the last
+        attempt, so the claim will not pick them up again.
+        """
+        return (
+            update(ExpenseJobs)  # type: ignore
+            .where(
+                ExpenseJobs.status == JobStatus.RUNNING,  # type: ignore
+                ExpenseJobs.attempts >= self.max_attempts,  # type: ignore
+                ExpenseJobs.locked_until <= now,  # type: ignore
+            )
+            .values(
+                status=JobStatus.FAILED,
+                error="Lease expired on the last attempt",
+                locked_until=None,
+                updated_at=now,
+            )
+        )
+
+    async def _process(self, job: ExpenseJobs) -> None:
+        try:
+            result = await self.analyzer.analyze_message(
+                job.message, job.telegram_id, raise_errors=True
+            )
+        except AdmissionRejected as e:
+            # Not an attempt: wait for capacity without spending the budget
+            await self._finish(
+                job,
+                status=JobStatus.PENDING,
+                attempts=job.attempts - 1,
+                locked_until=utcnow() + timedelta(seconds=e.retry_after),
+            )
+            return
+        except Exception as e:
+            logger.error(f"Error analyzing expense job {job.id}: {e}")
+            if job.attempts >= self.max_attempts:
+                await self._finish(job, status=JobStatus.FAILED, error=str(e))
+            else:
+                await self._finish(
+                    job,
+                    status=JobStatus.PENDING,
+                    locked_until=utcnow() + timedelta(seconds=2**job.attempts),
+                )
+            return
+
+        if not result:
+            await self._finish(job, status=JobStatus.REJECTED, error="Invalid message")
+            return
+        await self._finish(
+            job,
+            status=JobStatus.DONE,
+            expense=Expenses(user_id=job.user_id, **result),
+        )
+
+    async def _finish(
+        self,
+        job: ExpenseJobs,
+        status: JobStatus,
+        expense: Optional[Expenses] = None,
+        **values,
+    ) -> None:
+        """
+        Record the outcome of a claimed job, inserting its expense in the
+        same transaction. Nothing is written if the claim was lost.
+        """
+        values.setdefault("locked_until", None)
+        async with self.session_maker() as session:
+            if expense is not None:
+                session.add(expense)
+                await session.flush()
+                await add_to_rollups(session, job.user_id, [expense])
+                values["expense_id"] = expense.id
+            claimed = await session.exec(
+                update(ExpenseJobs)  # type: ignore
+                .where(
+                    ExpenseJobs.id == job.id,  # type: ignore
+                    ExpenseJobs.status == JobStatus.RUNNING,  # type: ignore
+                    ExpenseJobs.attempts == job.attempts,  # type: ignore
+                )
+                .values(status=status, updated_at=utcnow(), **values)
+            )
+            if claimed.rowcount != 1:
+                logger.warning(f"Lost the claim on expense job {job.id}")
+                await session.rollback()
+                return
+            await session.commit()
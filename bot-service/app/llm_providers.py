@@ -0,0 +1,142 @@
+"""
+Registry of chat model backends, imported on first use.
+
+The provider packages are the heaviest imports of the service
+(``langchain_openai`` and ``langchain_huggingface`` each take seconds and
+about 100 MB), and a worker only ever talks to the backends it is configured
+for. Factories therefore import their package in their body, and
+``LazyChatModel`` defers even that until the model is first called, so
+neither startup nor the resident memory of a worker pays for a backend it
+does not use.
+"""
+
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ChatModelFactory = Callable[[str], Any]
+
+_factories: Dict[str, ChatModelFactory] = {}
+
+# Seconds spent creating each backend's first model, imports included
+import_seconds: Dict[str, float] = {}
+
+
+def register(name: str) -> Callable[[ChatModelFactory], ChatModelFactory]:
+    """Register the decorated ``factory(model)`` as backend ``name``."""
+
+    def decorator(factory: ChatModelFactory) -> ChatModelFactory:
+        _factories[name] = factory
+        return factory
+
+    return decorator
+
+
+def get_factory(backend: str) -> ChatModelFactory:
+    """Factory of a registered backend or of a ``package.module:factory`` path."""
+    factory = _factories.get(backend)
+    if factory is not None:
+        return factory
+    if ":" in backend:
+        module, attribute = backend.split(":", 1)
+        return getattr(importlib.import_module(module), attribute)
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+def create_chat_model(backend: str, model: str) -> Any:
+    """Create a chat model now, importing its provider package if needed."""
+    factory = get_factory(backend)
+    start = time.perf_counter()
+    chat_model = factory(model)
+    if backend not in import_seconds:
+        import_seconds[backend] = round(time.perf_counter() - start, 3)
+        logger.info(f"Loaded LLM backend {backend} in {import_seconds[backend]}s")
+    return chat_model
+
+
+class LazyChatModel:
+    """
+    Stand-in for the chat model of ``backend``, created once on first use.
+    ``ainvoke`` and ``astream`` create it in a thread, waiting for a preload
+    already in flight, so the event loop never blocks on the import; other
+    attributes create it on access. Unknown backends fail here rather than
+    on the first message.
+    """
+
+    def __init__(self, backend: str, model: str):
+        get_factory(backend)
+        self.backend = backend
+        self.model = model
+        self._chat_model: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._chat_model is not None
+
+    def load(self) -> Any:
+        """Create the chat model, or wait for the thread creating it."""
+        if self._chat_model is None:
+            with self._lock:
+                if self._chat_model is None:
+                    self._chat_model = create_chat_model(self.backend, self.model)
+        return self._chat_model
+
+    async def aload(self) -> Any:
+        """``load`` without blocking the event loop."""
+        if self._chat_model is None:
+            return await asyncio.to_thread(self.load)
+        return self._chat_model
+
+    async def ainvoke(self, *args: Any, **kwargs: Any) -> Any:
+        chat_model = await self.aload()
+        return await chat_model.ainvoke(*args, **kwargs)
+
+    async def astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        chat_model = await self.aload()
+        async with aclosing(chat_model.astream(*args, **kwargs)) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not set in __init__
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+@register("openai")
+def _openai(model: str) -> Any:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        temperature=0.1,
+        max_tokens=500,  # type: ignore
+    )
+
+
+@register("huggingface")
+def _huggingface(model: str) -> Any:
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    llm = HuggingFaceEndpoint(
+        model=model,
+        task="text-generation",
+        max_new_tokens=512,
+        do_sample=False,
+        temperature=0.0,
+        repetition_penalty=1.03,
+        huggingfacehub_api_token=settings.huggingfacehub_api_token,
+    )
+    return ChatHuggingFace(llm=llm)
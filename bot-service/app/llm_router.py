@@ -0,0 +1,225 @@
+"""Latency-based routing and hedging of LLM calls across providers."""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """Latency and error tracking for one provider."""
+
+    def __init__(self, window: int, alpha: float):
+        self.alpha = alpha
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        self._observe(latency)
+        if not ok:
+            self.errors += 1
+        self.error_ewma += self.alpha * ((0.0 if ok else 1.0) - self.error_ewma)
+
+    def record_cancelled(self, latency: float) -> None:
+        """
+        Account for a call cancelled after ``latency`` seconds, a lower bound
+        of its real latency. Otherwise a provider that always loses the race
+        would keep its old, optimistic estimate.
+        """
+        if self.latency_ewma is None or latency > self.latency_ewma:
+            self._observe(latency)
+
+    def _observe(self, latency: float) -> None:
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def as_dict(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "latency_ewma_ms": (
+                round(self.latency_ewma * 1000, 3) if self.latency_ewma else 0.0
+            ),
+            "latency_p95_ms": round(p95 * 1000, 3) if p95 is not None else 0.0,
+            "error_rate": round(self.error_ewma, 4),
+        }
+
+
+class LLMRouter:
+    """
+    Send each call to the best provider and hedge it on a second one.
+
+    Providers are ranked by their latency EWMA, penalized by ``error_penalty``
+    seconds per unit of error EWMA. The call goes to the best one; once it has
+    run longer than that provider's rolling p95 (``initial_hedge_delay`` until
+    ``min_samples`` calls were seen), or if it fails first, the same call is
+    sent to the next provider. The first valid result wins and the other call
+    is cancelled.
+
+    Hedges are limited by a token bucket: every call adds ``hedge_budget``
+    tokens (up to ``max_hedge_tokens``, which is also where it starts) and
+    every hedge spends one, so past the initial burst at most that fraction
+    of calls is sent twice. Falling back after a failure is not a hedge.
+    """
+
+    def __init__(
+        self,
+        providers: List[Tuple[str, Any]],
+        hedge_budget: float,
+        initial_hedge_delay: float,
+        min_samples: int = 20,
+        window: int = 200,
+        alpha: float = 0.1,
+        error_penalty: float = 10.0,
+        max_hedge_tokens: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = dict(providers)
+        self.provider_stats = {
+            name: ProviderStats(window=window, alpha=alpha) for name, _ in providers
+        }
+        self.hedge_budget = hedge_budget
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.max_hedge_tokens = max_hedge_tokens
+        self.clock = clock
+        self._hedge_tokens = max_hedge_tokens
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped_hedges = 0
+
+    def ranked(self) -> List[str]:
+        """Provider names, best first. Unmeasured providers keep their order."""
+
+        def score(name: str) -> float:
+            stats = self.provider_stats[name]
+            if stats.latency_ewma is None:
+                return 0.0
+            return stats.latency_ewma + self.error_penalty * stats.error_ewma
+
+        return sorted(self.providers, key=score)
+
+    def hedge_delay(self, name: str) -> float:
+        stats = self.provider_stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.initial_hedge_delay
+        return stats.p95() or self.initial_hedge_delay
+
+    async def call(self, invoke: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Run ``invoke(llm)`` on the best provider, hedging it if it is slow.
+
+        A result of None counts as an invalid answer: the other call, if any,
+        is awaited instead. If no call returns a valid result, None is
+        returned, or the first exception when every call failed.
+        """
+        self.calls += 1
+        self._hedge_tokens = min(
+            self.max_hedge_tokens, self._hedge_tokens + self.hedge_budget
+        )
+        ranked = self.ranked()
+        primary = ranked[0]
+        backups = ranked[1:]
+
+        tasks: Dict[asyncio.Task, Tuple[str, float]] = {}
+        self._start(tasks, primary, invoke)
+        deadline = self.clock() + self.hedge_delay(primary)
+        errors: List[BaseException] = []
+        invalid = False
+        try:
+            while tasks:
+                timeout = None
+                if backups:
+                    timeout = max(0.0, deadline - self.clock())
+                done, _ = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name, started = tasks.pop(task)
+                    latency = self.clock() - started
+                    error = task.exception()
+                    if error is None and task.result() is not None:
+                        self.provider_stats[name].record(latency, ok=True)
+                        self.provider_stats[name].wins += 1
+                        if name != primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    self.provider_stats[name].record(latency, ok=False)
+                    if error is not None:
+                        logger.error(f"LLM provider {name} failed: {error}")
+                        errors.append(error)
+                    else:
+                        invalid = True
+
+                # Hedge once the primary is past its p95, or has already failed
+                if backups and (not tasks or self.clock() >= deadline):
+                    if tasks and self._hedge_tokens < 1:
+                        self.skipped_hedges += 1
+                        backups = []
+                        continue
+                    if tasks:
+                        self._hedge_tokens -= 1
+                        self.hedges += 1
+                    name = backups.pop(0)
+                    self._start(tasks, name, invoke)
+                    deadline = self.clock() + self.hedge_delay(name)
+        finally:
+            await self._cancel(tasks)
+
+        if invalid or not errors:
+            return None
+        raise errors[0]
+
+    def _start(
+        self,
+        tasks: Dict[asyncio.Task, Tuple[str, float]],
+        name: str,
+        invoke: Callable[[Any], Awaitable[Any]],
+    ) -> None:
+        task = asyncio.ensure_future(invoke(self.providers[name]))
+        tasks[task] = (name, self.clock())
+
+    async def _cancel(self, tasks: Dict[asyncio.Task, Tuple[str, float]]) -> None:
+        for task, (name, started) in tasks.items():
+            if task.done():
+                continue
+            task.cancel()
+            self.provider_stats[name].record_cancelled(self.clock() - started)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "skipped_hedges": self.skipped_hedges,
+            "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+            "providers": {
+                name: stats.as_dict() for name, stats in self.provider_stats.items()
+            },
+        }
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,14 +6,48 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
 from app.api.router import router as api_router
+from app.classifier import ClassifierTrainer
+from app.db import async_session_maker
 from app.expense_analyzer import ExpenseAnalyzer
+from app.jobs import ExpenseJobWorker
+from app.metrics import MetricsMiddleware
 from app.settings import settings
+from app.startup import startup
+from app.tracing import Tracer, TracingMiddleware, create_exporter
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.expense_analyzer = ExpenseAnalyzer()
+    if app.state.expense_analyzer.cache:
+        await app.state.expense_analyzer.cache.purge_stale()
+    app.state.expense_job_worker = None
+    if settings.expense_job_workers > 0:
+        app.state.expense_job_worker = ExpenseJobWorker(
+            app.state.expense_analyzer, async_session_maker
+        )
+        app.state.expense_job_worker.start()
+    app.state.classifier_trainer = None
+    if app.state.expense_analyzer.classifier:
+        app.state.classifier_trainer = ClassifierTrainer(
+            app.state.expense_analyzer.classifier, async_session_maker
+        )
+        app.state.classifier_trainer.start()
+    startup.mark("lifespan")
+    startup.log()
+    app.state.llm_preload = None
+    if settings.llm_preload:
+        # In a thread, so /health answers while the provider package imports
+        app.state.llm_preload = asyncio.create_task(
+            asyncio.to_thread(app.state.expense_analyzer.preload_llm)
+        )
     yield
+    if app.state.llm_preload:
+        app.state.llm_preload.cancel()
+    if app.state.classifier_trainer:
+        await app.state.classifier_trainer.stop()
+    if app.state.expense_job_worker:
+        await app.state.expense_job_worker.stop()
 
 
 app = FastAPI(
@@ -29,7 +64,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location"],
 )
 
 app.add_middleware(GZipMiddleware, minimum_size=1000)
+if settings.tracing_enabled:
+    app.add_middleware(
+        TracingMiddleware,
+        tracer=Tracer(
+            create_exporter(settings.tracing_exporter, settings.tracing_file),
+            slow_threshold=settings.tracing_slow_ms / 1000,
+            sample_rate=settings.tracing_sample_rate,
+            max_spans=settings.tracing_max_spans,
+        ),
+        header=settings.tracing_header,
+    )
+if settings.metrics_enabled:
+    # Outermost, so the latency includes the other middleware
+    app.add_middleware(MetricsMiddleware)
 app.include_router(api_router)
+startup.mark("imports")
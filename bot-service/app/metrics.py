@@ -0,0 +1,336 @@
+"""
+Prometheus metrics rendered in the text exposition format.
+
+Counters and histograms are plain Python objects updated without locks:
+every update happens on the event loop thread (SQLAlchemy's sync events run
+in greenlets of that thread too), so an increment is a dict lookup and a
+float addition. Gauges are read from callbacks when ``/metrics`` is scraped.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from fast local work to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines of the metric, without its header."""
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        )
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class _LabelledMetric(_Metric):
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation)
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, object] = {}
+
+    def labels(self, *values: str):
+        """Child for one combination of label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        """Value of one combination of label values."""
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_LabelledMetric):
+    """Monotonic count; use ``inc`` directly when there are no labels."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def value(self, *values: str) -> float:
+        child = self._children.get(values)
+        return child.value if child else 0.0  # type: ignore[attr-defined]
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, values)} "
+            f"{_format_value(child.value)}"  # type: ignore[attr-defined]
+            for values, child in self._children.items()
+        ]
+
+
+class _HistogramTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "_HistogramValue"):
+        self.histogram = histogram
+
+    def __enter__(self) -> "_HistogramTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf, made cumulative when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _HistogramTimer:
+        """Context manager observing the seconds spent in its block."""
+        return _HistogramTimer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram(_LabelledMetric):
+    """Distribution of observed values over fixed, cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _HistogramTimer:
+        return self.labels().time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            bounds = self.buckets + (float("inf"),)
+            for bound, count in zip(bounds, child.counts):  # type: ignore
+                cumulative += count
+                labels = _format_labels(names, values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(
+                f"{self.name}_sum{labels} {_format_value(child.sum)}"  # type: ignore
+            )
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Current value read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Optional[float]],
+    ):
+        super().__init__(name, documentation)
+        self.read = read
+
+    def _samples(self) -> List[str]:
+        value = self.read()
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    """Ordered set of metrics rendered together by ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(  # type: ignore
+            Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def gauge(
+        self, name: str, documentation: str, read: Callable[[], Optional[float]]
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, read))  # type: ignore
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template",
+    ["method", "route", "status"],
+)
+ANALYZER_STAGE_SECONDS = registry.histogram(
+    "expense_analyzer_stage_duration_seconds",
+    "Time spent in each stage of analyze_message",
+    ["stage"],
+    buckets=FAST_BUCKETS + DEFAULT_BUCKETS[5:],
+)
+ANALYSES = registry.counter(
+    "expense_analyses",
+    "Analyzed messages by outcome (expense, not_expense, degraded, error)",
+    ["outcome"],
+)
+PREFILTER_REJECTIONS = registry.counter(
+    "expense_prefilter_rejections",
+    "Messages rejected by the pre-filter before the LLM, by rule",
+    ["rule"],
+)
+LLM_PARSE_ERRORS = registry.counter(
+    "expense_llm_parse_errors", "LLM answers that were not valid JSON"
+)
+CATEGORY_COERCED = registry.counter(
+    "expense_category_coerced",
+    'Expenses with a category outside EXPENSE_CATEGORIES, stored as "Other"',
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds",
+    "Execution time of SQL statements by statement type",
+    ["statement"],
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, including waits for a free one",
+    buckets=DB_BUCKETS,
+)
+DB_POOL_WAITS = registry.counter(
+    "db_pool_waits", "Checkouts that found the pool at capacity and waited"
+)
+DB_POOL_TIMEOUTS = registry.counter(
+    "db_pool_timeouts", "Checkouts that gave up after DB_POOL_TIMEOUT seconds"
+)
+DB_POOL_CONNECTS = registry.counter(
+    "db_pool_connects", "Database connections opened, including replacements"
+)
+DB_POOL_PRE_PINGS = registry.counter(
+    "db_pool_pre_pings",
+    "Pings of connections idle for DB_POOL_PRE_PING_IDLE seconds, by result",
+    ["result"],
+)
+IMPORTED_ROWS = registry.counter(
+    "expense_import_rows",
+    "Bank statement rows imported, by outcome (local, llm, skipped, invalid)",
+    ["outcome"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing request latency per route template, so
+    ``/v1/expenses/{telegram_id}`` is one series whatever the user.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - start)
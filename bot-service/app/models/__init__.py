@@ -1,2 +1,6 @@
+from .analysis_cache import *
+from .expense_imports import *
+from .expense_jobs import *
+from .expense_rollups import *
 from .expenses import *
 from .users import *
@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field
+
+from app.db import SQLBaseModelAudit
+
+
+class AnalysisCacheEntries(SQLBaseModelAudit, table=True):
+    __tablename__ = "analysis_cache"
+
+    key: str = Field(primary_key=True, max_length=64)
+    fingerprint: str = Field(nullable=False, index=True, max_length=64)
+    result: Optional[str] = Field(default=None, nullable=True)
+    expires_at: datetime = Field(nullable=False)
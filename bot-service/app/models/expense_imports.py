@@ -0,0 +1,66 @@
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic import Field as PydanticField
+from sqlmodel import Field
+
+from app.db import SQLBaseModelAudit
+
+
+class ImportStatus(str, Enum):
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class StatementColumns(BaseModel):
+    """Where the fields of an expense are in a bank statement CSV."""
+
+    description_column: str = PydanticField("description", min_length=1)
+    amount_column: str = PydanticField("amount", min_length=1)
+    date_column: Optional[str] = None
+    category_column: Optional[str] = None
+    date_format: Optional[str] = PydanticField(
+        None, description="strptime format of the dates, ISO 8601 when not set"
+    )
+    delimiter: str = PydanticField(",", min_length=1, max_length=1)
+    debits_negative: bool = PydanticField(
+        True,
+        description="Expenses are negative amounts and positive ones are "
+        "skipped; when false, every non-zero amount is an expense",
+    )
+
+
+class ExpenseImports(SQLBaseModelAudit, table=True):
+    __tablename__ = "expense_imports"
+
+    id: int = Field(primary_key=True)
+    user_id: int = Field(foreign_key="users.id", nullable=False)
+    status: str = Field(default=ImportStatus.RUNNING, nullable=False, max_length=16)
+    # StatementColumns as JSON; a resumed import must use the same mapping
+    columns: str = Field(nullable=False)
+    # Data rows of the file whose expenses are committed, resumed after
+    rows_done: int = Field(default=0, nullable=False)
+    created: int = Field(default=0, nullable=False)
+    # Categorized by the LLM instead of local rules
+    llm_rows: int = Field(default=0, nullable=False)
+    # Credits, or rows the LLM did not consider an expense
+    skipped: int = Field(default=0, nullable=False)
+    invalid: int = Field(default=0, nullable=False)
+    error: Optional[str] = Field(default=None, nullable=True)
+
+
+class ExpenseImportResponse(BaseModel):
+    id: int
+    status: ImportStatus
+    rows_done: int
+    created: int
+    llm_rows: int
+    skipped: int
+    invalid: int
+    # Rows read by this request and its throughput
+    rows: int
+    elapsed_s: float
+    rows_per_second: float
+    error: Optional[str] = None
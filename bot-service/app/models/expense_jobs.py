@@ -0,0 +1,53 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Index
+from sqlmodel import Field
+
+from app.db import SQLBaseModelAudit
+from app.models.expenses import Expenses
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    REJECTED = "rejected"
+    FAILED = "failed"
+
+
+class ExpenseJobs(SQLBaseModelAudit, table=True):
+    __tablename__ = "expense_jobs"
+    __table_args__ = (
+        Index("ix_expense_jobs_status_locked_until", "status", "locked_until"),
+    )
+
+    id: int = Field(primary_key=True)
+    user_id: int = Field(foreign_key="users.id", nullable=False)
+    telegram_id: str = Field(nullable=False)
+    message: str = Field(nullable=False)
+    status: str = Field(default=JobStatus.PENDING, nullable=False, max_length=16)
+    attempts: int = Field(default=0, nullable=False)
+    # Lease expiry while running, earliest retry time while pending
+    locked_until: Optional[datetime] = Field(default=None, nullable=True)
+    expense_id: Optional[int] = Field(
+        default=None, foreign_key="expenses.id", nullable=True
+    )
+    error: Optional[str] = Field(default=None, nullable=True)
+
+
+class ExpenseJobAccepted(BaseModel):
+    job_id: int
+    status: JobStatus
+
+
+class ExpenseJobResponse(BaseModel):
+    id: int
+    status: JobStatus
+    attempts: int
+    expense: Optional[Expenses] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
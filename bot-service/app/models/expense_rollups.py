@@ -0,0 +1,44 @@
+from datetime import date
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel
+from sqlmodel import Field
+
+from app.db import SQLBaseModel, SQLBaseModelAudit
+
+
+class ExpenseRollups(SQLBaseModel, table=True):
+    __tablename__ = "expense_rollups"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    category: str = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    total: float = Field(nullable=False)
+    count: int = Field(nullable=False)
+
+
+class ExpenseRollupState(SQLBaseModelAudit, table=True):
+    __tablename__ = "expense_rollup_state"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+
+
+class SummaryGroupBy(str, Enum):
+    CATEGORY = "category"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class ExpenseSummaryGroup(BaseModel):
+    key: str
+    total: float
+    count: int
+
+
+class ExpenseSummary(BaseModel):
+    group_by: SummaryGroupBy
+    total: float
+    count: int
+    groups: List[ExpenseSummaryGroup]
@@ -1,11 +1,60 @@
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Index, false
 from sqlmodel import Field
 
 from app.db import SQLBaseModelAudit
 
 
+class CategorySource(str, Enum):
+    """Where the category of an expense came from."""
+
+    LLM = "llm"
+    USER = "user"
+    FAST_PATH = "fast_path"
+    CLASSIFIER = "classifier"
+    DEGRADED = "degraded"
+
+
+# Labels the classifier may learn from; the others are its own guesses
+TRUSTED_CATEGORY_SOURCES = (CategorySource.LLM, CategorySource.USER)
+
+
 class Expenses(SQLBaseModelAudit, table=True):
+    __table_args__ = (
+        Index("ix_expenses_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     id: int = Field(primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False)
     description: str = Field(nullable=False)
     amount: float = Field(nullable=False)
     category: str = Field(nullable=False)
+    # Parsed locally while the LLM was unavailable, to be analyzed again
+    needs_reanalysis: bool = Field(
+        default=False, nullable=False, sa_column_kwargs={"server_default": false()}
+    )
+    # A CategorySource; NULL for expenses stored before it was recorded
+    category_source: Optional[str] = Field(
+        default=CategorySource.LLM, nullable=True, max_length=16
+    )
+
+
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    REJECTED = "rejected"
+
+
+class BatchExpenseItem(BaseModel):
+    index: int
+    status: BatchItemStatus
+    expense: Optional[Expenses] = None
+    detail: Optional[str] = None
+
+
+class BatchExpenseResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[BatchExpenseItem]
@@ -1,11 +1,15 @@
 from enum import Enum
+from typing import Optional
 
+from app.circuit_breaker import CircuitState
 from app.db import SQLBaseModel
 
 
 class HealthStatus(str, Enum):
     HEALTHY = "healthy"
     UNHEALTHY = "unhealthy"
+    # Serving, but expenses are parsed locally while the LLM circuit is open
+    DEGRADED = "degraded"
 
 
 class HealthcheckResponse(SQLBaseModel):
@@ -14,3 +18,4 @@ class HealthcheckResponse(SQLBaseModel):
     version: str
     database: str
     expense_categories: list[str]
+    llm_circuit: Optional[CircuitState] = None
@@ -1,7 +1,20 @@
+from typing import Annotated, List
+
 from pydantic import BaseModel, Field
 
+from app.settings import settings
+
 
 class MessageRequest(BaseModel):
     message: str = Field(
         ..., min_length=1, max_length=1000, description="Message content"
     )
+
+
+class BatchMessageRequest(BaseModel):
+    messages: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.batch_max_messages,
+        description="Messages to analyze, one expense per message",
+    )
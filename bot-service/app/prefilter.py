@@ -0,0 +1,281 @@
+"""Compiled rules that reject obvious non-expense messages before the LLM."""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.settings import settings
+
+# Phrases that mark a whole message as small talk when it starts with them.
+# Accented words are listed with and without accents, as users type both.
+DEFAULT_PHRASE_RULES: Dict[str, List[str]] = {
+    "greeting": [
+        "hi",
+        "hello",
+        "hey",
+        "good morning",
+        "good afternoon",
+        "good evening",
+        "hola",
+        "buenos días",
+        "buenos dias",
+        "buenas tardes",
+        "buenas noches",
+        "buenas",
+        "bonjour",
+        "salut",
+        "olá",
+        "ola",
+        "oi",
+        "ciao",
+    ],
+    "small_talk": [
+        "how are you",
+        "what's up",
+        "how's it going",
+        "qué tal",
+        "que tal",
+        "cómo estás",
+        "como estas",
+        "cómo va",
+        "como va",
+    ],
+    "thanks": [
+        "thank you",
+        "thanks",
+        "thx",
+        "gracias",
+        "muchas gracias",
+        "merci",
+        "obrigado",
+        "obrigada",
+        "grazie",
+        "danke",
+    ],
+    "acknowledgement": [
+        "yes",
+        "no",
+        "ok",
+        "okay",
+        "sí",
+        "si",
+        "vale",
+        "claro",
+        "de acuerdo",
+    ],
+    "command": ["help", "start", "stop", "ayuda"],
+}
+
+# Spelled-out amounts. Messages without digits still reach the LLM when they
+# contain one of these ("spent twenty on lunch", "veinte en café").
+DEFAULT_NUMBER_WORDS: List[str] = [
+    # English
+    "one",
+    "two",
+    "three",
+    "four",
+    "five",
+    "six",
+    "seven",
+    "eight",
+    "nine",
+    "ten",
+    "eleven",
+    "twelve",
+    "thirteen",
+    "fourteen",
+    "fifteen",
+    "sixteen",
+    "seventeen",
+    "eighteen",
+    "nineteen",
+    "twenty",
+    "thirty",
+    "forty",
+    "fifty",
+    "sixty",
+    "seventy",
+    "eighty",
+    "ninety",
+    "hundred",
+    "thousand",
+    "dozen",
+    "grand",
+    "buck",
+    "bucks",
+    # Spanish ("un"/"una" are left out, they are mostly articles)
+    "uno",
+    "dos",
+    "tres",
+    "cuatro",
+    "cinco",
+    "seis",
+    "siete",
+    "ocho",
+    "nueve",
+    "diez",
+    "once",
+    "doce",
+    "quince",
+    "veinte",
+    "treinta",
+    "cuarenta",
+    "cincuenta",
+    "sesenta",
+    "setenta",
+    "ochenta",
+    "noventa",
+    "cien",
+    "ciento",
+    "cientos",
+    "mil",
+]
+
+# Rules whose phrases also open real expenses ("Hola, gasté 20 en café",
+# "Sí, 20 taxi"): they only reject a message when no amount follows them
+CONVERSATIONAL_RULES = frozenset(
+    ["greeting", "small_talk", "thanks", "acknowledgement"]
+)
+
+QUESTION_RULE = "question"
+NO_TEXT_RULE = "no_text"
+NO_AMOUNT_RULE = "no_amount"
+
+_TEXT_RE = re.compile(r"[^\W_]")
+_DIGIT_RE = re.compile(r"\d")
+
+
+class PreFilterStats:
+    """Counters of messages rejected by each rule, i.e. LLM calls saved."""
+
+    def __init__(self, rules: Iterable[str]):
+        self.checked = 0
+        self.rules: Dict[str, int] = {rule: 0 for rule in rules}
+
+    @property
+    def filtered(self) -> int:
+        return sum(self.rules.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "checked": self.checked,
+            "filtered": self.filtered,
+            "filter_rate": (
+                round(self.filtered / self.checked, 4) if self.checked else 0.0
+            ),
+            "rules": dict(self.rules),
+        }
+
+
+class PreFilter:
+    """Reject messages that obviously are not expenses.
+
+    Every phrase rule is compiled, together with the leading ``?`` check,
+    into one anchored alternation with a named group per rule, so a message
+    is matched once regardless of the number of rules. Phrases of
+    ``CONVERSATIONAL_RULES`` only reject a message when the rest of it has
+    no amount. Messages without any letter or digit (emoji, punctuation)
+    and messages without a digit or number word are rejected as well.
+    """
+
+    def __init__(
+        self,
+        phrase_rules: Optional[Dict[str, List[str]]] = None,
+        number_words: Optional[List[str]] = None,
+    ):
+        phrase_rules = DEFAULT_PHRASE_RULES if phrase_rules is None else phrase_rules
+        number_words = DEFAULT_NUMBER_WORDS if number_words is None else number_words
+        self._group_rules: Dict[str, str] = {}
+        self._phrases_re = self._compile_phrases(phrase_rules)
+        self._number_words_re = re.compile(
+            r"\b" + self._alternation(number_words) + r"\b"
+        )
+        self.stats = PreFilterStats(
+            [*phrase_rules, QUESTION_RULE, NO_TEXT_RULE, NO_AMOUNT_RULE]
+        )
+
+    @classmethod
+    def from_settings(cls) -> "PreFilter":
+        """Default rules extended by ``PREFILTER_RULES``/``PREFILTER_RULES_FILE``."""
+        phrase_rules = {
+            rule: list(phrases) for rule, phrases in DEFAULT_PHRASE_RULES.items()
+        }
+        extra_rules = dict(settings.prefilter_rules)
+        if settings.prefilter_rules_file:
+            with open(settings.prefilter_rules_file) as f:
+                extra_rules.update(json.load(f))
+        number_words = DEFAULT_NUMBER_WORDS + extra_rules.pop("number_words", [])
+        for rule, phrases in extra_rules.items():
+            phrase_rules.setdefault(rule, []).extend(phrases)
+        return cls(phrase_rules, number_words)
+
+    def _compile_phrases(self, phrase_rules: Dict[str, List[str]]) -> re.Pattern:
+        branches = []
+        for index, (rule, phrases) in enumerate(phrase_rules.items()):
+            if not phrases:
+                continue
+            group = f"rule{index}"
+            self._group_rules[group] = rule
+            # A phrase must end at a word boundary: "hi" but not "history"
+            branches.append(f"(?P<{group}>{self._alternation(phrases)})(?!\\w)")
+        self._group_rules["question"] = QUESTION_RULE
+        branches.append(r"(?P<question>\?)")
+        # Leading whitespace and Spanish opening marks are skipped
+        return re.compile(r"[\s¿¡]*(?:" + "|".join(branches) + ")")
+
+    @staticmethod
+    def _alternation(words: Iterable[str]) -> str:
+        """Regex matching any of ``words``, factored into a prefix trie.
+
+        Branches share their common prefixes, so matching costs one pass
+        over the message instead of one attempt per word.
+        """
+        trie: Dict[str, Any] = {}
+        for word in {word.lower() for word in words}:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        def pattern(node: Dict[str, Any]) -> str:
+            # Longer continuations first so "buenas tardes" wins over "buenas"
+            branches = [
+                re.escape(char) + pattern(child)
+                for char, child in sorted(node.items(), reverse=True)
+                if char
+            ]
+            optional = "" in node
+            if not branches:
+                return ""
+            if len(branches) == 1 and not optional:
+                return branches[0]
+            return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+        return pattern(trie)
+
+    def match(self, message: str) -> Optional[str]:
+        """Return the name of the rule rejecting ``message``, or None."""
+        self.stats.checked += 1
+        rule = self._match(message)
+        if rule is not None:
+            self.stats.rules[rule] += 1
+        return rule
+
+    def _match(self, message: str) -> Optional[str]:
+        message = message.lower()
+        phrase = self._phrases_re.match(message)
+        if phrase:
+            rule = self._group_rules[phrase.lastgroup]  # type: ignore
+            if rule not in CONVERSATIONAL_RULES or not self._has_amount(
+                message[phrase.end() :]
+            ):
+                return rule
+        if not _TEXT_RE.search(message):
+            return NO_TEXT_RULE
+        if not self._has_amount(message):
+            return NO_AMOUNT_RULE
+        return None
+
+    def _has_amount(self, text: str) -> bool:
+        """Whether ``text`` has a digit or a spelled-out number."""
+        return bool(_DIGIT_RE.search(text) or self._number_words_re.search(text))
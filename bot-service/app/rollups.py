@@ -0,0 +1,170 @@
+"""Per-user daily spending rollups backing the expense summary."""
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, func, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.expense_rollups import (
+    ExpenseRollups,
+    ExpenseRollupState,
+    ExpenseSummary,
+    ExpenseSummaryGroup,
+    SummaryGroupBy,
+)
+from app.models.expenses import Expenses
+from app.models.users import Users
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+UPSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+PERIOD_START: Dict[SummaryGroupBy, Callable[[date], date]] = {
+    SummaryGroupBy.DAY: lambda day: day,
+    SummaryGroupBy.WEEK: lambda day: day - timedelta(days=day.weekday()),
+    SummaryGroupBy.MONTH: lambda day: day.replace(day=1),
+}
+
+
+async def add_to_rollups(
+    session: AsyncSession, user_id: int, expenses: Sequence[Expenses]
+) -> None:
+    """
+    Add new expenses to the user's rollups in the caller's transaction.
+
+    Users that were never summarized have no rollups yet; their expenses are
+    picked up by ``ensure_rollups`` instead. The share lock on the user row
+    keeps a concurrent backfill from missing expenses of this transaction.
+    """
+    if not expenses:
+        return
+    rolled_up = (
+        await session.exec(
+            select(ExpenseRollupState.user_id)
+            .select_from(Users)
+            .outerjoin(ExpenseRollupState, ExpenseRollupState.user_id == Users.id)  # type: ignore
+            .where(Users.id == user_id)
+            .with_for_update(read=True, of=Users)  # type: ignore
+        )
+    ).first()
+    if rolled_up is None:
+        return
+
+    totals: Dict[Tuple[str, date], List] = defaultdict(lambda: [0.0, 0])
+    for expense in expenses:
+        bucket = totals[(expense.category, expense.created_at.date())]
+        bucket[0] += float(expense.amount)
+        bucket[1] += 1
+
+    insert = UPSERTS[session.get_bind().dialect.name]
+    statement = insert(ExpenseRollups).values(
+        [
+            {
+                "user_id": user_id,
+                "category": category,
+                "day": day,
+                "total": total,
+                "count": count,
+            }
+            for (category, day), (total, count) in totals.items()
+        ]
+    )
+    columns = ExpenseRollups.__table__.c  # type: ignore
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "category", "day"],
+        set_={
+            "total": columns.total + statement.excluded.total,
+            "count": columns.count + statement.excluded.count,
+        },
+    )
+    await session.exec(statement)  # type: ignore
+
+
+async def ensure_rollups(session: AsyncSession, user_id: int) -> None:
+    """
+    Seed the user's rollups from their raw expenses if not done yet.
+
+    This is the one GROUP BY over the user's full history; afterwards every
+    insert keeps the rollups current. Commits when it seeds anything.
+    """
+    if await session.get(ExpenseRollupState, user_id):
+        return
+    # Wait for in-flight inserts of this user and block new ones until the
+    # rollups are committed
+    await session.exec(select(Users.id).where(Users.id == user_id).with_for_update())
+    if await session.get(ExpenseRollupState, user_id):
+        return
+
+    day = type_coerce(func.date(Expenses.created_at), Date)
+    rows = (
+        await session.exec(
+            select(Expenses.category, day, func.sum(Expenses.amount), func.count())
+            .where(Expenses.user_id == user_id)
+            .group_by(Expenses.category, day)
+        )
+    ).all()
+    session.add_all(
+        ExpenseRollups(
+            user_id=user_id, category=category, day=day, total=total, count=count
+        )
+        for category, day, total, count in rows
+    )
+    session.add(ExpenseRollupState(user_id=user_id))
+    await session.commit()
+    logger.info(f"Seeded {len(rows)} expense rollups for user {user_id}")
+
+
+async def summarize(
+    session: AsyncSession,
+    user_id: int,
+    group_by: SummaryGroupBy,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+) -> ExpenseSummary:
+    """
+    Sum the user's expenses per category or period from the daily rollups.
+
+    Days are UTC days and weeks start on Monday. ``start`` is inclusive and
+    ``end`` exclusive. Reads one row per day and category at most, however
+    many expenses the user has.
+    """
+    key_column = (
+        ExpenseRollups.category
+        if group_by == SummaryGroupBy.CATEGORY
+        else ExpenseRollups.day
+    )
+    query = select(
+        key_column, func.sum(ExpenseRollups.total), func.sum(ExpenseRollups.count)
+    ).where(ExpenseRollups.user_id == user_id)
+    if start:
+        query = query.where(ExpenseRollups.day >= start)
+    if end:
+        query = query.where(ExpenseRollups.day < end)
+    if category:
+        query = query.where(ExpenseRollups.category == category)
+    query = query.group_by(key_column).order_by(key_column)
+    rows = (await session.exec(query)).all()
+
+    groups: Dict[str, ExpenseSummaryGroup] = {}
+    for key, total, count in rows:
+        if group_by != SummaryGroupBy.CATEGORY:
+            key = PERIOD_START[group_by](key).isoformat()
+        group = groups.setdefault(key, ExpenseSummaryGroup(key=key, total=0, count=0))
+        group.total += total
+        group.count += count
+    return ExpenseSummary(
+        group_by=group_by,
+        total=sum(group.total for group in groups.values()),
+        count=sum(group.count for group in groups.values()),
+        groups=list(groups.values()),
+    )
@@ -1,7 +1,8 @@
 """Configuration management for the Bot Service."""
 
-from typing import List
+from typing import Dict, List, Optional
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -15,12 +16,131 @@ class Settings(BaseSettings):
     postgres_port: str
     postgres_db: str
     database_url: str
+    # Connection pool profile (default, dev, production or pgbouncer) and
+    # overrides of its values
+    db_pool_profile: str = "default"
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    db_pool_timeout: Optional[float] = None  # seconds
+    db_pool_recycle: Optional[int] = None  # seconds
+    db_pool_pre_ping: Optional[str] = None  # always, idle or never
+    db_pool_pre_ping_idle: Optional[float] = None  # seconds
 
     # LLM Configuration
     openai_api_key: str
     llm_model: str = "gpt-3.5-turbo"
+    # OpenAI-compatible endpoint, e.g. a local fake server for load tests
+    openai_base_url: Optional[str] = None
     huggingfacehub_api_token: str
     huggingfacehub_model: str
+    # "openai", "huggingface" or a "package.module:factory" path called with
+    # the model name; defaults to huggingface in dev and openai otherwise
+    llm_backend: Optional[str] = None
+    # Import the backend in the background once the service is up, instead
+    # of on the first message
+    llm_preload: bool = True
+
+    # Chat models as "openai:<model>" or "huggingface:<model>". With two or
+    # more, each call goes to the fastest one and is hedged on the next.
+    llm_providers: List[str] = []
+    llm_hedge_budget: float = 0.1  # fraction of calls that may be hedged
+    llm_hedge_initial_delay_ms: int = 2000
+
+    # Pre-filter of obvious non-expenses, extra phrases per rule and an
+    # optional JSON file in the same format ("number_words" extends those)
+    prefilter_rules: Dict[str, List[str]] = {}
+    prefilter_rules_file: Optional[str] = None
+
+    # Fast path (local parsing before the LLM)
+    fast_path_enabled: bool = True
+    fast_path_keywords: Dict[str, List[str]] = {}
+
+    # Category classifier learned from stored expenses, used instead of the
+    # LLM when confident and to cross-check its answers
+    classifier_enabled: bool = True
+    classifier_threshold: float = 0.9
+    classifier_min_user_examples: int = 20
+    classifier_min_global_examples: int = 200
+    classifier_global_features: int = 65536
+    classifier_user_features: int = 1024
+    classifier_max_user_models: int = 2000
+    # Ids rescanned by each training, for expenses committed out of id order
+    classifier_train_overlap: int = 5000
+    classifier_retrain_interval: int = 300  # seconds
+    classifier_model_path: Optional[str] = None
+
+    # LLM result cache
+    analysis_cache_enabled: bool = True
+    analysis_cache_size: int = 10000
+    analysis_cache_ttl: int = 86400  # seconds
+    analysis_cache_negative_ttl: int = 3600  # seconds
+    analysis_cache_db_enabled: bool = False
+
+    # Batch analysis
+    batch_max_messages: int = 100
+    llm_batch_size: int = 10
+
+    # Stream single-message answers and stop once the JSON object is complete
+    llm_streaming_enabled: bool = False
+
+    # Circuit breaker around LLM calls; while open, expenses are parsed
+    # locally and marked for re-analysis
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_slow_call_ms: int = 10000
+    circuit_breaker_window: int = 20
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_open_seconds: int = 30
+
+    # Micro-batching of concurrent single-message analyses
+    microbatch_enabled: bool = False
+    microbatch_window_ms: int = 20
+    microbatch_max_size: int = 10
+
+    # Expense listing
+    expenses_page_size: int = 100
+    expenses_max_page_size: int = 1000
+    export_batch_size: int = 1000
+
+    # Bank statement import, rows committed per transaction; running imports
+    # without progress for import_stale_after can be resumed by another request
+    import_chunk_size: int = 1000
+    import_stale_after: int = 300  # seconds
+    # LLM batches an import sends at once; keep it below
+    # admission_max_queue_per_user, or the import is rejected by its own calls
+    import_llm_concurrency: int = 4
+
+    # LLM admission control
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 16
+    admission_max_queue: int = 256
+    admission_max_queue_per_user: int = 32
+    admission_queue_timeout: float = 10.0  # seconds
+
+    # Asynchronous expense jobs, workers per replica (0 disables them). Off by
+    # default: enable it on the replicas that should process ?async=true jobs
+    expense_job_workers: int = 0
+    expense_job_poll_interval: float = 1.0  # seconds
+    expense_job_lease: int = 120  # seconds
+    expense_job_max_attempts: int = 3
+
+    # telegram_id -> user cache, 0 disables it
+    user_cache_size: int = 10000
+    user_cache_ttl: int = 300  # seconds
+    user_cache_negative_ttl: int = 5  # seconds
+
+    # Prometheus metrics at /metrics and per-route request latency
+    metrics_enabled: bool = True
+
+    # Per-request tracing; slow and failed requests are always exported,
+    # others with probability tracing_sample_rate
+    tracing_enabled: bool = False
+    tracing_header: str = "X-Trace-Id"
+    tracing_exporter: str = "json"  # json, memory or "package.module:factory"
+    tracing_file: str = "traces.jsonl"
+    tracing_slow_ms: int = 2000
+    tracing_sample_rate: float = 0.01
+    tracing_max_spans: int = 1000
 
     # Server Configuration
     host: str = "0.0.0.0"
@@ -37,6 +157,18 @@ class Settings(BaseSettings):
     api_key_header: str
     api_key_secret: str
 
+    @field_validator("llm_providers")
+    @classmethod
+    def _check_provider_specs(cls, specs: List[str]) -> List[str]:
+        for spec in specs:
+            backend, _, model = spec.partition(":")
+            if not backend or not model:
+                raise ValueError(
+                    f'LLM_PROVIDERS entry "{spec}" must be "<backend>:<model>", '
+                    'e.g. "openai:gpt-4o-mini"'
+                )
+        return specs
+
     class Config:
         case_sensitive = False
 
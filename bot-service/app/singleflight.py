@@ -0,0 +1,72 @@
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """A shared call and the number of callers still waiting on it."""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: "asyncio.Future[Any]"):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """
+    Run at most one call per key at a time, sharing its result.
+
+    Callers arriving while a call for their key is in flight await the same
+    task instead of starting another. Each caller waits through a shield, so
+    cancelling one of them never cancels the call the others are waiting on;
+    cancelling the last one cancels the call, which nobody needs any more.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(call()))
+            flight.future.add_done_callback(lambda done: self._finish(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.future.done():
+                # The last waiter was cancelled
+                self._forget(key, flight.future)
+                flight.future.cancel()
+                self.cancelled += 1
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        flight = self._in_flight.get(key)
+        if flight is not None and flight.future is future:
+            del self._in_flight[key]
+
+    def _finish(self, key: Hashable, future: "asyncio.Future[T]") -> None:
+        self._forget(key, future)
+        # Retrieve the exception so it is not reported as never retrieved
+        # when every caller was cancelled
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,69 @@
+"""
+Startup report: how long the service took from the first ``app`` import to
+serving, split in phases, and the memory it holds once up. Logged when the
+lifespan startup finished and returned under ``startup`` by ``GET /stats``.
+"""
+
+import logging
+import resource
+import sys
+import time
+from typing import Any, Dict
+
+from app import STARTED, llm_providers
+
+logger = logging.getLogger(__name__)
+
+# Packages only a configured LLM backend should pull in
+PROVIDER_MODULES = (
+    "langchain",
+    "langchain_openai",
+    "langchain_huggingface",
+    "huggingface_hub",
+    "transformers",
+)
+
+
+def max_rss_mb() -> float:
+    """Peak resident memory of the process, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StartupReport:
+    """Seconds spent in each startup phase, in the order they were marked."""
+
+    def __init__(self, origin: float = STARTED):
+        self.origin = origin
+        self.phases: Dict[str, float] = {}
+        self._last = origin
+
+    def mark(self, phase: str) -> None:
+        """End ``phase`` now; it started when the previous phase ended."""
+        now = time.perf_counter()
+        self.phases[phase] = round(now - self._last, 3)
+        self._last = now
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "phases": dict(self.phases),
+            "ready_s": round(self._last - self.origin, 3),
+            "max_rss_mb": max_rss_mb(),
+            "modules": len(sys.modules),
+            "provider_modules": [m for m in PROVIDER_MODULES if m in sys.modules],
+            "llm_backends": dict(llm_providers.import_seconds),
+        }
+
+    def log(self) -> None:
+        report = self.as_dict()
+        phases = ", ".join(
+            f"{name} {seconds}s" for name, seconds in self.phases.items()
+        )
+        logger.info(
+            f"Ready in {report['ready_s']}s ({phases}), "
+            f"{report['max_rss_mb']} MB resident, {report['modules']} modules"
+        )
+
+
+startup = StartupReport()
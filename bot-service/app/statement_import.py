@@ -0,0 +1,537 @@
+"""Streaming import of bank statement CSV exports."""
+
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import metrics
+from app.db import utcnow
+from app.expense_analyzer import ExpenseAnalyzer
+from app.fast_parser import FastPathParser
+from app.models.expense_imports import (
+    ExpenseImportResponse,
+    ExpenseImports,
+    ImportStatus,
+    StatementColumns,
+)
+from app.models.expenses import CategorySource, Expenses
+from app.pagination import to_naive_utc
+from app.rollups import add_to_rollups
+from app.settings import settings
+from app.tracing import span
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Columns written by COPY, in order
+COPY_COLUMNS = (
+    "user_id",
+    "description",
+    "amount",
+    "category",
+    "needs_reanalysis",
+    "category_source",
+    "created_at",
+    "updated_at",
+)
+# Categories the LLM gave to descriptions of the import, reused for later
+# rows with the same description
+MAX_LEARNED_DESCRIPTIONS = 10000
+# Characters of one record, beyond which an open quote is taken as unterminated
+MAX_RECORD_LENGTH = 64 * 1024
+_NOT_AMOUNT_RE = re.compile(r"[^\d,.]")
+
+
+class InvalidStatement(ValueError):
+    """The file cannot be imported at all, e.g. a mapped column is missing."""
+
+
+class ImportConflict(Exception):
+    """The import cannot be resumed, or was taken over by another request."""
+
+
+class StatementRow(NamedTuple):
+    description: str
+    amount: float
+    created_at: Optional[datetime]
+    category: Optional[str]
+
+
+async def read_records(
+    chunks: AsyncIterable[bytes],
+    delimiter: str = ",",
+    max_record_length: int = MAX_RECORD_LENGTH,
+) -> AsyncIterator[List[str]]:
+    """
+    Parse CSV records from a byte stream as it arrives, without holding more
+    than the current chunk and one incomplete record. Quoted fields may span
+    lines; a record is complete at a line end where its quotes balance, so
+    a stray quote would hold the rest of the upload: an incomplete record
+    longer than ``max_record_length`` fails with ``InvalidStatement``.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        end = _complete_records_end(buffer)
+        if end:
+            for record in _parse(buffer[:end], delimiter):
+                yield record
+            buffer = buffer[end:]
+        if len(buffer) > max_record_length:
+            raise InvalidStatement(
+                f"Unterminated quoted field, or a record longer than "
+                f"{max_record_length} characters"
+            )
+    buffer += decoder.decode(b"", final=True)
+    for record in _parse(buffer, delimiter):
+        yield record
+
+
+def _complete_records_end(text: str) -> int:
+    """Offset after the last line end that is outside quotes, or 0."""
+    end = start = 0
+    quoted = False
+    while (newline := text.find("\n", start)) != -1:
+        # Escaped quotes come in pairs and leave the parity alone
+        quoted ^= text.count('"', start, newline) % 2 == 1
+        if not quoted:
+            end = newline + 1
+        start = newline + 1
+    return end
+
+
+def _parse(text: str, delimiter: str) -> List[List[str]]:
+    reader = csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)
+    return [record for record in reader if any(field.strip() for field in record)]
+
+
+def column_indices(header: Sequence[str], columns: StatementColumns) -> Dict[str, int]:
+    """Positions of the mapped columns, matched case-insensitively."""
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    mapped = {
+        "description": columns.description_column,
+        "amount": columns.amount_column,
+        "date": columns.date_column,
+        "category": columns.category_column,
+    }
+    indices = {}
+    missing = []
+    for field, name in mapped.items():
+        if name is None:
+            continue
+        if name.strip().lower() not in positions:
+            missing.append(name)
+        else:
+            indices[field] = positions[name.strip().lower()]
+    if missing:
+        raise InvalidStatement(f"Missing columns: {', '.join(missing)}")
+    return indices
+
+
+def parse_amount(raw: str) -> Decimal:
+    """
+    Signed amount of a statement cell such as "-1.234,56 €", "(12.50)" or
+    "12.50-", with either locale's separators.
+    """
+    text = raw.strip()
+    negative = "-" in text or (text.startswith("(") and text.endswith(")"))
+    amount = FastPathParser.parse_amount(_NOT_AMOUNT_RE.sub("", text))
+    if amount is None:
+        raise ValueError(f"Invalid amount: {raw!r}")
+    return -amount if negative else amount
+
+
+def parse_row(
+    record: Sequence[str], indices: Dict[str, int], columns: StatementColumns
+) -> Optional[StatementRow]:
+    """
+    Expense of a statement record, or None for credits and zero amounts.
+
+    Raises:
+        ValueError: if the description, amount or date cannot be read
+    """
+    if len(record) <= max(indices.values()):
+        raise ValueError("Missing fields")
+    description = " ".join(record[indices["description"]].split())
+    if not description:
+        raise ValueError("Empty description")
+
+    amount = parse_amount(record[indices["amount"]])
+    if columns.debits_negative:
+        amount = -amount
+    elif amount < 0:
+        amount = -amount
+    if amount <= 0:
+        return None
+
+    created_at = None
+    if "date" in indices:
+        raw_date = record[indices["date"]].strip()
+        created_at = to_naive_utc(
+            datetime.strptime(raw_date, columns.date_format)
+            if columns.date_format
+            else datetime.fromisoformat(raw_date)
+        )
+
+    category = None
+    if "category" in indices:
+        known = {name.lower(): name for name in settings.expense_categories}
+        category = known.get(record[indices["category"]].strip().lower())
+
+    return StatementRow(
+        description=description[:200],
+        amount=float(amount),
+        created_at=created_at,
+        category=category,
+    )
+
+
+async def start_import(
+    session_maker: async_sessionmaker[AsyncSession],
+    user_id: int,
+    columns: StatementColumns,
+    import_id: Optional[int] = None,
+    stale_after: int = settings.import_stale_after,
+) -> ExpenseImports:
+    """
+    Create an import, or take over ``import_id`` to resume it: a failed one,
+    or a running one whose last chunk is older than ``stale_after`` seconds
+    (its request died with the process).
+
+    Raises:
+        LookupError: if ``import_id`` is not an import of the user
+        ImportConflict: if it cannot be resumed
+    """
+    async with session_maker() as session:
+        if import_id is None:
+            job = ExpenseImports(user_id=user_id, columns=columns.model_dump_json())
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            return job
+
+        job = await session.get(ExpenseImports, import_id)
+        if job is None or job.user_id != user_id:
+            raise LookupError(f"Import {import_id} not found")
+        if job.columns != columns.model_dump_json():
+            raise ImportConflict("Resumed imports must use the same columns")
+        now = utcnow()
+        resumed = await session.exec(
+            update(ExpenseImports)  # type: ignore
+            .where(
+                ExpenseImports.id == import_id,  # type: ignore
+                or_(
+                    ExpenseImports.status == ImportStatus.FAILED,  # type: ignore
+                    (ExpenseImports.status == ImportStatus.RUNNING)  # type: ignore
+                    & (
+                        ExpenseImports.updated_at  # type: ignore
+                        <= now - timedelta(seconds=stale_after)
+                    ),
+                ),
+            )
+            .values(status=ImportStatus.RUNNING, error=None, updated_at=now)
+        )
+        if resumed.rowcount != 1:
+            raise ImportConflict(f"Import {import_id} is {job.status}")
+        await session.commit()
+        await session.refresh(job)
+        return job
+
+
+async def insert_expenses(session: AsyncSession, expenses: Sequence[Expenses]) -> None:
+    """
+    Insert expenses in the session's transaction: with ``COPY`` on asyncpg,
+    otherwise as multi-row ``INSERT`` statements. Ids are not fetched.
+    """
+    connection = await session.connection()
+    rows = [
+        {column: getattr(expense, column) for column in COPY_COLUMNS}
+        for expense in expenses
+    ]
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(  # type: ignore
+            Expenses.__tablename__,
+            records=[tuple(row.values()) for row in rows],
+            columns=COPY_COLUMNS,
+        )
+    else:
+        await session.exec(insert(Expenses), params=rows)  # type: ignore
+
+
+class StatementImporter:
+    """
+    Imports the rows of one statement for an import started by
+    ``start_import``, ``chunk_size`` rows per transaction.
+
+    Rows are categorized by the statement's category column, the fast path
+    keywords or a confident classifier prediction first. The rest are sent
+    to the LLM in packed batches, one message per distinct description and
+    ``IMPORT_LLM_CONCURRENCY`` batches at a time, and the answer is reused
+    for later rows with the same description. Each chunk commits its
+    expenses together with the import's progress, so a failed import, LLM
+    errors included, resumes after the last committed row.
+    """
+
+    def __init__(
+        self,
+        analyzer: ExpenseAnalyzer,
+        session_maker: async_sessionmaker[AsyncSession],
+        job: ExpenseImports,
+        telegram_id: str,
+        chunk_size: int = settings.import_chunk_size,
+    ):
+        self.analyzer = analyzer
+        self.session_maker = session_maker
+        self.job = job
+        self.telegram_id = telegram_id
+        self.columns = StatementColumns.model_validate_json(job.columns)
+        self.chunk_size = chunk_size
+        self.learned: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.rows = 0
+
+    async def run(self, chunks: AsyncIterable[bytes]) -> None:
+        """Import the statement; the import is marked failed on any error."""
+        try:
+            await self._import(chunks)
+        except BaseException as e:
+            await self._fail(e)
+            raise
+
+    async def _import(self, chunks: AsyncIterable[bytes]) -> None:
+        records = read_records(chunks, self.columns.delimiter)
+        header = await anext(records, None)
+        if header is None:
+            raise InvalidStatement("Empty statement")
+        indices = column_indices(header, self.columns)
+
+        skip = self.job.rows_done
+        chunk: List[List[str]] = []
+        async for record in records:
+            if skip:
+                skip -= 1
+                continue
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                await self._import_chunk(chunk, indices)
+                chunk = []
+        if chunk:
+            await self._import_chunk(chunk, indices)
+        await self._save(status=ImportStatus.DONE)
+
+    async def _import_chunk(
+        self, records: List[List[str]], indices: Dict[str, int]
+    ) -> None:
+        rows: List[StatementRow] = []
+        counts = {"created": 0, "llm_rows": 0, "skipped": 0, "invalid": 0}
+        for record in records:
+            try:
+                row = parse_row(record, indices, self.columns)
+            except ValueError as e:
+                counts["invalid"] += 1
+                logger.debug(f"Invalid statement row in import {self.job.id}: {e}")
+                continue
+            if row is None:
+                counts["skipped"] += 1
+            else:
+                rows.append(row)
+
+        expenses = []
+        for row, (result, by_llm) in zip(rows, await self._categorize(rows)):
+            counts["llm_rows"] += by_llm
+            if result is None:
+                counts["skipped"] += 1
+                continue
+            expense = Expenses(
+                user_id=self.job.user_id,
+                description=row.description,
+                amount=row.amount,
+                **result,
+            )
+            if row.created_at:
+                expense.created_at = row.created_at
+            expenses.append(expense)
+        counts["created"] = len(expenses)
+
+        with span("import.write", rows=len(expenses)):
+            await self._save(expenses, rows=len(records), **counts)
+        self.rows += len(records)
+        metrics.IMPORTED_ROWS.labels("local").inc(len(expenses) - counts["llm_rows"])
+        metrics.IMPORTED_ROWS.labels("llm").inc(counts["llm_rows"])
+        metrics.IMPORTED_ROWS.labels("skipped").inc(counts["skipped"])
+        metrics.IMPORTED_ROWS.labels("invalid").inc(counts["invalid"])
+
+    async def _categorize(self, rows: List[StatementRow]) -> List[tuple]:
+        """
+        ``(expense fields or None when not an expense, categorized by the
+        LLM)`` per row.
+        """
+        results: List[tuple] = [None] * len(rows)
+        unresolved: Dict[str, List[int]] = {}
+        for index, row in enumerate(rows):
+            categorized = (
+                (row.category, CategorySource.USER)
+                if row.category
+                else self.analyzer.categorize(row.description, self.telegram_id)
+            )
+            key = row.description.lower()
+            if categorized:
+                category, source = categorized
+                results[index] = (
+                    {"category": category, "category_source": source},
+                    False,
+                )
+            elif key in self.learned:
+                results[index] = (self.learned[key], True)
+            else:
+                unresolved.setdefault(key, []).append(index)
+
+        keys = list(unresolved)
+        messages = [
+            f"{rows[unresolved[key][0]].description} {rows[unresolved[key][0]].amount:.2f}"
+            for key in keys
+        ]
+        size = settings.llm_batch_size
+        slots = asyncio.Semaphore(settings.import_llm_concurrency)
+
+        async def analyze(batch: List[str]) -> List[Optional[Dict[str, Any]]]:
+            async with slots:
+                # An LLM error fails the chunk, which is retried on resume,
+                # rather than skipping its rows as non-expenses. Rows are
+                # transactions, not chat messages, and were already tried
+                # locally, so they skip the prefilter
+                return await self.analyzer.analyze_messages(
+                    batch, self.telegram_id, raise_errors=True, prefilter=False
+                )
+
+        tasks = [
+            asyncio.create_task(analyze(messages[start : start + size]))
+            for start in range(0, len(messages), size)
+        ]
+        try:
+            answers = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for key, answer in zip(keys, chain.from_iterable(answers)):
+            result = (
+                {
+                    "category": answer["category"],
+                    "needs_reanalysis": answer.get("needs_reanalysis", False),
+                    "category_source": answer.get(
+                        "category_source", CategorySource.LLM
+                    ),
+                }
+                if answer
+                else None
+            )
+            # Degraded guesses are not worth repeating
+            if not (result and result["needs_reanalysis"]):
+                if len(self.learned) < MAX_LEARNED_DESCRIPTIONS:
+                    self.learned[key] = result
+            for index in unresolved[key]:
+                results[index] = (result, True)
+        return results
+
+    async def _save(
+        self,
+        expenses: Sequence[Expenses] = (),
+        status: ImportStatus = ImportStatus.RUNNING,
+        rows: int = 0,
+        **counts: int,
+    ) -> None:
+        """
+        Commit a chunk's expenses with the import's progress. Nothing is
+        written if another request took the import over.
+        """
+        async with self.session_maker() as session:
+            # The progress update is also the first statement of the
+            # transaction, which COPY must run in
+            saved = await session.exec(
+                update(ExpenseImports)  # type: ignore
+                .where(
+                    ExpenseImports.id == self.job.id,  # type: ignore
+                    ExpenseImports.status == ImportStatus.RUNNING,  # type: ignore
+                    ExpenseImports.rows_done == self.job.rows_done,  # type: ignore
+                )
+                .values(
+                    status=status,
+                    rows_done=self.job.rows_done + rows,
+                    updated_at=utcnow(),
+                    **{
+                        name: getattr(ExpenseImports, name) + count
+                        for name, count in counts.items()
+                    },
+                )
+            )
+            if saved.rowcount != 1:
+                await session.rollback()
+                raise ImportConflict(f"Import {self.job.id} was taken over")
+            if expenses:
+                await insert_expenses(session, expenses)
+                await add_to_rollups(session, self.job.user_id, expenses)
+            await session.commit()
+
+        self.job.status = status
+        self.job.rows_done += rows
+        for name, count in counts.items():
+            setattr(self.job, name, getattr(self.job, name) + count)
+
+    async def _fail(self, error: BaseException) -> None:
+        if isinstance(error, ImportConflict):
+            return
+        logger.error(
+            f"Import {self.job.id} failed after {self.job.rows_done} rows: {error!r}"
+        )
+        self.job.status = ImportStatus.FAILED
+        self.job.error = str(error)[:500] or type(error).__name__
+        async with self.session_maker() as session:
+            await session.exec(
+                update(ExpenseImports)  # type: ignore
+                .where(
+                    ExpenseImports.id == self.job.id,  # type: ignore
+                    ExpenseImports.status == ImportStatus.RUNNING,  # type: ignore
+                )
+                .values(
+                    status=ImportStatus.FAILED,
+                    error=self.job.error,
+                    updated_at=utcnow(),
+                )
+            )
+            await session.commit()
+
+    def response(self, elapsed: float) -> ExpenseImportResponse:
+        return ExpenseImportResponse(
+            id=self.job.id,
+            status=self.job.status,
+            rows_done=self.job.rows_done,
+            created=self.job.created,
+            llm_rows=self.job.llm_rows,
+            skipped=self.job.skipped,
+            invalid=self.job.invalid,
+            rows=self.rows,
+            elapsed_s=round(elapsed, 3),
+            rows_per_second=round(self.rows / elapsed, 1) if elapsed else 0.0,
+            error=self.job.error,
+        )
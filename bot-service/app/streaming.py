@@ -0,0 +1,61 @@
+"""Incremental detection of the JSON answer in a streamed LLM response."""
+
+import re
+from typing import Optional
+
+NOT_AN_EXPENSE = '{"is_expense": false}'
+
+_NOT_AN_EXPENSE_RE = re.compile(r'"is_expense"\s*:\s*false')
+
+
+class JsonObjectScanner:
+    """
+    Find the first complete top-level JSON object in streamed text.
+
+    Text before the opening brace (``Output:``, markdown fences) and after
+    the closing one is ignored. Braces inside strings are not counted.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list = []
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> Optional[str]:
+        """Consume the next chunk; return the answer once it is known."""
+        if not self._started:
+            start = text.find("{")
+            if start < 0:
+                return None
+            self._started = True
+            text = text[start:]
+
+        for end, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._chunks.append(text[: end + 1])
+                    return "".join(self._chunks)
+        self._chunks.append(text)
+
+        # The remaining fields of a non-expense answer do not matter
+        if _NOT_AN_EXPENSE_RE.search("".join(self._chunks)):
+            return NOT_AN_EXPENSE
+        return None
+
+    def text(self) -> str:
+        """Everything captured so far, for streams that end early."""
+        return "".join(self._chunks)
@@ -2,8 +2,14 @@ import os
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import NullPool
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Set test environment variables before importing settings
 os.environ.update(
@@ -24,6 +30,7 @@ os.environ.update(
         "APP_NAME": "Test Telegram Expense Bot Service",
         "VERSION": "1.0.0",
         "DEV": "true",
+        "LLM_PRELOAD": "false",
         "EXPENSE_CATEGORIES": '["Food","Transportation","Entertainment","Shopping","Bills","Healthcare","Other"]',
         "API_KEY_HEADER": "X-API-Key",
         "API_KEY_SECRET": "test_secret_key",
@@ -31,45 +38,79 @@ os.environ.update(
 )
 
 from app.auth import get_api_key  # noqa: E402
-from app.db import get_session  # noqa: E402
+from app.db import (  # noqa: E402
+    async_database_url,
+    get_session,
+    get_session_maker,
+)
 from app.main import app  # noqa: E402
+from app.user_cache import user_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Every test has its own database, so cached users must not leak"""
+    user_cache.clear()
+
+
+@pytest.fixture(name="database_url")
+def database_url_fixture(tmp_path):
+    """File-backed SQLite database shared by the sync and async engines"""
+    return f"sqlite:///{tmp_path / 'test.db'}"
 
 
 @pytest.fixture(name="session")
-def session_fixture():
+def session_fixture(database_url):
     """Session fixture"""
-    engine = create_engine(
-        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
-    )
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
     SQLModel.metadata.create_all(engine)
     with Session(engine, autoflush=True) as session:
         yield session
     SQLModel.metadata.drop_all(engine)
+    engine.dispose()
 
 
 @pytest.fixture(name="session_no_transaction")
-def session_no_transaction_fixture():
+def session_no_transaction_fixture(database_url):
     """Session no transaction fixture"""
-    engine = create_engine(
-        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
-    )
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
     SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(database_url, session):
+    """Async engine on the same database the ``session`` fixture seeds.
+
+    NullPool because TestClient runs every request in its own event loop.
+    """
+    return create_async_engine(async_database_url(database_url), poolclass=NullPool)
+
+
+@pytest.fixture(name="session_maker")
+def session_maker_fixture(async_engine: AsyncEngine):
+    """Session factory configured like ``app.db.async_session_maker``"""
+    return async_sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=True, expire_on_commit=False
+    )
 
 
 @pytest.fixture(name="client")
-def auth_client_fixture(session: Session):
+def auth_client_fixture(session_maker):
     """Client fixture for requests without authorized user"""
 
-    def get_session_override():
-        return session
+    async def get_session_override():
+        async with session_maker() as session:
+            yield session
 
     def get_api_key_override():
         return None
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_session_maker] = lambda: session_maker
     app.dependency_overrides[get_api_key] = get_api_key_override
 
     client = TestClient(app)
@@ -78,13 +119,15 @@ def auth_client_fixture(session: Session):
 
 
 @pytest.fixture(name="unauthorized_client")
-def client_fixture(session: Session):
+def client_fixture(session_maker):
     """Client fixture for requests without authorized user"""
 
-    def get_session_override():
-        return session
+    async def get_session_override():
+        async with session_maker() as session:
+            yield session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_session_maker] = lambda: session_maker
 
     client = TestClient(app)
     yield client
@@ -4,9 +4,10 @@ from decimal import Decimal
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
-from langchain.schema import AIMessage
+from langchain_core.messages import AIMessage
 
 from app.expense_analyzer import ExpenseAnalyzer
+from app.fast_parser import FastPathParser
 
 
 @pytest.fixture
@@ -43,7 +44,7 @@ def expense_analyzer_dev():
         # Mock the HuggingFace imports and classes
         mock_chat_hf = AsyncMock()
 
-        analyzer = ExpenseAnalyzer(dev=True)
+        analyzer = ExpenseAnalyzer(dev=True, fast_path=False)
         analyzer.llm = mock_chat_hf
         yield analyzer
 
@@ -55,11 +56,33 @@ def expense_analyzer_prod():
         # Mock the OpenAI imports and classes
         mock_chat_openai = AsyncMock()
 
-        analyzer = ExpenseAnalyzer(dev=False)
+        analyzer = ExpenseAnalyzer(dev=False, fast_path=False)
         analyzer.llm = mock_chat_openai
         yield analyzer
 
 
+@pytest.fixture
+def expense_analyzer_fast_path():
+    """Fixture for ExpenseAnalyzer with the local fast path enabled."""
+    analyzer = ExpenseAnalyzer(dev=True, fast_path=True)
+    analyzer.llm = AsyncMock()
+    yield analyzer
+
+
+@pytest.fixture
+def expense_analyzer_micro_batch():
+    """Fixture for ExpenseAnalyzer with micro-batching and no cache."""
+    analyzer = ExpenseAnalyzer(dev=True, fast_path=False, cache=False, micro_batch=True)
+    analyzer.llm = AsyncMock()
+    yield analyzer
+
+
+@pytest.fixture
+def fast_parser():
+    """Fixture for a FastPathParser over the test expense categories."""
+    return FastPathParser()
+
+
 @pytest.fixture
 def valid_expense_response():
     """Fixture providing a valid expense JSON response."""
@@ -150,3 +173,11 @@ def invalid_expense_data_samples():
         # None values
         {"description": None, "amount": 25.50, "category": "Food"},
     ]
+
+
+@pytest.fixture
+def expense_analyzer_streaming():
+    """Fixture for ExpenseAnalyzer streaming LLM answers, with no cache."""
+    analyzer = ExpenseAnalyzer(dev=True, fast_path=False, cache=False, streaming=True)
+    analyzer.llm = AsyncMock()
+    yield analyzer
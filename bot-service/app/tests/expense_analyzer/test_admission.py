@@ -0,0 +1,167 @@
+"""Tests for LLM admission control."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+pytestmark = pytest.mark.asyncio
+
+
+def controller(**overrides) -> AdmissionController:
+    options = dict(
+        max_concurrency=1, max_queue=10, max_queue_per_key=10, queue_timeout=5
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+async def hold(admission: AdmissionController, key: str, order: list, gate=None):
+    async with admission.admit(key):
+        order.append(key)
+        if gate is not None:
+            await gate.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestAdmissionController:
+    """Test cases for AdmissionController class."""
+
+    async def test_admits_up_to_max_concurrency(self):
+        admission = controller(max_concurrency=2)
+        gate = asyncio.Event()
+        order: list = []
+        tasks = [
+            asyncio.create_task(hold(admission, key, order, gate)) for key in "abc"
+        ]
+        await settle()
+
+        assert order == ["a", "b"]
+        assert admission.stats()["active"] == 2
+        assert admission.stats()["queued"] == 1
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+        assert admission.stats()["active"] == 0
+        assert admission.stats()["admitted"] == 3
+
+    async def test_round_robin_across_keys(self):
+        admission = controller()
+        gate = asyncio.Event()
+        order: list = []
+        holder = asyncio.create_task(hold(admission, "busy", order, gate))
+        await settle()
+        tasks = [
+            asyncio.create_task(hold(admission, key, order))
+            for key in ["busy", "busy", "busy", "b", "c"]
+        ]
+        await settle()
+
+        gate.set()
+        await asyncio.gather(holder, *tasks)
+
+        assert order == ["busy", "busy", "b", "c", "busy", "busy"]
+
+    async def test_rejects_when_queue_full(self):
+        admission = controller(max_queue=1)
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, k, [], gate)) for k in "ab"]
+        await settle()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("c"):
+                pass
+
+        assert rejected.value.retry_after >= 1
+        assert admission.stats()["rejected"] == 1
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    async def test_rejects_when_key_share_full(self):
+        admission = controller(max_queue_per_key=1)
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, "a", [], gate)) for _ in "ab"]
+        await settle()
+
+        with pytest.raises(AdmissionRejected):
+            async with admission.admit("a"):
+                pass
+        # Other users can still queue
+        tasks.append(asyncio.create_task(hold(admission, "b", [], gate)))
+        await settle()
+        assert admission.stats()["queued"] == 2
+
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    async def test_queue_timeout(self):
+        admission = controller(queue_timeout=0.01)
+        gate = asyncio.Event()
+        holder = asyncio.create_task(hold(admission, "a", [], gate))
+        await settle()
+
+        with pytest.raises(AdmissionRejected):
+            async with admission.admit("b"):
+                pass
+
+        assert admission.stats()["timed_out"] == 1
+        assert admission.stats()["queued"] == 0
+        gate.set()
+        await holder
+        assert admission.stats()["active"] == 0
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        admission = controller()
+        gate = asyncio.Event()
+        order: list = []
+        holder = asyncio.create_task(hold(admission, "a", order, gate))
+        await settle()
+        waiter = asyncio.create_task(hold(admission, "b", order))
+        await settle()
+
+        waiter.cancel()
+        await settle()
+        assert admission.stats()["queued"] == 0
+
+        gate.set()
+        await holder
+        assert order == ["a"]
+        assert admission.stats()["active"] == 0
+
+
+class TestExpenseAnalyzerAdmission:
+    """Test cases for admission control inside ExpenseAnalyzer."""
+
+    async def test_rejection_propagates(self, expense_analyzer_dev):
+        expense_analyzer_dev.admission = controller(max_concurrency=0, max_queue=0)
+        expense_analyzer_dev.llm.ainvoke = AsyncMock()
+
+        with pytest.raises(AdmissionRejected):
+            await expense_analyzer_dev.analyze_message("Lunch 25.50", "john")
+        with pytest.raises(AdmissionRejected):
+            await expense_analyzer_dev.analyze_messages(["Lunch 25.50"], "john")
+
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
+
+    async def test_local_answers_skip_admission(self, expense_analyzer_dev):
+        expense_analyzer_dev.admission = controller(max_concurrency=0, max_queue=0)
+
+        assert await expense_analyzer_dev.analyze_message("hello", "john") is None
+
+    async def test_stats(
+        self, expense_analyzer_dev, mock_llm_response, valid_expense_response
+    ):
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(valid_expense_response)
+        )
+
+        await expense_analyzer_dev.analyze_message("Lunch 25.50", "john")
+
+        assert expense_analyzer_dev.stats()["admission"]["admitted"] == 1
@@ -0,0 +1,198 @@
+"""Tests for packed multi-message analysis."""
+
+import json
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.settings import settings
+
+
+def batch_response(*items):
+    return json.dumps(list(items))
+
+
+class TestAnalyzeMessages:
+    """Test cases for ExpenseAnalyzer.analyze_messages."""
+
+    def test_batch_system_prompt(self, expense_analyzer_dev, expense_categories):
+        """Test that the batch prompt asks for a JSON array with ids."""
+        prompt = expense_analyzer_dev.batch_system_prompt
+        assert "JSON array" in prompt
+        assert '"id"' in prompt
+        for category in expense_categories:
+            assert category in prompt
+
+    @pytest.mark.asyncio
+    async def test_packs_messages_in_one_call(
+        self, expense_analyzer_dev, mock_llm_response
+    ):
+        """Test that pending messages share one LLM call."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(
+                batch_response(
+                    {
+                        "id": 0,
+                        "is_expense": True,
+                        "description": "Lunch",
+                        "amount": 10,
+                        "category": "Food",
+                    },
+                    {"id": 1, "is_expense": False},
+                )
+            )
+        )
+
+        results = await expense_analyzer_dev.analyze_messages(
+            ["lunch 10", "hello", "room 101"]
+        )
+
+        assert results == [
+            {"description": "Lunch", "amount": Decimal("10"), "category": "Food"},
+            None,
+            None,
+        ]
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+        human_message = expense_analyzer_dev.llm.ainvoke.call_args.args[0][1]
+        assert json.loads(human_message.content) == [
+            {"id": 0, "message": "lunch 10"},
+            {"id": 1, "message": "room 101"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_answers_are_matched_by_id(
+        self, expense_analyzer_prod, mock_llm_response
+    ):
+        """Test that out-of-order answers are routed by id."""
+        expense_analyzer_prod.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(
+                batch_response(
+                    {
+                        "id": 1,
+                        "is_expense": True,
+                        "description": "Bus",
+                        "amount": 2.5,
+                        "category": "Transportation",
+                    },
+                    {"id": 0, "is_expense": False},
+                    {"id": 7, "is_expense": False},
+                    "garbage",
+                )
+            )
+        )
+
+        results = await expense_analyzer_prod.analyze_messages(["room 1", "bus 2.5"])
+
+        assert results[0] is None
+        assert results[1]["description"] == "Bus"
+        assert expense_analyzer_prod.llm.ainvoke.call_args.kwargs == {"max_tokens": 120}
+
+    @pytest.mark.asyncio
+    async def test_chunks_by_llm_batch_size(
+        self, expense_analyzer_dev, mock_llm_response, monkeypatch
+    ):
+        """Test that large batches are split into several LLM calls."""
+        monkeypatch.setattr(settings, "llm_batch_size", 2)
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response("[]")
+        )
+
+        results = await expense_analyzer_dev.analyze_messages(
+            [f"item {i}" for i in range(5)]
+        )
+
+        assert results == [None] * 5
+        assert expense_analyzer_dev.llm.ainvoke.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_batch_results_are_cached(
+        self, expense_analyzer_dev, mock_llm_response
+    ):
+        """Test that batch answers feed the single-message cache."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(
+                batch_response(
+                    {
+                        "id": 0,
+                        "is_expense": True,
+                        "description": "Lunch",
+                        "amount": 10,
+                        "category": "Food",
+                    }
+                )
+            )
+        )
+        await expense_analyzer_dev.analyze_messages(["lunch 10"])
+
+        result = await expense_analyzer_dev.analyze_message("lunch 10")
+
+        assert result["description"] == "Lunch"
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_non_array_response(self, expense_analyzer_dev, mock_llm_response):
+        """Test that a non-array answer rejects the chunk."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response('{"is_expense": false}')
+        )
+
+        results = await expense_analyzer_dev.analyze_messages(["lunch 10"])
+
+        assert results == [None]
+
+    @pytest.mark.asyncio
+    async def test_without_prefilter(self, expense_analyzer_dev, mock_llm_response):
+        """Test that transactions named like chat commands can skip the prefilter."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(
+                batch_response(
+                    {
+                        "id": 0,
+                        "is_expense": True,
+                        "description": "Stop & Shop",
+                        "amount": 45.2,
+                        "category": "Food",
+                    }
+                )
+            )
+        )
+
+        assert await expense_analyzer_dev.analyze_messages(["STOP & SHOP 45.20"]) == [
+            None
+        ]
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
+
+        results = await expense_analyzer_dev.analyze_messages(
+            ["STOP & SHOP 45.20"], prefilter=False
+        )
+
+        assert results[0]["description"] == "Stop & Shop"
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_llm_error(self, expense_analyzer_dev):
+        """Test that LLM errors reject the chunk without raising."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(side_effect=Exception("down"))
+
+        results = await expense_analyzer_dev.analyze_messages(["lunch 10", "bus 2"])
+
+        assert results == [None, None]
+        with pytest.raises(Exception, match="down"):
+            await expense_analyzer_dev.analyze_messages(
+                ["lunch 10", "bus 2"], raise_errors=True
+            )
+
+    @pytest.mark.asyncio
+    async def test_local_analysis_error(self, expense_analyzer_dev, monkeypatch):
+        """Test that an error on one message does not affect the others."""
+        monkeypatch.setattr(
+            expense_analyzer_dev,
+            "_is_obviously_not_expense",
+            lambda message: 1 / 0,
+        )
+
+        results = await expense_analyzer_dev.analyze_messages(["lunch 10"])
+
+        assert results == [None]
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
@@ -0,0 +1,238 @@
+"""Tests for the analysis result cache."""
+
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.pool import StaticPool
+
+from app.cache import MISSING, AnalysisCache, DatabaseCacheTier, TTLCache
+from app.settings import settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest_asyncio.fixture
+async def cache_engine():
+    """In-memory async SQLite engine with the cache table."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def expense():
+    return {"description": "Lunch", "amount": Decimal("25.50"), "category": "Food"}
+
+
+class TestTTLCache:
+    """Test cases for TTLCache class."""
+
+    def test_get_set(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is MISSING
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=100)
+
+        clock.now = 11
+        assert cache.get("a") is MISSING
+        assert cache.get("b") == 2
+        assert cache.stats()["expirations"] == 1
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+        assert cache.stats()["evictions"] == 1
+
+    def test_pop_and_clear(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.pop("a")
+        assert cache.get("a") is MISSING
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestAnalysisCache:
+    """Test cases for AnalysisCache class."""
+
+    def test_key_normalizes_message(self):
+        cache = AnalysisCache("fp", maxsize=10, ttl=10, negative_ttl=1)
+        assert cache.key("  Lunch   10 ") == cache.key("lunch 10")
+        assert cache.key("lunch 10") != cache.key("lunch 11")
+
+    def test_fingerprint_depends_on_prompt_inputs(self):
+        base = AnalysisCache.make_fingerprint("prompt", ["Food"], "model")
+        assert base == AnalysisCache.make_fingerprint("prompt", ["Food"], "model")
+        assert base != AnalysisCache.make_fingerprint("prompt", ["Other"], "model")
+        assert base != AnalysisCache.make_fingerprint("prompt", ["Food"], "other")
+
+    @pytest.mark.asyncio
+    async def test_memory_tier(self, expense):
+        cache = AnalysisCache("fp", maxsize=10, ttl=10, negative_ttl=1)
+
+        assert await cache.get("lunch 25.50") is MISSING
+        await cache.set("lunch 25.50", expense)
+        await cache.set("hello 1", None)
+
+        assert await cache.get("lunch 25.50") == expense
+        assert await cache.get("hello 1") is None
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_update_fingerprint_clears_memory(self, expense):
+        cache = AnalysisCache("fp", maxsize=10, ttl=10, negative_ttl=1)
+        await cache.set("lunch 25.50", expense)
+
+        cache.update_fingerprint("fp")
+        assert await cache.get("lunch 25.50") == expense
+
+        cache.update_fingerprint("new-fp")
+        assert await cache.get("lunch 25.50") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_database_tier(self, cache_engine, expense):
+        db_tier = DatabaseCacheTier(cache_engine)
+        writer = AnalysisCache("fp", 10, ttl=10, negative_ttl=1, db_tier=db_tier)
+        await writer.set("lunch 25.50", expense)
+        await writer.set("hello 1", None)
+
+        # A fresh process only has the database tier
+        reader = AnalysisCache("fp", 10, ttl=10, negative_ttl=1, db_tier=db_tier)
+        assert await reader.get("lunch 25.50") == expense
+        assert await reader.get("hello 1") is None
+        assert await reader.get("dinner 10") is MISSING
+        assert reader.stats()["db_hits"] == 2
+        assert reader.stats()["misses"] == 1
+
+        # Promoted to the memory tier
+        assert await reader.get("lunch 25.50") == expense
+        assert reader.stats()["db_hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_database_tier_expiration(self, cache_engine, expense):
+        db_tier = DatabaseCacheTier(cache_engine)
+        await db_tier.set("key", "fp", expense, ttl=-1)
+
+        assert await db_tier.get("key") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_database_tier_purge_stale(self, cache_engine, expense):
+        db_tier = DatabaseCacheTier(cache_engine)
+        old = AnalysisCache("old", 10, ttl=10, negative_ttl=1, db_tier=db_tier)
+        await old.set("lunch 25.50", expense)
+
+        new = AnalysisCache("new", 10, ttl=10, negative_ttl=1, db_tier=db_tier)
+        await new.purge_stale()
+
+        assert await db_tier.get(old.key("lunch 25.50")) is MISSING
+
+    @pytest.mark.asyncio
+    async def test_database_tier_errors(self, expense):
+        db_tier = AsyncMock(spec=DatabaseCacheTier)
+        db_tier.get.side_effect = Exception("db down")
+        db_tier.set.side_effect = Exception("db down")
+        db_tier.purge.side_effect = Exception("db down")
+        cache = AnalysisCache("fp", 10, ttl=10, negative_ttl=1, db_tier=db_tier)
+
+        assert await cache.get("lunch 25.50") is MISSING
+        await cache.set("lunch 25.50", expense)
+        await cache.purge_stale()
+
+        assert cache.stats()["db_errors"] == 3
+        assert await cache.get("lunch 25.50") == expense
+
+
+class TestExpenseAnalyzerCache:
+    """Test cases for the cache inside ExpenseAnalyzer."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_message_hits_cache(
+        self, expense_analyzer_dev, mock_llm_response, valid_expense_response
+    ):
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(valid_expense_response)
+        )
+
+        first = await expense_analyzer_dev.analyze_message("Lunch 25.50")
+        second = await expense_analyzer_dev.analyze_message("  lunch 25.50 ")
+
+        assert first == second
+        assert second["amount"] == Decimal("25.50")
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+        assert expense_analyzer_dev.stats()["cache"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_negative_results_are_cached(
+        self, expense_analyzer_dev, mock_llm_response, invalid_expense_response
+    ):
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(invalid_expense_response)
+        )
+
+        assert await expense_analyzer_dev.analyze_message("room 101") is None
+        assert await expense_analyzer_dev.analyze_message("room 101") is None
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_parse_failures_are_not_cached(
+        self, expense_analyzer_dev, mock_llm_response, malformed_json_response
+    ):
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(malformed_json_response)
+        )
+
+        await expense_analyzer_dev.analyze_message("Lunch 25.50")
+        await expense_analyzer_dev.analyze_message("Lunch 25.50")
+
+        assert expense_analyzer_dev.llm.ainvoke.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_category_change_invalidates_cache(
+        self,
+        expense_analyzer_dev,
+        mock_llm_response,
+        valid_expense_response,
+        monkeypatch,
+    ):
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(
+            return_value=mock_llm_response(valid_expense_response)
+        )
+        await expense_analyzer_dev.analyze_message("Lunch 25.50")
+
+        monkeypatch.setattr(
+            settings, "expense_categories", settings.expense_categories + ["Pets"]
+        )
+        await expense_analyzer_dev.analyze_message("Lunch 25.50")
+
+        assert expense_analyzer_dev.llm.ainvoke.call_count == 2
+        assert "Pets" in expense_analyzer_dev.system_prompt
@@ -0,0 +1,158 @@
+"""Tests for the LLM circuit breaker and the degraded local parsing mode."""
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpen, CircuitState
+from app.models.expenses import CategorySource
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(clock, **kwargs):
+    kwargs.setdefault("failure_rate_threshold", 0.5)
+    kwargs.setdefault("slow_call_threshold", 1.0)
+    kwargs.setdefault("window", 4)
+    kwargs.setdefault("min_calls", 4)
+    kwargs.setdefault("open_duration", 30)
+    return CircuitBreaker(clock=clock, **kwargs)
+
+
+async def call(circuit, clock, duration=0.0, error=None):
+    async with circuit.guard():
+        clock.now += duration
+        if error:
+            raise error
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker class."""
+
+    async def test_opens_on_failure_rate(self):
+        clock = FakeClock()
+        circuit = breaker(clock)
+
+        await call(circuit, clock)
+        await call(circuit, clock)
+        with pytest.raises(RuntimeError):
+            await call(circuit, clock, error=RuntimeError("provider down"))
+        assert circuit.state is CircuitState.CLOSED
+        with pytest.raises(RuntimeError):
+            await call(circuit, clock, error=RuntimeError("provider down"))
+        assert circuit.state is CircuitState.OPEN
+
+        clock.now += 10
+        with pytest.raises(CircuitOpen) as exc_info:
+            await call(circuit, clock)
+        assert exc_info.value.retry_after == 20
+        assert circuit.stats() == {
+            "state": "open",
+            "failure_rate": 0.5,
+            "calls_in_window": 4,
+            "times_opened": 1,
+            "short_circuited": 1,
+            "retry_after": 20.0,
+        }
+
+    async def test_slow_calls_count_as_failures(self):
+        clock = FakeClock()
+        circuit = breaker(clock, min_calls=2, window=2)
+
+        await call(circuit, clock, duration=5)
+        await call(circuit, clock, duration=5)
+
+        assert circuit.state is CircuitState.OPEN
+
+    async def test_half_open_probe_closes(self):
+        clock = FakeClock()
+        circuit = breaker(clock, min_calls=1)
+        with pytest.raises(RuntimeError):
+            await call(circuit, clock, error=RuntimeError())
+        clock.now += 30
+        assert circuit.state is CircuitState.HALF_OPEN
+
+        async with circuit.guard():
+            # Only one probe at a time
+            with pytest.raises(CircuitOpen):
+                await call(circuit, clock)
+
+        assert circuit.state is CircuitState.CLOSED
+        assert circuit.failure_rate == 0.0
+
+    async def test_half_open_probe_reopens(self):
+        clock = FakeClock()
+        circuit = breaker(clock, min_calls=1)
+        with pytest.raises(RuntimeError):
+            await call(circuit, clock, error=RuntimeError())
+        clock.now += 30
+
+        with pytest.raises(RuntimeError):
+            await call(circuit, clock, error=RuntimeError())
+
+        assert circuit.state is CircuitState.OPEN
+        assert circuit.times_opened == 2
+
+    async def test_cancelled_calls_are_not_failures(self):
+        clock = FakeClock()
+        circuit = breaker(clock, min_calls=1)
+        with pytest.raises(asyncio.CancelledError):
+            await call(circuit, clock, error=asyncio.CancelledError())
+        assert circuit.stats()["calls_in_window"] == 0
+
+
+class TestExpenseAnalyzerDegraded:
+    """Test cases for ExpenseAnalyzer while the LLM circuit is open."""
+
+    @pytest.fixture
+    def analyzer(self, expense_analyzer_dev):
+        expense_analyzer_dev.breaker = breaker(FakeClock(), min_calls=2, window=2)
+        expense_analyzer_dev.llm.ainvoke.side_effect = TimeoutError("timed out")
+        return expense_analyzer_dev
+
+    async def test_open_circuit_parses_locally(self, analyzer):
+        # Failures before the circuit opens still return None
+        assert await analyzer.analyze_message("Dinner with friends 45") is None
+        assert await analyzer.analyze_message("Taxi ride home 12") is None
+        assert analyzer.llm.ainvoke.await_count == 2
+
+        result = await analyzer.analyze_message("Dinner with friends 45")
+
+        assert result == {
+            "description": "Dinner with friends",
+            "amount": Decimal("45"),
+            "category": "Food",
+            "needs_reanalysis": True,
+            "category_source": CategorySource.DEGRADED,
+        }
+        assert analyzer.llm.ainvoke.await_count == 2
+        stats = analyzer.stats()["circuit_breaker"]
+        assert stats["state"] == "open"
+        assert stats["degraded"] == 1
+        # Degraded guesses are not cached
+        assert analyzer.stats()["cache"]["size"] == 0
+
+    async def test_batch_parses_locally(self, analyzer):
+        analyzer.breaker._open()
+
+        results = await analyzer.analyze_messages(["Lunch 12", "Movie night 30"])
+
+        assert [result["needs_reanalysis"] for result in results] == [True, True]
+        assert results[1]["category"] == "Entertainment"
+        analyzer.llm.ainvoke.assert_not_called()
+
+    async def test_disabled(self):
+        from app.expense_analyzer import ExpenseAnalyzer
+
+        analyzer = ExpenseAnalyzer(dev=True, circuit_breaker=False)
+        assert analyzer.breaker is None
+        assert "circuit_breaker" not in analyzer.stats()
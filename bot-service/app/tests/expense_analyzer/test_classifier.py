@@ -0,0 +1,347 @@
+"""Tests for the category classifier learned from stored expenses."""
+
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import update
+
+from app.classifier import (
+    CategoryClassifier,
+    ClassifierTrainer,
+    NaiveBayesModel,
+    SparseNaiveBayesModel,
+    tokenize,
+)
+from app.fast_parser import FastPathParser
+from app.models.expenses import CategorySource, Expenses
+from app.models.users import Users
+
+EXAMPLES = [
+    ("Netflix subscription", "Entertainment"),
+    ("Spotify premium", "Entertainment"),
+    ("Cinema tickets", "Entertainment"),
+    ("Lunch at the office", "Food"),
+    ("Dinner with friends", "Food"),
+    ("Groceries at the market", "Food"),
+    ("Taxi to the airport", "Transportation"),
+    ("Bus card top up", "Transportation"),
+]
+
+
+def classifier(**kwargs):
+    kwargs.setdefault("threshold", 0.9)
+    kwargs.setdefault("min_user_examples", 3)
+    kwargs.setdefault("min_global_examples", 5)
+    kwargs.setdefault("global_features", 4096)
+    kwargs.setdefault("user_features", 256)
+    return CategoryClassifier(**kwargs)
+
+
+def trained(**kwargs):
+    model = classifier(**kwargs)
+    for _ in range(3):
+        for description, category in EXAMPLES:
+            model.learn("123", description, category)
+    return model
+
+
+class TestNaiveBayesModel:
+    """Test cases for NaiveBayesModel class."""
+
+    def test_predict_proba(self):
+        model = NaiveBayesModel(["Food", "Transportation"], n_features=1024)
+        model.partial_fit(tokenize("lunch sandwich"), "Food")
+        model.partial_fit(tokenize("taxi ride"), "Transportation")
+
+        proba = model.predict_proba(tokenize("sandwich"))
+
+        assert proba.shape == (2,)
+        assert proba.sum() == pytest.approx(1.0)
+        assert proba[0] > proba[1]
+
+    def test_new_categories(self):
+        model = NaiveBayesModel([], n_features=64)
+        model.partial_fit(["rent"], "Housing")
+        model.partial_fit(["pills"], "Healthcare")
+
+        assert model.categories == ["Housing", "Healthcare"]
+        assert model.feature_counts.shape == (2, 64)
+        assert model.examples == 2
+
+    def test_hashing_is_stable(self):
+        model = NaiveBayesModel([], n_features=1024)
+        assert model.features(["netflix"]).tolist() == [model.features(["netflix"])[0]]
+        assert model.features(["netflix"])[0] == 859
+
+
+class TestSparseNaiveBayesModel:
+    """Test cases for SparseNaiveBayesModel class."""
+
+    def test_matches_dense_model(self):
+        dense = NaiveBayesModel([], n_features=1024)
+        sparse = SparseNaiveBayesModel([], n_features=1024)
+        for model in (dense, sparse):
+            for description, category in EXAMPLES:
+                model.partial_fit(tokenize(description), category)
+
+        assert sparse.categories == dense.categories
+        assert sparse.feature_counts.shape[1] == len(sparse.feature_ids) < 30
+        for text in ("netflix", "lunch with friends", "unknown words"):
+            np.testing.assert_allclose(
+                sparse.predict_proba(tokenize(text)),
+                dense.predict_proba(tokenize(text)),
+                rtol=1e-6,
+            )
+
+    def test_from_dense_arrays(self):
+        dense = NaiveBayesModel([], n_features=256)
+        for description, category in EXAMPLES:
+            dense.partial_fit(tokenize(description), category)
+
+        sparse = SparseNaiveBayesModel.from_arrays(
+            dense.categories, dense.arrays("user0"), "user0"
+        )
+
+        assert sparse.n_features == 256
+        assert sparse.examples == dense.examples
+        np.testing.assert_allclose(
+            sparse.predict_proba(["taxi"]), dense.predict_proba(["taxi"]), rtol=1e-6
+        )
+
+
+class TestCategoryClassifier:
+    """Test cases for CategoryClassifier class."""
+
+    def test_untrained(self):
+        model = classifier()
+        assert model.predict("123", "Netflix subscription") is None
+        assert model.predict("123", "") is None
+
+    def test_confident_category(self):
+        model = trained()
+
+        assert model.confident_category("123", "netflix") == "Entertainment"
+        assert model.confident_category("123", "taxi home") == "Transportation"
+        # Unknown words are not confident
+        assert model.confident_category("123", "mystery thing") is None
+
+    def test_user_model_first(self):
+        model = trained()
+        for _ in range(5):
+            model.learn("456", "Gym membership", "Healthcare")
+
+        assert model.predict("456", "gym").scope == "user"
+        assert model.predict("456", "gym").category == "Healthcare"
+        # Users without enough history use the global model
+        assert model.predict("789", "netflix").scope == "global"
+
+    def test_inactive_categories_are_ignored(self):
+        model = trained()
+        for _ in range(5):
+            model.learn("123", "Apartment rent", "Housing")
+
+        assert model.predict("123", "rent").category == "Housing"
+        assert model.confident_category("123", "rent") is None
+
+    def test_max_user_models(self):
+        model = classifier(max_user_models=2)
+        for telegram_id in ["1", "2", "1", "3"]:
+            model.learn(telegram_id, "Lunch", "Food")
+
+        # The least recently trained user made room for the new one
+        assert list(model.user_models) == ["1", "3"]
+        assert isinstance(model.user_models["1"], SparseNaiveBayesModel)
+        assert model.user_models["1"].examples == 2
+        assert model.global_model.examples == 4
+        assert model.report()["user_models_evicted"] == 1
+
+    def test_validate(self):
+        model = trained()
+
+        expense = {"description": "Netflix", "category": "Entertainment"}
+        assert model.validate("123", expense) is True
+        expense = {"description": "Netflix", "category": "Food"}
+        assert model.validate("123", expense) is False
+        expense = {"description": "Unknown", "category": "Food"}
+        assert model.validate("123", expense) is True
+
+        report = model.report()
+        assert report["validated"] == 2
+        assert report["llm_agreement"] == 0.5
+
+    def test_report(self):
+        report = trained().report()
+
+        assert report["examples"] == 24
+        assert report["user_models"] == 1
+        # The second and third rounds of examples are predicted correctly
+        assert report["accuracy"] >= 0.8
+        assert 0 < report["confident_coverage"] <= 1
+        assert report["confident_accuracy"] >= 0.8
+
+    def test_save_and_load(self, tmp_path):
+        model = trained()
+        path = str(tmp_path / "classifier.npz")
+        model.trained_through = 42
+
+        model.save(path)
+        loaded = classifier()
+        loaded.load(path)
+
+        assert loaded.trained_through == 42
+        assert loaded.global_model.categories == model.global_model.categories
+        assert list(loaded.user_models) == ["123"]
+        np.testing.assert_array_equal(
+            loaded.user_models["123"].feature_ids, model.user_models["123"].feature_ids
+        )
+        np.testing.assert_array_equal(
+            loaded.global_model.predict_proba(["netflix"]),
+            model.global_model.predict_proba(["netflix"]),
+        )
+        # Mostly zeros, the compressed file is a fraction of the arrays
+        assert (tmp_path / "classifier.npz").stat().st_size < 20_000
+
+    @pytest.mark.asyncio
+    async def test_train_from_expenses(self, session, session_maker, tmp_path):
+        user = Users(id=1, telegram_id="123")
+        session.add(user)
+        for index, (description, category) in enumerate(EXAMPLES * 2, start=1):
+            session.add(
+                Expenses(
+                    id=index,
+                    user_id=1,
+                    description=description,
+                    amount=10,
+                    category=category,
+                )
+            )
+        # Only categories given by the LLM or the user are learned
+        for index, source in enumerate(
+            [
+                CategorySource.FAST_PATH,
+                CategorySource.CLASSIFIER,
+                CategorySource.DEGRADED,
+                CategorySource.LLM,
+            ],
+            start=97,
+        ):
+            session.add(
+                Expenses(
+                    id=index,
+                    user_id=1,
+                    description="Guessed",
+                    amount=10,
+                    category="Other",
+                    category_source=source,
+                )
+            )
+        # Stored before the sources were recorded
+        session.exec(
+            update(Expenses).where(Expenses.id == 100).values(category_source=None)
+        )
+        session.commit()
+        model = classifier()
+        path = str(tmp_path / "classifier.npz")
+        trainer = ClassifierTrainer(model, session_maker, model_path=path)
+
+        assert await trainer.run_once() == 16
+        assert model.trained_through == 16
+        assert model.global_model.examples == 16
+        assert model.report()["trainings"] == 1
+
+        # Training resumes after the last learned expense
+        session.add(
+            Expenses(
+                id=101,
+                user_id=1,
+                description="Uber",
+                amount=5,
+                category="Other",
+                category_source=CategorySource.USER,
+            )
+        )
+        session.commit()
+        assert await trainer.run_once() == 1
+        assert model.global_model.examples == 17
+
+        # An expense with a lower id committed later is still learned, once
+        session.add(
+            Expenses(id=50, user_id=1, description="Bus", amount=2, category="Other")
+        )
+        session.commit()
+        assert await trainer.run_once() == 1
+        assert await trainer.run_once() == 0
+        assert model.trained_through == 101
+        assert model.global_model.examples == 18
+
+        restored = classifier()
+        await ClassifierTrainer(restored, session_maker, model_path=path)._load()
+        assert restored.trained_through == 101
+        assert 50 in restored.recent_ids
+
+    @pytest.mark.asyncio
+    async def test_trainer_start_stop(self, session_maker):
+        trainer = ClassifierTrainer(classifier(), session_maker, interval=60)
+        trainer.start()
+        await trainer.stop()
+        assert trainer._task is None
+
+
+class TestExpenseAnalyzerClassifier:
+    """Test cases for ExpenseAnalyzer with the category classifier."""
+
+    @pytest.mark.asyncio
+    async def test_classifier_skips_llm(self, expense_analyzer_dev):
+        expense_analyzer_dev.classifier = trained()
+
+        result = await expense_analyzer_dev.analyze_message("Cinema 12", "123")
+
+        assert result == {
+            "description": "Cinema",
+            "amount": Decimal("12"),
+            "category": "Entertainment",
+            "category_source": CategorySource.CLASSIFIER,
+        }
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
+        assert expense_analyzer_dev.stats()["classifier"]["confident"] == 1
+
+    @pytest.mark.asyncio
+    async def test_validates_llm_answer(self, expense_analyzer_dev, mock_llm_response):
+        expense_analyzer_dev.classifier = trained()
+        expense_analyzer_dev.llm.ainvoke.return_value = mock_llm_response(
+            '{"is_expense": true, "description": "Netflix", "amount": 15, '
+            '"category": "Shopping"}'
+        )
+
+        # Ambiguous for the fast path, so the LLM answers
+        result = await expense_analyzer_dev.analyze_message(
+            "netflix 15 each month", "123"
+        )
+
+        assert result["category"] == "Shopping"
+        assert expense_analyzer_dev.stats()["classifier"]["llm_agreement"] == 0.0
+
+    def test_categorize(self, expense_analyzer_dev):
+        """Test descriptions are categorized by keywords, then the classifier."""
+        expense_analyzer_dev.fast_parser = FastPathParser()
+        expense_analyzer_dev.classifier = trained()
+
+        assert expense_analyzer_dev.categorize("TAXI 0421") == (
+            "Transportation",
+            CategorySource.FAST_PATH,
+        )
+        assert expense_analyzer_dev.categorize("premium", "123") == (
+            "Entertainment",
+            CategorySource.CLASSIFIER,
+        )
+        assert expense_analyzer_dev.categorize("ACME GMBH", "123") is None
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        from app.expense_analyzer import ExpenseAnalyzer
+
+        analyzer = ExpenseAnalyzer(dev=True, classifier=False)
+        assert analyzer.classifier is None
+        assert "classifier" not in analyzer.stats()
@@ -24,6 +24,15 @@ class TestExpenseAnalyzer:
         assert expense_analyzer_prod.llm is not None
         assert expense_analyzer_prod.system_prompt is not None
 
+    def test_openai_base_url(self, monkeypatch):
+        """Test the OpenAI chat model can point at a compatible local server."""
+        from app.settings import settings
+
+        monkeypatch.setattr(settings, "openai_base_url", "http://127.0.0.1:8081/v1")
+        llm = ExpenseAnalyzer._create_llm("openai", "gpt-3.5-turbo")
+
+        assert llm.openai_api_base == "http://127.0.0.1:8081/v1"
+
     def test_system_prompt_contains_categories(
         self, expense_analyzer_dev, expense_categories
     ):
@@ -242,6 +251,16 @@ class TestExpenseAnalyzer:
 
         assert result is None
 
+    @pytest.mark.asyncio
+    async def test_analyze_message_raise_errors(self, expense_analyzer_dev):
+        """Test LLM exceptions reach callers that retry them."""
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(side_effect=Exception("LLM Error"))
+
+        with pytest.raises(Exception, match="LLM Error"):
+            await expense_analyzer_dev.analyze_message(
+                "Spent $25 on lunch", raise_errors=True
+            )
+
     @pytest.mark.asyncio
     async def test_analyze_message_malformed_llm_response(
         self, expense_analyzer_dev, mock_llm_response, malformed_json_response
@@ -393,3 +412,46 @@ class TestExpenseAnalyzer:
         }
         result = expense_analyzer_dev._validate_expense_data(input_data)
         assert result is None
+
+
+class TestExpenseAnalyzerMetrics:
+    """Test cases for the metrics recorded by ExpenseAnalyzer."""
+
+    @pytest.mark.asyncio
+    async def test_outcomes_and_stages(self, expense_analyzer_dev, mock_llm_response):
+        """Test outcomes, pre-filter rejections and stage timings are recorded."""
+        from app import metrics
+
+        before = {
+            outcome: metrics.ANALYSES.value(outcome)
+            for outcome in ("expense", "not_expense")
+        }
+        rejections = metrics.PREFILTER_REJECTIONS.value("greeting")
+        llm_calls = metrics.ANALYZER_STAGE_SECONDS.labels("llm").count
+        expense_analyzer_dev.llm.ainvoke.return_value = mock_llm_response(
+            '{"is_expense": true, "description": "Pizza", "amount": 20, '
+            '"category": "Food"}'
+        )
+
+        await expense_analyzer_dev.analyze_message("pizza with friends 20")
+        await expense_analyzer_dev.analyze_message("hello there")
+
+        assert metrics.ANALYSES.value("expense") == before["expense"] + 1
+        assert metrics.ANALYSES.value("not_expense") == before["not_expense"] + 1
+        assert metrics.PREFILTER_REJECTIONS.value("greeting") == rejections + 1
+        assert metrics.ANALYZER_STAGE_SECONDS.labels("llm").count == llm_calls + 1
+
+    def test_parse_errors_and_coerced_categories(self, expense_analyzer_dev):
+        """Test parse errors and categories coerced to Other are counted."""
+        from app import metrics
+
+        parse_errors = metrics.LLM_PARSE_ERRORS.value()
+        coerced = metrics.CATEGORY_COERCED.value()
+
+        expense_analyzer_dev._parse_llm_response("not json")
+        expense_analyzer_dev._validate_expense_data(
+            {"description": "Thing", "amount": 5, "category": "Mystery"}
+        )
+
+        assert metrics.LLM_PARSE_ERRORS.value() == parse_errors + 1
+        assert metrics.CATEGORY_COERCED.value() == coerced + 1
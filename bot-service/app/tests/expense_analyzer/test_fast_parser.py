@@ -0,0 +1,192 @@
+"""Tests for the FastPathParser and its integration in ExpenseAnalyzer."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.fast_parser import FastPathParser
+from app.models.expenses import CategorySource
+
+
+class TestFastPathParser:
+    """Test cases for FastPathParser class."""
+
+    @pytest.mark.parametrize(
+        "message,description,amount,category",
+        [
+            ("coffee 3.50", "Coffee", Decimal("3.50"), "Food"),
+            ("uber 12", "Uber", Decimal("12"), "Transportation"),
+            ("$30 gas", "Gas", Decimal("30"), "Transportation"),
+            ("Spent $25.50 on lunch", "Lunch", Decimal("25.50"), "Food"),
+            ("groceries 1.234,56", "Groceries", Decimal("1234.56"), "Food"),
+            ("groceries 1,234.56", "Groceries", Decimal("1234.56"), "Food"),
+            ("coffee 3,50€", "Coffee", Decimal("3.50"), "Food"),
+            ("doctor 2k", "Doctor", Decimal("2000"), "Healthcare"),
+            ("Netflix 15 dollars", "Netflix", Decimal("15"), "Entertainment"),
+            ("phone bill 1.234.567", "Phone bill", Decimal("1234567"), "Bills"),
+        ],
+    )
+    def test_parse_confident_messages(
+        self, fast_parser, message, description, amount, category
+    ):
+        """Test that short, unambiguous messages are parsed locally."""
+        result = fast_parser.parse(message)
+
+        assert result == {
+            "description": description,
+            "amount": amount,
+            "category": category,
+        }
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            # Ambiguous thousands/decimal separator
+            "coffee 1.234",
+            # More than one number
+            "Movie tickets $15 each, bought 2",
+            # No keyword for any category
+            "Gift for mom 45",
+            # Words that change the meaning of the amount
+            "split lunch 30",
+            "refund uber 12",
+            # Questions
+            "coffee 3?",
+            # Long free-form text
+            "paid for lunch with my friends from work today 20",
+            # Non-positive amount
+            "coffee 0",
+        ],
+    )
+    def test_parse_defers_to_llm(self, fast_parser, message):
+        """Test that ambiguous messages are left to the LLM."""
+        assert fast_parser.parse(message) is None
+
+    def test_parse_ambiguous_category(self):
+        """Test that a keyword mapping to several categories is not confident."""
+        parser = FastPathParser(categories=["Bills", "Utilities", "Other"])
+        assert parser.parse("internet 40") is None
+
+    @pytest.mark.parametrize(
+        "category, message",
+        [
+            ("Bills", "electricity 40"),
+            ("Utilities", "electricity 40"),
+            ("Healthcare", "pharmacy 12"),
+            ("Medical/Healthcare", "pharmacy 12"),
+        ],
+    )
+    def test_renamed_categories_share_keywords(self, category, message):
+        """Test that both names of a renamed category match its keywords."""
+        parser = FastPathParser(categories=[category, "Other"])
+        assert parser.parse(message)["category"] == category
+
+    def test_inactive_categories_are_ignored(self):
+        """Test that keywords of categories not configured are not used."""
+        parser = FastPathParser(categories=["Food", "Other"])
+        assert parser.parse("uber 12") is None
+        assert parser.parse("lunch 12")["category"] == "Food"
+
+    def test_extra_keywords(self):
+        """Test that extra keywords from settings extend the default map."""
+        parser = FastPathParser(
+            categories=["Food", "Other"], extra_keywords={"Food": ["empanadas"]}
+        )
+        assert parser.parse("empanadas 20")["category"] == "Food"
+
+    def test_stats(self, fast_parser):
+        """Test hit rate accounting."""
+        fast_parser.parse("coffee 3.50")
+        fast_parser.parse("Gift for mom 45")
+
+        assert fast_parser.stats.as_dict() == {
+            "attempts": 2,
+            "hits": 1,
+            "misses": 1,
+            "hit_rate": 0.5,
+        }
+
+    def test_stats_empty(self, fast_parser):
+        """Test hit rate before any message was parsed."""
+        assert fast_parser.stats.hit_rate == 0.0
+
+    @pytest.mark.parametrize(
+        "message,description,amount,category",
+        [
+            (
+                "split dinner 40 with ana",
+                "Split dinner with ana",
+                Decimal("40"),
+                "Food",
+            ),
+            ("paid 30 and then 20", "And then", Decimal("30"), "Other"),
+            ("20", "Expense", Decimal("20"), "Other"),
+            ("pizza and uber 2k", "Pizza and uber", Decimal("2000"), "Other"),
+        ],
+    )
+    def test_guess(self, fast_parser, message, description, amount, category):
+        assert fast_parser.guess(message) == {
+            "description": description,
+            "amount": amount,
+            "category": category,
+        }
+
+    def test_guess_needs_an_amount(self, fast_parser):
+        assert fast_parser.guess("lunch with friends") is None
+        assert fast_parser.guess("lunch 0") is None
+
+    def test_guess_fallback_category(self):
+        parser = FastPathParser(categories=["Food", "Misc"], extra_keywords={})
+        assert parser.guess("stuff 5")["category"] == "Misc"
+
+    @pytest.mark.parametrize(
+        "text,category",
+        [
+            ("UBER *TRIP HELP.UBER.COM", "Transportation"),
+            ("POS 4411 STARBUCKS COFFEE #123", "Food"),
+            ("Coffee and a movie", None),
+            ("ACME GMBH 2025-01", None),
+        ],
+    )
+    def test_category(self, fast_parser, text, category):
+        """Test categories of descriptions extracted elsewhere."""
+        assert fast_parser.category(text) == category
+
+
+class TestExpenseAnalyzerFastPath:
+    """Test cases for the fast path inside ExpenseAnalyzer."""
+
+    @pytest.mark.asyncio
+    async def test_fast_path_skips_llm(self, expense_analyzer_fast_path):
+        """Test that confident messages never reach the LLM."""
+        result = await expense_analyzer_fast_path.analyze_message("coffee 3.50")
+
+        assert result == {
+            "description": "Coffee",
+            "amount": Decimal("3.50"),
+            "category": "Food",
+            "category_source": CategorySource.FAST_PATH,
+        }
+        expense_analyzer_fast_path.llm.ainvoke.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fast_path_falls_back_to_llm(
+        self, expense_analyzer_fast_path, mock_llm_response, valid_expense_response
+    ):
+        """Test that non-confident messages still use the LLM."""
+        expense_analyzer_fast_path.llm.ainvoke.return_value = mock_llm_response(
+            valid_expense_response
+        )
+
+        result = await expense_analyzer_fast_path.analyze_message("Gift for mom 45")
+
+        assert result["description"] == "Lunch at restaurant"
+        expense_analyzer_fast_path.llm.ainvoke.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stats(self, expense_analyzer_fast_path, expense_analyzer_dev):
+        """Test that analyzer stats report the fast path hit rate."""
+        await expense_analyzer_fast_path.analyze_message("coffee 3.50")
+
+        assert expense_analyzer_fast_path.stats()["fast_path"]["hits"] == 1
+        assert "fast_path" not in expense_analyzer_dev.stats()
@@ -0,0 +1,204 @@
+"""Tests for latency-based routing and hedging across LLM providers."""
+
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.llm_router import LLMRouter
+from benchmarks.fake_llm import FakeChatModel, constant_latency, lognormal_latency
+
+pytestmark = pytest.mark.asyncio
+
+PIZZA = json.dumps(
+    {"is_expense": True, "description": "Pizza", "amount": 20, "category": "Food"}
+)
+
+
+def fake(latency=0.0, error_rate=0.0, answer=PIZZA):
+    return FakeChatModel(
+        lambda messages: answer,
+        latency=constant_latency(latency),
+        error_rate=error_rate,
+    )
+
+
+async def ask(llm):
+    response = await llm.ainvoke([])
+    return json.loads(response.content) if response.content else None
+
+
+def router(*providers, **kwargs):
+    kwargs.setdefault("hedge_budget", 1.0)
+    kwargs.setdefault("initial_hedge_delay", 0.02)
+    return LLMRouter(
+        [(f"p{index}", llm) for index, llm in enumerate(providers)], **kwargs
+    )
+
+
+class TestLLMRouter:
+    """Test cases for LLMRouter class."""
+
+    async def test_fast_primary_is_not_hedged(self):
+        primary, secondary = fake(), fake()
+        llm_router = router(primary, secondary)
+
+        assert (await llm_router.call(ask))["description"] == "Pizza"
+        assert (primary.calls, secondary.calls) == (1, 0)
+        assert llm_router.stats()["hedges"] == 0
+
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        primary, secondary = fake(latency=5), fake(latency=0.01)
+        llm_router = router(primary, secondary)
+
+        result = await asyncio.wait_for(llm_router.call(ask), timeout=1)
+
+        assert result["description"] == "Pizza"
+        assert primary.cancelled == 1
+        stats = llm_router.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["providers"]["p1"]["wins"] == 1
+        # The cancelled call still raises the primary's latency estimate
+        assert stats["providers"]["p0"]["latency_ewma_ms"] >= 20
+
+    async def test_primary_follows_latency(self):
+        slow, fast = fake(latency=0.03), fake(latency=0.001)
+        llm_router = router(slow, fast, initial_hedge_delay=0.01)
+
+        await llm_router.call(ask)
+        assert llm_router.ranked() == ["p1", "p0"]
+        await llm_router.call(ask)
+        assert fast.calls == 2
+        assert slow.calls == 1
+
+    async def test_errors_move_traffic(self):
+        failing, healthy = fake(error_rate=1.0), fake(latency=0.005)
+        llm_router = router(failing, healthy, hedge_budget=0.0)
+
+        # A failed primary falls back right away, without spending the budget
+        assert (await llm_router.call(ask))["amount"] == 20
+        assert llm_router.stats()["hedges"] == 0
+        assert llm_router.stats()["providers"]["p0"]["errors"] == 1
+        assert llm_router.ranked()[0] == "p1"
+
+    async def test_invalid_answer_waits_for_the_other(self):
+        invalid, valid = fake(answer=""), fake(latency=0.005)
+        llm_router = router(invalid, valid)
+
+        assert (await llm_router.call(ask))["description"] == "Pizza"
+        assert valid.calls == 1
+
+    async def test_all_providers_fail(self):
+        llm_router = router(fake(error_rate=1.0), fake(error_rate=1.0))
+        with pytest.raises(RuntimeError):
+            await llm_router.call(ask)
+
+        llm_router = router(fake(answer=""), fake(error_rate=1.0))
+        assert await llm_router.call(ask) is None
+
+    async def test_hedge_budget(self):
+        primary, secondary = fake(latency=0.03), fake(latency=0.03)
+        llm_router = router(
+            primary,
+            secondary,
+            hedge_budget=0.25,
+            max_hedge_tokens=1.0,
+            initial_hedge_delay=0.001,
+        )
+
+        for _ in range(8):
+            await llm_router.call(ask)
+
+        stats = llm_router.stats()
+        # One initial token plus a quarter of a token per call
+        assert stats["hedges"] == 2
+        assert stats["skipped_hedges"] == 6
+        assert stats["hedge_rate"] == 0.25
+
+    async def test_hedge_delay_uses_p95(self):
+        llm_router = router(fake(), fake(), min_samples=3)
+        assert llm_router.hedge_delay("p0") == 0.02
+
+        for latency in [0.1, 0.2, 0.3, 0.4]:
+            llm_router.provider_stats["p0"].record(latency, ok=True)
+        assert llm_router.hedge_delay("p0") == 0.4
+
+    async def test_hedging_cuts_tail_latency(self):
+        def heavy_tail(seed):
+            return FakeChatModel(
+                lambda messages: PIZZA,
+                latency=lognormal_latency(median=0.002, sigma=1.2),
+                seed=seed,
+            )
+
+        llm_router = router(heavy_tail(1), heavy_tail(2), min_samples=10)
+
+        results = await asyncio.gather(*(llm_router.call(ask) for _ in range(50)))
+
+        assert all(result["amount"] == 20 for result in results)
+        assert 0 < llm_router.stats()["hedges"] <= 50
+
+    async def test_requires_providers(self):
+        with pytest.raises(ValueError):
+            LLMRouter([], hedge_budget=0.1, initial_hedge_delay=1.0)
+
+
+class TestAnalyzerRouting:
+    """Test cases for ExpenseAnalyzer calls through the router."""
+
+    async def test_analyze_message_is_routed(self, expense_analyzer_dev):
+        primary, secondary = fake(latency=5), fake(latency=0.01)
+        expense_analyzer_dev.router = router(primary, secondary)
+
+        result = await asyncio.wait_for(
+            expense_analyzer_dev.analyze_message("Pizza 20"), timeout=1
+        )
+
+        assert result == {
+            "description": "Pizza",
+            "amount": Decimal("20"),
+            "category": "Food",
+        }
+        assert primary.cancelled == 1
+        assert expense_analyzer_dev.stats()["router"]["hedge_wins"] == 1
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
+
+    async def test_batch_is_routed(self, expense_analyzer_dev):
+        answer = json.dumps([{"id": 0, **json.loads(PIZZA)}])
+        primary, secondary = fake(error_rate=1.0), fake(answer=answer)
+        expense_analyzer_dev.router = router(primary, secondary)
+
+        results = await expense_analyzer_dev.analyze_messages(["Pizza 20"])
+
+        assert results[0]["description"] == "Pizza"
+        assert secondary.calls == 1
+
+    async def test_providers_from_settings(self, monkeypatch):
+        from app.expense_analyzer import ExpenseAnalyzer
+        from app.settings import settings
+
+        monkeypatch.setattr(
+            settings, "llm_providers", ["openai:gpt-4o-mini", "openai:gpt-3.5-turbo"]
+        )
+        analyzer = ExpenseAnalyzer(dev=False)
+
+        assert analyzer.router.ranked() == [
+            "openai:gpt-4o-mini",
+            "openai:gpt-3.5-turbo",
+        ]
+        assert analyzer.llm is analyzer.router.providers["openai:gpt-4o-mini"]
+        assert analyzer.model_name == "openai:gpt-4o-mini,openai:gpt-3.5-turbo"
+
+        monkeypatch.setattr(settings, "llm_providers", ["mystery:model"])
+        with pytest.raises(ValueError):
+            ExpenseAnalyzer(dev=False)
+
+    async def test_provider_spec_without_model(self):
+        from pydantic import ValidationError
+
+        from app.settings import Settings
+
+        with pytest.raises(ValidationError, match='must be "<backend>:<model>"'):
+            Settings(llm_providers=["gpt-4o-mini"])
@@ -0,0 +1,182 @@
+"""Tests for micro-batching of concurrent analyze_message calls."""
+
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.microbatch import MicroBatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+def expense(index, description, amount):
+    return {
+        "id": index,
+        "is_expense": True,
+        "description": description,
+        "amount": amount,
+        "category": "Food",
+    }
+
+
+class TestMicroBatcher:
+    """Test cases for MicroBatcher class."""
+
+    async def test_window_groups_concurrent_items(self):
+        handler = AsyncMock(side_effect=lambda items: [i * 2 for i in items])
+        batcher = MicroBatcher(handler, max_size=10, window=0.01)
+
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+        assert results == [0, 2, 4]
+        handler.assert_awaited_once_with([0, 1, 2])
+        assert batcher.stats() == {"batches": 1, "items": 3, "avg_batch_size": 3.0}
+
+    async def test_max_size_flushes_early(self):
+        handler = AsyncMock(side_effect=lambda items: items)
+        batcher = MicroBatcher(handler, max_size=2, window=60)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1
+        )
+
+        assert results == [0, 1, 2, 3]
+        assert handler.await_count == 2
+
+    async def test_errors(self):
+        handler = AsyncMock(return_value=[1, ValueError("bad item")])
+        batcher = MicroBatcher(handler, max_size=2, window=60)
+
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+        assert results[0] == 1
+        assert isinstance(results[1], ValueError)
+
+        handler.side_effect = RuntimeError("provider down")
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def test_cancelled_callers_are_dropped(self):
+        handler = AsyncMock(side_effect=lambda items: items)
+        batcher = MicroBatcher(handler, max_size=10, window=0.01)
+
+        cancelled = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        assert await batcher.submit("b") == "b"
+        handler.assert_awaited_once_with(["b"])
+
+
+class TestExpenseAnalyzerMicroBatch:
+    """Test cases for micro-batching inside ExpenseAnalyzer."""
+
+    async def test_concurrent_messages_share_one_call(
+        self, expense_analyzer_micro_batch, mock_llm_response
+    ):
+        analyzer = expense_analyzer_micro_batch
+        analyzer.llm.ainvoke.return_value = mock_llm_response(
+            json.dumps(
+                [
+                    expense(0, "Lunch", 10),
+                    {"id": 1, "is_expense": False},
+                    expense(2, "Coffee", 3),
+                ]
+            )
+        )
+
+        results = await asyncio.gather(
+            analyzer.analyze_message("lunch 10"),
+            analyzer.analyze_message("room 101"),
+            analyzer.analyze_message("coffee 3"),
+        )
+
+        assert results == [
+            {"description": "Lunch", "amount": Decimal("10"), "category": "Food"},
+            None,
+            {"description": "Coffee", "amount": Decimal("3"), "category": "Food"},
+        ]
+        analyzer.llm.ainvoke.assert_called_once()
+        system_message = analyzer.llm.ainvoke.call_args.args[0][0]
+        assert system_message.content == analyzer.batch_system_prompt
+        assert analyzer.stats()["microbatch"]["avg_batch_size"] == 3.0
+
+    async def test_callers_admitted_per_user(
+        self, expense_analyzer_micro_batch, mock_llm_response
+    ):
+        analyzer = expense_analyzer_micro_batch
+        analyzer.llm.ainvoke.return_value = mock_llm_response(
+            json.dumps([expense(0, "Lunch", 10), expense(1, "Coffee", 3)])
+        )
+        admit = analyzer.admission.admit
+        keys = []
+
+        def record(key):
+            keys.append(key)
+            return admit(key)
+
+        analyzer.admission.admit = record
+
+        await asyncio.gather(
+            analyzer.analyze_message("lunch 10", "alice"),
+            analyzer.analyze_message("coffee 3", "bob"),
+        )
+
+        assert sorted(keys) == ["alice", "bob"]
+        analyzer.llm.ainvoke.assert_called_once()
+
+    async def test_missing_answers_fall_back_to_single_calls(
+        self, expense_analyzer_micro_batch, mock_llm_response, valid_expense_response
+    ):
+        analyzer = expense_analyzer_micro_batch
+        analyzer.llm.ainvoke.side_effect = [
+            mock_llm_response(json.dumps([expense(0, "Lunch", 10)])),
+            mock_llm_response(valid_expense_response),
+        ]
+
+        first, second = await asyncio.gather(
+            analyzer.analyze_message("lunch 10"),
+            analyzer.analyze_message("dinner 25.50"),
+        )
+
+        assert first["description"] == "Lunch"
+        assert second["description"] == "Lunch at restaurant"
+        assert analyzer.llm.ainvoke.call_count == 2
+        assert analyzer.stats()["microbatch"]["fallbacks"] == 1
+
+    async def test_failed_batch_falls_back_to_single_calls(
+        self, expense_analyzer_micro_batch, mock_llm_response, valid_expense_response
+    ):
+        analyzer = expense_analyzer_micro_batch
+        analyzer.llm.ainvoke.side_effect = [
+            Exception("context length exceeded"),
+            mock_llm_response(valid_expense_response),
+            Exception("provider down"),
+        ]
+
+        results = await asyncio.gather(
+            analyzer.analyze_message("lunch 10"),
+            analyzer.analyze_message("dinner 25.50"),
+        )
+
+        assert sorted(result is None for result in results) == [False, True]
+        assert analyzer.llm.ainvoke.call_count == 3
+
+    async def test_single_message_uses_single_prompt(
+        self, expense_analyzer_micro_batch, mock_llm_response, valid_expense_response
+    ):
+        analyzer = expense_analyzer_micro_batch
+        analyzer.llm.ainvoke.return_value = mock_llm_response(valid_expense_response)
+
+        result = await analyzer.analyze_message("lunch 25.50")
+
+        assert result["description"] == "Lunch at restaurant"
+        system_message = analyzer.llm.ainvoke.call_args.args[0][0]
+        assert system_message.content == analyzer.system_prompt
+        assert analyzer.stats()["microbatch"]["fallbacks"] == 0
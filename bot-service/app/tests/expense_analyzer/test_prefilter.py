@@ -0,0 +1,106 @@
+"""Tests for the pre-filter rule engine."""
+
+import json
+
+import pytest
+
+from app.prefilter import PreFilter
+from app.settings import settings
+
+
+class TestPreFilter:
+    """Test cases for PreFilter class."""
+
+    @pytest.mark.parametrize(
+        "message,rule",
+        [
+            ("hi there", "greeting"),
+            ("Hola!", "greeting"),
+            ("buenas tardes", "greeting"),
+            ("¿qué tal?", "small_talk"),
+            ("¡Hola! ¿cómo va todo?", "greeting"),
+            ("que tal amigos", "small_talk"),
+            ("Gracias!", "thanks"),
+            ("muchas gracias", "thanks"),
+            ("ok", "acknowledgement"),
+            ("help", "command"),
+            ("help 5", "command"),
+            ("? 10", "question"),
+            ("👍🎉", "no_text"),
+            ("...", "no_text"),
+            ("random text without numbers", "no_amount"),
+        ],
+    )
+    def test_rejected_messages(self, message, rule):
+        """Test that each rule rejects its messages."""
+        assert PreFilter().match(message) == rule
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "history book 20",
+            "okra 3",
+            "nobody paid, dinner 40",
+            "spent twenty on lunch",
+            "veinte en café",
+            "café 3,50",
+        ],
+    )
+    def test_possible_expenses_pass(self, message):
+        """Test that phrases only match whole words and number words count."""
+        assert PreFilter().match(message) is None
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            "Hola, gasté 20 en café",
+            "Sí, 20 taxi",
+            "si 20 taxi",
+            "buenas, veinte en el súper",
+            "ok 10 lunch",
+            "thanks! lunch was 12",
+            "hey, spent twenty on pizza",
+        ],
+    )
+    def test_expenses_opening_with_small_talk_pass(self, message):
+        """Test that greetings and acknowledgements followed by an amount pass."""
+        assert PreFilter().match(message) is None
+
+    def test_stats(self):
+        """Test per-rule counters of saved LLM calls."""
+        prefilter = PreFilter()
+        for message in ["hola", "hello", "gracias", "lunch 10"]:
+            prefilter.match(message)
+
+        stats = prefilter.stats.as_dict()
+        assert stats["checked"] == 4
+        assert stats["filtered"] == 3
+        assert stats["filter_rate"] == 0.75
+        assert stats["rules"]["greeting"] == 2
+        assert stats["rules"]["thanks"] == 1
+        assert stats["rules"]["no_amount"] == 0
+
+    def test_from_settings(self, tmp_path, monkeypatch):
+        """Test rules are extended from settings and a rules file."""
+        rules_file = tmp_path / "rules.json"
+        rules_file.write_text(
+            json.dumps({"greeting": ["moin"], "number_words": ["zwanzig"]})
+        )
+        monkeypatch.setattr(settings, "prefilter_rules", {"spam": ["free crypto"]})
+        monkeypatch.setattr(settings, "prefilter_rules_file", str(rules_file))
+
+        prefilter = PreFilter.from_settings()
+
+        assert prefilter.match("moin") == "greeting"
+        assert prefilter.match("free crypto 100") == "spam"
+        assert prefilter.match("zwanzig für Pizza") is None
+        assert prefilter.match("hola") == "greeting"
+
+    @pytest.mark.asyncio
+    async def test_analyzer_stats(self, expense_analyzer_dev):
+        """Test analyzer stats report pre-filter counters."""
+        await expense_analyzer_dev.analyze_message("gracias")
+
+        stats = expense_analyzer_dev.stats()["prefilter"]
+        assert stats["rules"]["thanks"] == 1
+        expense_analyzer_dev.llm.ainvoke.assert_not_called()
@@ -0,0 +1,156 @@
+"""Tests for single-flight coalescing of analyze_message calls."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight class."""
+
+    async def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        gate = asyncio.Event()
+        calls = []
+
+        async def call(value):
+            calls.append(value)
+            await gate.wait()
+            return value
+
+        waiters = [
+            asyncio.create_task(flight.do("a", lambda: call(1))),
+            asyncio.create_task(flight.do("a", lambda: call(2))),
+            asyncio.create_task(flight.do("b", lambda: call(3))),
+        ]
+        await asyncio.sleep(0)
+        gate.set()
+
+        assert await asyncio.gather(*waiters) == [1, 1, 3]
+        assert calls == [1, 3]
+        assert flight.stats() == {
+            "in_flight": 0,
+            "calls": 2,
+            "coalesced": 1,
+            "cancelled": 0,
+        }
+
+    async def test_cancelling_a_waiter_keeps_the_call(self):
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def call():
+            await gate.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("a", call))
+        second = asyncio.create_task(flight.do("a", call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+
+        assert await second == "done"
+        assert first.cancelled()
+
+    async def test_cancelling_the_last_waiter_cancels_the_call(self):
+        flight = SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.do("a", call))
+        second = asyncio.create_task(flight.do("a", call))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert flight.stats()["in_flight"] == 0
+        assert flight.stats()["cancelled"] == 1
+
+    async def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+        call = AsyncMock(side_effect=ValueError("boom"))
+
+        results = await asyncio.gather(
+            flight.do("a", call), flight.do("a", call), return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+        call.assert_awaited_once()
+        assert flight.stats()["in_flight"] == 0
+
+    async def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        call = AsyncMock(return_value=1)
+
+        await flight.do("a", call)
+        await flight.do("a", call)
+
+        assert call.await_count == 2
+
+
+class TestExpenseAnalyzerSingleFlight:
+    """Test cases for coalescing inside ExpenseAnalyzer."""
+
+    async def test_duplicates_share_one_llm_call(
+        self, expense_analyzer_dev, mock_llm_response, valid_expense_response
+    ):
+        async def slow_answer(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_llm_response(valid_expense_response)
+
+        expense_analyzer_dev.cache = None
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(side_effect=slow_answer)
+
+        first, second = await asyncio.gather(
+            expense_analyzer_dev.analyze_message("Lunch 25.50"),
+            expense_analyzer_dev.analyze_message("  lunch 25.50"),
+        )
+
+        assert first == second
+        assert first is not second
+        expense_analyzer_dev.llm.ainvoke.assert_called_once()
+        assert expense_analyzer_dev.stats()["singleflight"]["coalesced"] == 1
+
+    async def test_cancelled_caller_cancels_the_llm_call(
+        self, expense_analyzer_dev, mock_llm_response, valid_expense_response
+    ):
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def slow_answer(*args, **kwargs):
+            started.set()
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return mock_llm_response(valid_expense_response)
+
+        expense_analyzer_dev.cache = None
+        expense_analyzer_dev.llm.ainvoke = AsyncMock(side_effect=slow_answer)
+
+        task = asyncio.create_task(expense_analyzer_dev.analyze_message("Lunch 25.50"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert expense_analyzer_dev.stats()["singleflight"]["cancelled"] == 1
@@ -0,0 +1,142 @@
+"""Tests for streamed LLM answers with early termination."""
+
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.streaming import NOT_AN_EXPENSE, JsonObjectScanner
+
+
+def chunk(text, finish_reason=None):
+    mock_chunk = MagicMock()
+    mock_chunk.content = text
+    mock_chunk.text.return_value = text
+    mock_chunk.response_metadata = (
+        {"finish_reason": finish_reason} if finish_reason else {}
+    )
+    return mock_chunk
+
+
+class FakeStream:
+    """``llm.astream`` replacement recording how much of it was consumed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    def __call__(self, messages):
+        return self._generate()
+
+    async def _generate(self):
+        try:
+            for index, text in enumerate(self.chunks):
+                self.sent += 1
+                last = index == len(self.chunks) - 1
+                yield chunk(text, "stop" if last else None)
+        finally:
+            self.closed = True
+
+
+class TestJsonObjectScanner:
+    """Test cases for JsonObjectScanner class."""
+
+    def test_object_split_across_chunks(self):
+        scanner = JsonObjectScanner()
+        assert scanner.feed('Output: ```json\n{"is_expense": true, ') is None
+        assert scanner.feed('"amount": 12') is None
+        assert (
+            scanner.feed(".5}\n``` trailing") == '{"is_expense": true, "amount": 12.5}'
+        )
+
+    def test_braces_inside_strings(self):
+        scanner = JsonObjectScanner()
+        answer = scanner.feed('{"description": "a } and \\" {", "n": {"x": 1}} more')
+        assert answer == '{"description": "a } and \\" {", "n": {"x": 1}}'
+
+    def test_not_an_expense_short_circuits(self):
+        scanner = JsonObjectScanner()
+        assert scanner.feed('{"is_expense"') is None
+        assert scanner.feed(': false, "reason": "a greet') == NOT_AN_EXPENSE
+
+    def test_incomplete_stream(self):
+        scanner = JsonObjectScanner()
+        assert scanner.feed("no json here") is None
+        assert scanner.text() == ""
+        scanner.feed('{"is_expense": true')
+        assert scanner.text() == '{"is_expense": true'
+
+
+class TestStreamingAnalyzer:
+    """Test cases for ExpenseAnalyzer with streaming enabled."""
+
+    @pytest.mark.asyncio
+    async def test_stops_at_closing_brace(self, expense_analyzer_streaming):
+        stream = FakeStream(
+            [
+                '{"is_expense": true, "description": "Pizza", ',
+                '"amount": 20, "category": "Food"}',
+                "\nThe user bought a pizza",
+                " for twenty dollars.",
+            ]
+        )
+        expense_analyzer_streaming.llm.astream = stream
+
+        result = await expense_analyzer_streaming.analyze_message("Pizza 20")
+
+        assert result == {
+            "description": "Pizza",
+            "amount": Decimal("20"),
+            "category": "Food",
+        }
+        assert stream.sent == 2
+        assert stream.closed
+        assert expense_analyzer_streaming.stats()["streaming"] == {
+            "calls": 1,
+            "early_stops": 1,
+        }
+        expense_analyzer_streaming.llm.ainvoke.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stops_at_not_an_expense(self, expense_analyzer_streaming):
+        stream = FakeStream(
+            ['{"is_expense": ', 'false, "reason": ', '"no amount"}', "..."]
+        )
+        expense_analyzer_streaming.llm.astream = stream
+
+        assert await expense_analyzer_streaming.analyze_message("I paid 5") is None
+        assert stream.sent == 2
+        assert stream.closed
+
+    @pytest.mark.asyncio
+    async def test_complete_stream_is_not_an_early_stop(
+        self, expense_analyzer_streaming
+    ):
+        stream = FakeStream(
+            [
+                '{"is_expense": true, "description": "Taxi", ',
+                '"amount": 5, "category": "Transportation"}',
+            ]
+        )
+        expense_analyzer_streaming.llm.astream = stream
+
+        assert await expense_analyzer_streaming.analyze_message("Taxi 5")
+        assert stream.sent == 2
+        assert expense_analyzer_streaming.stats()["streaming"] == {
+            "calls": 1,
+            "early_stops": 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_truncated_stream(self, expense_analyzer_streaming):
+        stream = FakeStream(['{"is_expense": true, "amount": 5'])
+        expense_analyzer_streaming.llm.astream = stream
+
+        assert await expense_analyzer_streaming.analyze_message("Taxi 5") is None
+        assert stream.closed
+        assert expense_analyzer_streaming.stats()["streaming"]["early_stops"] == 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self, expense_analyzer_dev):
+        assert "streaming" not in expense_analyzer_dev.stats()
@@ -1,15 +1,16 @@
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app.expense_analyzer import ExpenseAnalyzer
 from app.models.healthcheck import HealthcheckResponse
 from app.settings import settings
 
 
 def test_health_check_healthy(client: TestClient):
     """Test health check endpoint when database is healthy."""
-    with patch("app.api.router.check_db_health", return_value=True):
+    with patch("app.api.router.check_db_health", AsyncMock(return_value=True)):
         response = client.get("/health")
         assert response.status_code == 200
 
@@ -23,7 +24,7 @@ def test_health_check_healthy(client: TestClient):
 
 def test_health_check_unhealthy(client: TestClient):
     """Test health check endpoint when database is unhealthy."""
-    with patch("app.api.router.check_db_health", return_value=False):
+    with patch("app.api.router.check_db_health", AsyncMock(return_value=False)):
         response = client.get("/health")
         assert response.status_code == 200
 
@@ -63,3 +64,19 @@ def test_health_check_response_model_validation():
             database="connected",
             expense_categories=["Food"],
         )
+
+
+def test_health_check_llm_circuit(client: TestClient):
+    """Test health check endpoint while the LLM circuit is open."""
+    analyzer = ExpenseAnalyzer(dev=True)
+    client.app.state.expense_analyzer = analyzer
+    try:
+        with patch("app.api.router.check_db_health", AsyncMock(return_value=True)):
+            assert client.get("/health").json()["llm_circuit"] == "closed"
+
+            analyzer.breaker._open()
+            health_data = client.get("/health").json()
+            assert health_data["status"] == "degraded"
+            assert health_data["llm_circuit"] == "open"
+    finally:
+        client.app.state.expense_analyzer = None
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+from app.metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS
+from app.settings import settings
+
+
+def test_metrics(client: TestClient):
+    """Test metrics are served in the Prometheus text format."""
+    client.get("/v1/users/")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "# TYPE expense_analyses counter" in response.text
+    assert "# TYPE db_pool_checked_out gauge" in response.text
+
+
+def test_request_latency_by_route_template(client: TestClient):
+    """Test request latency is recorded per route template, not per URL."""
+    series = HTTP_REQUEST_SECONDS.labels("GET", "/v1/expenses/{telegram_id}", "404")
+    before = series.count
+
+    client.get("/v1/expenses/123")
+    client.get("/v1/expenses/456")
+
+    assert series.count == before + 2
+    assert HTTP_REQUEST_SECONDS.labels("GET", "/nowhere", "404").count == 0
+
+
+def test_metrics_disabled(client: TestClient, monkeypatch):
+    """Test the endpoint is hidden when metrics are disabled."""
+    monkeypatch.setattr(settings, "metrics_enabled", False)
+
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,28 @@
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+
+def test_stats(client: TestClient):
+    """Test stats endpoint returns the analyzer counters."""
+    analyzer = MagicMock()
+    analyzer.stats.return_value = {"fast_path": {"hits": 3, "attempts": 4}}
+    client.app.state.expense_analyzer = analyzer
+
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    assert response.json()["fast_path"] == {"hits": 3, "attempts": 4}
+    assert response.json()["user_cache"]["size"] == 0
+    assert "checked_out" in response.json()["db_pool"]
+    assert response.json()["db_pool"]["profile"] == "default"
+    assert "imports" in response.json()["startup"]["phases"]
+
+
+def test_stats_unauthorized(unauthorized_client: TestClient):
+    """Test stats endpoint requires an API key."""
+    unauthorized_client.app.state.expense_analyzer = MagicMock()
+
+    response = unauthorized_client.get("/stats")
+
+    assert response.status_code == 403
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import AsyncMock
 
 import pytest
@@ -55,3 +56,30 @@ def sample_expense(session, sample_users):
     session.add(expense)
     session.commit()
     return expense
+
+
+@pytest.fixture
+def many_expenses(session, sample_users):
+    """Five expenses on consecutive days, two of them sharing a timestamp"""
+    created_at = [
+        datetime(2025, 1, 1, 12),
+        datetime(2025, 1, 2, 12),
+        datetime(2025, 1, 2, 12),
+        datetime(2025, 1, 3, 12),
+        datetime(2025, 1, 4, 12),
+    ]
+    expenses = [
+        Expenses(
+            id=index + 1,
+            user_id=sample_users[0].id,
+            amount=10.0 * (index + 1),
+            category="Food" if index % 2 == 0 else "Transportation",
+            description=f"Expense {index + 1}",
+            created_at=timestamp,
+            updated_at=timestamp,
+        )
+        for index, timestamp in enumerate(created_at)
+    ]
+    session.add_all(expenses)
+    session.commit()
+    return expenses
@@ -1,4 +1,25 @@
+import asyncio
+import csv
+import io
+import json
+
 import pytest
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import AsyncAdaptedQueuePool, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.admission import AdmissionRejected
+from app.auth import get_api_key
+from app.db import async_database_url, get_session_maker
+from app.export import ExportFormat, stream_expenses
+from app.main import app
+from app.models.expense_rollups import ExpenseRollups, ExpenseRollupState
+from app.models.expenses import CategorySource, Expenses
+from app.settings import settings
+from app.tracing import InMemoryExporter, Tracer, TracingMiddleware
 
 pytestmark = pytest.mark.asyncio
 
@@ -22,6 +43,57 @@ async def test_add_expense_success(client_with_analyzer, mock_analyzer, sample_u
     assert data["category"] == "Food"
     assert data["description"] == "Lunch"
     assert data["user_id"] == sample_users[0].id
+    assert data["needs_reanalysis"] is False
+
+
+async def test_add_expense_traced(client_with_analyzer, mock_analyzer, sample_users):
+    """Test a traced request records the dependency and storage spans"""
+    mock_analyzer.analyze_message.return_value = {
+        "amount": 100.0,
+        "category": "Food",
+        "description": "Lunch",
+    }
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, slow_threshold=0)
+
+    client = TestClient(TracingMiddleware(client_with_analyzer.app, tracer))
+    response = client.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}",
+        json={"message": "100 for lunch"},
+        headers={"X-Trace-Id": "lunch-1"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"] == "lunch-1"
+    (trace,) = exporter.traces
+    assert trace["trace_id"] == "lunch-1"
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert {"http.request", "find_user", "store_expense"} <= set(spans)
+    assert spans["http.request"]["attributes"] == {
+        "method": "POST",
+        "route": "/v1/expenses/{telegram_id}",
+        "status": 200,
+    }
+
+
+async def test_add_expense_degraded(
+    client_with_analyzer, mock_analyzer, sample_users, session
+):
+    """Test expense parsed locally while the LLM circuit is open"""
+    mock_analyzer.analyze_message.return_value = {
+        "amount": 100.0,
+        "category": "Food",
+        "description": "Lunch",
+        "needs_reanalysis": True,
+    }
+
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}", json={"message": "100 for lunch"}
+    )
+
+    assert response.status_code == 200
+    expense = session.get(Expenses, response.json()["id"])
+    assert expense.needs_reanalysis is True
 
 
 async def test_add_expense_invalid_message(
@@ -78,14 +150,496 @@ async def test_get_user_expenses_empty(client_with_analyzer, sample_users):
     assert response.json() == []
 
 
-async def test_invalid_telegram_id(client_with_analyzer):
+async def test_invalid_telegram_id(client_with_analyzer, mock_analyzer):
     """Test endpoints with invalid telegram ID"""
     # Test POST endpoint
     response = client_with_analyzer.post(
         "/v1/expenses/nonexistent", json={"message": "100 for lunch"}
     )
     assert response.status_code == 404
+    response = client_with_analyzer.post(
+        "/v1/expenses/nonexistent/batch", json={"messages": ["100 for lunch"]}
+    )
+    assert response.status_code == 404
+    # Unknown users never reach the LLM
+    mock_analyzer.analyze_message.assert_not_called()
+    mock_analyzer.analyze_messages.assert_not_called()
 
     # Test GET endpoint
     response = client_with_analyzer.get("/v1/expenses/nonexistent")
     assert response.status_code == 404
+
+
+async def test_add_expenses_batch(
+    client_with_analyzer, mock_analyzer, sample_users, session
+):
+    """Test batch expense addition reports per-item results"""
+    mock_analyzer.analyze_messages.return_value = [
+        {"amount": 10.0, "category": "Food", "description": "Lunch"},
+        None,
+        {"amount": 2.5, "category": "Transportation", "description": "Bus"},
+    ]
+
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}/batch",
+        json={"messages": ["lunch 10", "hello", "bus 2.5"]},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["rejected"] == 1
+    assert [item["status"] for item in data["results"]] == [
+        "created",
+        "rejected",
+        "created",
+    ]
+    assert data["results"][0]["expense"]["description"] == "Lunch"
+    assert data["results"][0]["expense"]["user_id"] == sample_users[0].id
+    assert data["results"][1]["detail"] == "Invalid message"
+    assert data["results"][2]["expense"]["id"] is not None
+    mock_analyzer.analyze_messages.assert_awaited_once_with(
+        ["lunch 10", "hello", "bus 2.5"], "john@example.com"
+    )
+
+    response = client_with_analyzer.get(f"/v1/expenses/{sample_users[0].telegram_id}")
+    assert len(response.json()) == 2
+
+
+async def test_add_expenses_batch_all_rejected(
+    client_with_analyzer, mock_analyzer, sample_users, session_maker
+):
+    """Test a batch without valid messages writes nothing"""
+    opened = []
+
+    def counting_maker():
+        opened.append(True)
+        return session_maker()
+
+    app.dependency_overrides[get_session_maker] = lambda: counting_maker
+    mock_analyzer.analyze_messages.return_value = [None, None]
+
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}/batch",
+        json={"messages": ["hello", "thanks"]},
+    )
+
+    assert response.status_code == 200
+    assert (response.json()["created"], response.json()["rejected"]) == (0, 2)
+    # Only the user lookup opened a session
+    assert len(opened) == 1
+
+
+async def test_add_expenses_batch_analyzer_error(
+    client_with_analyzer, mock_analyzer, sample_users
+):
+    """Test batch expense addition when analyzer raises an error"""
+    mock_analyzer.analyze_messages.side_effect = Exception("Analysis error")
+
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}/batch",
+        json={"messages": ["lunch 10"]},
+    )
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Internal server error"
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"messages": []},
+        {"messages": [""]},
+        {"messages": ["lunch 10"] * 101},
+    ],
+)
+async def test_add_expenses_batch_invalid_payload(
+    client_with_analyzer, sample_users, payload
+):
+    """Test batch expense addition validates the payload"""
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}/batch", json=payload
+    )
+
+    assert response.status_code == 422
+
+
+async def test_no_connection_held_during_analysis(database_url, session, sample_users):
+    """Test concurrent slow analyses do not keep pooled connections checked out"""
+    concurrency = 10
+    engine = create_async_engine(
+        async_database_url(database_url),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=concurrency,
+        max_overflow=0,
+    )
+    checked_out = {"now": 0, "max": 0}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(*args):
+        checked_out["now"] += 1
+        checked_out["max"] = max(checked_out["max"], checked_out["now"])
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(*args):
+        checked_out["now"] -= 1
+
+    # Every request waits here until all of them are in their LLM call, then
+    # the number of checked out connections is recorded once
+    in_analysis = []
+    all_in_analysis = asyncio.Event()
+    during_analysis = []
+
+    class SlowAnalyzer:
+        async def analyze_message(self, message, telegram_id=None):
+            await asyncio.sleep(0.1)
+            in_analysis.append(message)
+            if len(in_analysis) == concurrency:
+                during_analysis.append(checked_out["now"])
+                all_in_analysis.set()
+            await all_in_analysis.wait()
+            return {"amount": 10.0, "category": "Food", "description": "Lunch"}
+
+    maker = async_sessionmaker(
+        engine, class_=AsyncSession, autoflush=True, expire_on_commit=False
+    )
+    app.dependency_overrides[get_session_maker] = lambda: maker
+    app.dependency_overrides[get_api_key] = lambda: None
+    app.state.expense_analyzer = SlowAnalyzer()
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(
+                    client.post(
+                        f"/v1/expenses/{sample_users[0].telegram_id}",
+                        json={"message": "lunch 10"},
+                    )
+                    for _ in range(concurrency)
+                )
+            )
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    assert [r.status_code for r in responses] == [200] * concurrency
+    assert during_analysis == [0]
+    assert checked_out["max"] <= concurrency
+
+
+async def test_get_user_expenses_pagination(client_with_analyzer, many_expenses):
+    """Test keyset pagination walks every expense exactly once, in order"""
+    url = "/v1/expenses/john@example.com"
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+        response = client_with_analyzer.get(url, params=params)
+        assert response.status_code == 200
+        seen.extend(expense["id"] for expense in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == [1, 2, 3, 4, 5]
+    assert pages == 3
+
+
+async def test_get_user_expenses_last_page_has_no_cursor(
+    client_with_analyzer, many_expenses
+):
+    """Test a page holding the remaining rows has no next cursor"""
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com", params={"limit": 5}
+    )
+
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+
+async def test_get_user_expenses_filters(client_with_analyzer, many_expenses):
+    """Test date range and category filters"""
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com",
+        params={
+            "start": "2025-01-02T00:00:00Z",
+            "end": "2025-01-04T00:00:00+00:00",
+            "category": "Transportation",
+        },
+    )
+
+    assert response.status_code == 200
+    assert [expense["id"] for expense in response.json()] == [2, 4]
+
+
+async def test_get_user_expenses_invalid_cursor(client_with_analyzer, sample_users):
+    """Test a malformed cursor is rejected"""
+    response = client_with_analyzer.get(
+        f"/v1/expenses/{sample_users[0].telegram_id}", params={"cursor": "nope"}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("limit", [0, 1001])
+async def test_get_user_expenses_invalid_limit(
+    client_with_analyzer, sample_users, limit
+):
+    """Test page size bounds"""
+    response = client_with_analyzer.get(
+        f"/v1/expenses/{sample_users[0].telegram_id}", params={"limit": limit}
+    )
+
+    assert response.status_code == 422
+
+
+async def test_export_user_expenses_ndjson(client_with_analyzer, many_expenses):
+    """Test NDJSON export streams one JSON object per expense"""
+    response = client_with_analyzer.get("/v1/expenses/john@example.com/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "expenses-john@example.com.ndjson" in (
+        response.headers["content-disposition"]
+    )
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[0] == {
+        "id": 1,
+        "created_at": "2025-01-01T12:00:00",
+        "description": "Expense 1",
+        "amount": 10.0,
+        "category": "Food",
+    }
+
+
+async def test_export_user_expenses_csv(client_with_analyzer, many_expenses):
+    """Test CSV export has a header and one line per expense"""
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com/export", params={"format": "csv"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "created_at", "description", "amount", "category"]
+    assert rows[1] == ["1", "2025-01-01T12:00:00", "Expense 1", "10.0", "Food"]
+    assert len(rows) == 6
+
+
+async def test_export_user_expenses_empty(client_with_analyzer, sample_users):
+    """Test exporting a user without expenses"""
+    response = client_with_analyzer.get(
+        f"/v1/expenses/{sample_users[1].telegram_id}/export"
+    )
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+async def test_export_user_expenses_errors(client_with_analyzer, sample_users):
+    """Test export of unknown users and formats"""
+    response = client_with_analyzer.get("/v1/expenses/nonexistent/export")
+    assert response.status_code == 404
+
+    response = client_with_analyzer.get(
+        f"/v1/expenses/{sample_users[0].telegram_id}/export", params={"format": "xml"}
+    )
+    assert response.status_code == 422
+
+
+async def test_import_statement(
+    client_with_analyzer, mock_analyzer, sample_users, session
+):
+    """Test a statement is imported and its summary of rows returned"""
+    mock_analyzer.categorize.side_effect = lambda description, telegram_id: (
+        ("Food", CategorySource.FAST_PATH) if "Lunch" in description else None
+    )
+    mock_analyzer.analyze_messages.side_effect = lambda messages, telegram_id, **_: [
+        {"description": "Gym", "amount": 30.0, "category": "Healthcare"}
+    ] * len(messages)
+    statement = (
+        "booking date;text;value\n"
+        "2025-03-01;Lunch at work;-12,50\n"
+        "2025-03-02;FITNESS CLUB;-30,00\n"
+        "2025-03-03;Refund;5,00\n"
+    )
+
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}/import",
+        params={
+            "description_column": "text",
+            "amount_column": "value",
+            "date_column": "booking date",
+            "delimiter": ";",
+        },
+        content=statement.encode(),
+        headers={"Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "done"
+    assert (data["rows"], data["created"], data["llm_rows"], data["skipped"]) == (
+        3,
+        2,
+        1,
+        1,
+    )
+    expenses = session.exec(select(Expenses).order_by(Expenses.id)).all()
+    assert [(e.amount, e.category) for e in expenses] == [
+        (12.5, "Food"),
+        (30.0, "Healthcare"),
+    ]
+
+
+async def test_import_statement_errors(client_with_analyzer, sample_users):
+    """Test imports of unknown users, imports and columns"""
+    url = f"/v1/expenses/{sample_users[0].telegram_id}/import"
+
+    response = client_with_analyzer.post(
+        "/v1/expenses/nonexistent/import", content=b"description,amount\n"
+    )
+    assert response.status_code == 404
+
+    response = client_with_analyzer.post(
+        url, params={"import_id": 42}, content=b"description,amount\n"
+    )
+    assert response.status_code == 404
+
+    response = client_with_analyzer.post(url, content=b"memo,amount\nLunch,-3\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing columns: description"
+
+
+@pytest.mark.parametrize(
+    "export_format,expected_chunks",
+    [(ExportFormat.NDJSON, 3), (ExportFormat.CSV, 4)],
+)
+async def test_stream_expenses_yields_one_chunk_per_batch(
+    session_maker, many_expenses, monkeypatch, export_format, expected_chunks
+):
+    """Test rows are read and encoded batch by batch"""
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+
+    chunks = [
+        chunk
+        async for chunk in stream_expenses(
+            session_maker, many_expenses[0].user_id, export_format
+        )
+    ]
+
+    assert len(chunks) == expected_chunks
+    assert b"".join(chunks).count(b"Expense ") == 5
+
+
+@pytest.mark.parametrize(
+    "group_by,expected",
+    [
+        (
+            "category",
+            [
+                {"key": "Food", "total": 90.0, "count": 3},
+                {"key": "Transportation", "total": 60.0, "count": 2},
+            ],
+        ),
+        (
+            "day",
+            [
+                {"key": "2025-01-01", "total": 10.0, "count": 1},
+                {"key": "2025-01-02", "total": 50.0, "count": 2},
+                {"key": "2025-01-03", "total": 40.0, "count": 1},
+                {"key": "2025-01-04", "total": 50.0, "count": 1},
+            ],
+        ),
+        ("week", [{"key": "2024-12-30", "total": 150.0, "count": 5}]),
+        ("month", [{"key": "2025-01-01", "total": 150.0, "count": 5}]),
+    ],
+)
+async def test_get_user_expenses_summary(
+    client_with_analyzer, many_expenses, group_by, expected
+):
+    """Test summary grouping"""
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com/summary", params={"group_by": group_by}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "group_by": group_by,
+        "total": 150.0,
+        "count": 5,
+        "groups": expected,
+    }
+
+
+async def test_get_user_expenses_summary_filters(client_with_analyzer, many_expenses):
+    """Test summary date range and category filters"""
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com/summary",
+        params={"start": "2025-01-02", "end": "2025-01-04", "category": "Food"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["groups"] == [{"key": "Food", "total": 30.0, "count": 1}]
+
+
+async def test_get_user_expenses_summary_seeds_rollups_once(
+    client_with_analyzer, mock_analyzer, session, many_expenses
+):
+    """Test history is rolled up on first summary and inserts keep it current"""
+    mock_analyzer.analyze_message.return_value = {
+        "amount": 5.0,
+        "category": "Food",
+        "description": "Coffee",
+    }
+    mock_analyzer.analyze_messages.return_value = [
+        {"amount": 7.0, "category": "Food", "description": "Tea"},
+        None,
+    ]
+    url = "/v1/expenses/john@example.com"
+
+    # Not summarized yet: inserts leave the rollups alone
+    client_with_analyzer.post(url, json={"message": "coffee 5"})
+    assert session.exec(select(ExpenseRollups)).all() == []
+
+    def food_total():
+        response = client_with_analyzer.get(f"{url}/summary")
+        return response.json()["groups"][0]
+
+    assert food_total() == {"key": "Food", "total": 95.0, "count": 4}
+    assert session.get(ExpenseRollupState, 1) is not None
+
+    client_with_analyzer.post(url, json={"message": "coffee 5"})
+    client_with_analyzer.post(f"{url}/batch", json={"messages": ["tea 7", "hi"]})
+    assert food_total() == {"key": "Food", "total": 107.0, "count": 6}
+
+
+async def test_get_user_expenses_summary_errors(client_with_analyzer, sample_users):
+    """Test summary of unknown users and invalid grouping"""
+    response = client_with_analyzer.get("/v1/expenses/nonexistent/summary")
+    assert response.status_code == 404
+
+    response = client_with_analyzer.get(
+        "/v1/expenses/john@example.com/summary", params={"group_by": "year"}
+    )
+    assert response.status_code == 422
+
+
+async def test_add_expense_admission_rejected(
+    client_with_analyzer, mock_analyzer, sample_users
+):
+    """Test a saturated analyzer answers 429 with Retry-After"""
+    mock_analyzer.analyze_message.side_effect = AdmissionRejected("Busy", 3)
+    mock_analyzer.analyze_messages.side_effect = AdmissionRejected("Busy", 3)
+    url = f"/v1/expenses/{sample_users[0].telegram_id}"
+
+    response = client_with_analyzer.post(url, json={"message": "100 for lunch"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+    response = client_with_analyzer.post(f"{url}/batch", json={"messages": ["a 1"]})
+    assert response.status_code == 429
@@ -0,0 +1,215 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from app.admission import AdmissionRejected
+from app.db import utcnow
+from app.jobs import ExpenseJobWorker, enqueue_expense_job
+from app.models.expense_jobs import ExpenseJobs, JobStatus
+from app.models.expenses import Expenses
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def worker(mock_analyzer, session_maker):
+    """Job worker driven one job at a time through ``run_once``"""
+    mock_analyzer.analyze_message.return_value = {
+        "amount": 12.5,
+        "category": "Food",
+        "description": "Lunch",
+    }
+    return ExpenseJobWorker(mock_analyzer, session_maker, workers=1, max_attempts=2)
+
+
+@pytest_asyncio.fixture
+async def job(session_maker, sample_users):
+    """Pending job of the first sample user"""
+    user = sample_users[0]
+    return await enqueue_expense_job(
+        session_maker, user.id, user.telegram_id, "lunch 12.5"
+    )
+
+
+async def test_add_expense_async(client_with_analyzer, mock_analyzer, sample_users):
+    """Test async mode queues the message and answers 202"""
+    response = client_with_analyzer.post(
+        f"/v1/expenses/{sample_users[0].telegram_id}",
+        params={"async": "true"},
+        json={"message": "100 for lunch"},
+    )
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status"] == "pending"
+    assert response.headers["Location"] == f"/v1/jobs/{job_id}"
+    mock_analyzer.analyze_message.assert_not_called()
+
+    response = client_with_analyzer.get(f"/v1/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+    assert response.json()["expense"] is None
+
+
+async def test_add_expense_async_unknown_user(client_with_analyzer):
+    """Test async mode checks the user before queuing"""
+    response = client_with_analyzer.post(
+        "/v1/expenses/nonexistent", params={"async": "true"}, json={"message": "a 1"}
+    )
+
+    assert response.status_code == 404
+
+
+async def test_get_job_not_found(client):
+    """Test unknown job ids"""
+    response = client.get("/v1/jobs/42")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Job not found"
+
+
+async def test_run_once_inserts_expense(client, worker, job, mock_analyzer):
+    """Test a worker analyzes a job and stores its expense"""
+    assert await worker.run_once() is True
+    assert await worker.run_once() is False
+
+    mock_analyzer.analyze_message.assert_awaited_once_with(
+        "lunch 12.5", "john@example.com", raise_errors=True
+    )
+    data = client.get(f"/v1/jobs/{job.id}").json()
+    assert data["status"] == "done"
+    assert data["attempts"] == 1
+    assert data["expense"]["description"] == "Lunch"
+    assert data["expense"]["amount"] == 12.5
+
+
+async def test_run_once_rejects_non_expenses(worker, job, mock_analyzer, session_maker):
+    """Test messages that are not expenses end the job"""
+    mock_analyzer.analyze_message.return_value = None
+
+    await worker.run_once()
+
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+    assert stored.status == JobStatus.REJECTED
+    assert stored.error == "Invalid message"
+
+
+async def test_run_once_retries_errors(worker, job, mock_analyzer, session_maker):
+    """Test failed analyses are retried with backoff until max_attempts"""
+    mock_analyzer.analyze_message.side_effect = Exception("provider down")
+
+    await worker.run_once()
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+        assert stored.status == JobStatus.PENDING
+        assert stored.locked_until > utcnow()
+        # Skip the backoff
+        stored.locked_until = None
+        await session.commit()
+
+    await worker.run_once()
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+    assert stored.status == JobStatus.FAILED
+    assert stored.attempts == 2
+    assert stored.error == "provider down"
+
+
+async def test_run_once_requeues_rejected_admission(
+    worker, job, mock_analyzer, session_maker
+):
+    """Test saturation delays the job without spending an attempt"""
+    mock_analyzer.analyze_message.side_effect = AdmissionRejected("Busy", 30)
+
+    await worker.run_once()
+
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+    assert stored.status == JobStatus.PENDING
+    assert stored.attempts == 0
+    assert await worker.run_once() is False
+
+
+async def test_expired_lease_is_claimed_again(worker, job, session_maker):
+    """Test jobs of a dead worker are picked up after their lease"""
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+        stored.status = JobStatus.RUNNING
+        stored.attempts = 1
+        stored.locked_until = utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    assert await worker.run_once() is True
+
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+    assert stored.status == JobStatus.DONE
+    assert stored.attempts == 2
+
+
+async def test_exhausted_lease_is_failed(worker, job, session_maker):
+    """Test a job whose worker died on its last attempt is not claimed again"""
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+        stored.status = JobStatus.RUNNING
+        stored.attempts = worker.max_attempts
+        stored.locked_until = utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    assert await worker.run_once() is False
+
+    async with session_maker() as session:
+        stored = await session.get(ExpenseJobs, job.id)
+    assert stored.status == JobStatus.FAILED
+    assert stored.attempts == worker.max_attempts
+    assert stored.locked_until is None
+
+
+async def test_lost_claim_writes_nothing(worker, job, mock_analyzer, session_maker):
+    """Test a worker whose lease was taken over does not insert the expense"""
+
+    async def reclaimed(*args, **kwargs):
+        async with session_maker() as session:
+            stored = await session.get(ExpenseJobs, job.id)
+            stored.attempts += 1
+            await session.commit()
+        return {"amount": 1, "category": "Food", "description": "Tea"}
+
+    mock_analyzer.analyze_message.side_effect = reclaimed
+
+    await worker.run_once()
+
+    async with session_maker() as session:
+        assert (await session.exec(select(Expenses))).all() == []
+        assert (await session.get(ExpenseJobs, job.id)).status == JobStatus.RUNNING
+
+
+async def test_claim_skips_locked_rows(worker):
+    """Test the claim query skips rows locked by other workers on Postgres"""
+    sql = str(worker._claim_statement(utcnow()).compile(dialect=postgresql.dialect()))
+
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+async def test_workers_process_notified_jobs(mock_analyzer, session_maker, job):
+    """Test started workers pick up jobs until stopped"""
+    worker = ExpenseJobWorker(mock_analyzer, session_maker, workers=2, poll_interval=60)
+    mock_analyzer.analyze_message.return_value = None
+    worker.start()
+    worker.notify()
+
+    for _ in range(100):
+        async with session_maker() as session:
+            stored = await session.get(ExpenseJobs, job.id)
+        if stored.status == JobStatus.REJECTED:
+            break
+        await asyncio.sleep(0.01)
+    await worker.stop()
+
+    assert stored.status == JobStatus.REJECTED
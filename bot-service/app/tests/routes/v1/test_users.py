@@ -105,3 +105,26 @@ class TestAsyncUserRoutes:
         # All requests should succeed
         for response in responses:
             assert response.status_code == 200
+
+
+class TestUserCache:
+    """Test cases for the telegram_id lookup cache"""
+
+    def test_create_user_invalidates_unknown_user(self, client, session):
+        """Test a user is found right after creation despite the negative cache"""
+        url = "/v1/expenses/newuser@example.com"
+
+        assert client.get(url).status_code == 404
+        client.post("/v1/users/", json={"telegram_id": "newuser@example.com"})
+
+        assert client.get(url).status_code == 200
+
+    def test_repeated_lookups_hit_cache(self, client_with_analyzer, sample_users):
+        """Test repeated requests of a user are answered from the cache"""
+        client = client_with_analyzer
+        hits = client.get("/stats").json()["user_cache"]["hits"]
+
+        client.get("/v1/expenses/john@example.com")
+        client.get("/v1/expenses/john@example.com")
+
+        assert client.get("/stats").json()["user_cache"]["hits"] == hits + 1
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app import llm_providers
+from app.expense_analyzer import ExpenseAnalyzer
+from app.llm_providers import LazyChatModel, create_chat_model, get_factory
+from app.settings import settings
+from app.startup import StartupReport
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """A registered backend recording the models it created"""
+    created = []
+
+    def factory(model):
+        created.append(model)
+        return type("ChatModel", (), {"model_name": model})()
+
+    monkeypatch.setitem(llm_providers._factories, "fake", factory)
+    monkeypatch.setattr(llm_providers, "import_seconds", {})
+    return created
+
+
+def test_lazy_chat_model_created_on_first_use(fake_backend):
+    llm = LazyChatModel("fake", "small")
+
+    assert not llm.loaded
+    assert fake_backend == []
+    assert llm.model_name == "small"
+    assert llm.model_name == "small"
+    assert fake_backend == ["small"]
+    assert "fake" in llm_providers.import_seconds
+
+
+@pytest.mark.asyncio
+async def test_calls_wait_for_the_preload(monkeypatch):
+    """Calls during a preload wait for it, without blocking the event loop"""
+    created = []
+    release = threading.Event()
+
+    class ChatModel:
+        async def ainvoke(self, messages):
+            return f"answer to {messages}"
+
+        async def astream(self, messages):
+            yield "chunk"
+
+    def slow_factory(model):
+        release.wait()
+        created.append(model)
+        return ChatModel()
+
+    monkeypatch.setitem(llm_providers._factories, "slow", slow_factory)
+    monkeypatch.setattr(llm_providers, "import_seconds", {})
+    llm = LazyChatModel("slow", "small")
+    preload = asyncio.create_task(asyncio.to_thread(llm.load))
+    calls = asyncio.gather(
+        llm.ainvoke("hi"), llm.ainvoke("there"), anext(llm.astream("hi"))
+    )
+
+    # The loop keeps running while the model is created
+    await asyncio.sleep(0.05)
+    assert not calls.done()
+    release.set()
+
+    assert await calls == ["answer to hi", "answer to there", "chunk"]
+    await preload
+    assert created == ["small"]
+
+
+def test_unknown_backend_fails_early():
+    with pytest.raises(ValueError, match="Unknown LLM backend"):
+        LazyChatModel("nope", "model")
+
+
+def echo_factory(model):
+    return ("echo", model)
+
+
+def test_factory_path():
+    path = "app.tests.test_llm_providers:echo_factory"
+
+    assert get_factory(path) is echo_factory
+    assert create_chat_model(path, "m") == ("echo", "m")
+
+
+def test_analyzer_backend_from_settings(fake_backend, monkeypatch):
+    monkeypatch.setattr(settings, "llm_backend", "fake")
+
+    analyzer = ExpenseAnalyzer(dev=True)
+
+    assert analyzer.llm.backend == "fake"
+    assert analyzer.model_name == settings.llm_model
+    assert fake_backend == []
+    analyzer.preload_llm()
+    assert fake_backend == [settings.llm_model]
+
+
+def test_analyzer_dev_backend_is_huggingface():
+    analyzer = ExpenseAnalyzer(dev=True)
+
+    assert analyzer.llm.backend == "huggingface"
+    assert analyzer.llm.model == settings.huggingfacehub_model
+    assert not analyzer.llm.loaded
+
+
+def test_preload_failure_logged(monkeypatch, caplog):
+    def broken(model):
+        raise RuntimeError("no token")
+
+    monkeypatch.setitem(llm_providers._factories, "broken", broken)
+    monkeypatch.setattr(settings, "llm_backend", "broken")
+    analyzer = ExpenseAnalyzer(dev=True)
+
+    with caplog.at_level(logging.WARNING):
+        analyzer.preload_llm()
+
+    assert "Failed to preload LLM backend broken" in caplog.text
+    assert not analyzer.llm.loaded
+
+
+def test_startup_report_phases():
+    report = StartupReport(origin=0.0)
+    report.mark("imports")
+    report.mark("lifespan")
+
+    stats = report.as_dict()
+    assert list(stats["phases"]) == ["imports", "lifespan"]
+    assert stats["ready_s"] >= stats["phases"]["lifespan"]
+    assert stats["max_rss_mb"] > 0
+
+
+def test_app_import_skips_provider_packages():
+    """Importing the app must not pull in any LLM provider package"""
+    code = (
+        "import sys, app.main\n"
+        "from app.startup import PROVIDER_MODULES\n"
+        "print([m for m in PROVIDER_MODULES if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,78 @@
+import pytest
+
+from app.metrics import Counter, Histogram, Registry, _Metric
+
+
+def test_counter_render():
+    """Test counters render one sample per label set with the _total suffix."""
+    registry = Registry()
+    counter = registry.counter("events", "Events seen", ["kind"])
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    counter.labels('say "hi"').inc()
+
+    assert counter.value("a") == 3
+    assert registry.render() == (
+        "# HELP events Events seen\n"
+        "# TYPE events counter\n"
+        'events_total{kind="a"} 3\n'
+        'events_total{kind="say \\"hi\\""} 1\n'
+    )
+
+
+def test_histogram_render():
+    """Test histogram buckets are cumulative and end with +Inf."""
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    assert histogram.labels().count == 4
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_histogram_time():
+    """Test timing a block observes its duration."""
+    histogram = Histogram("stage_seconds", "Stages", ["stage"])
+
+    with histogram.labels("parse").time():
+        pass
+
+    assert histogram.labels("parse").count == 1
+    assert histogram.labels("parse").sum < 0.1
+
+
+def test_gauge_reads_at_render():
+    """Test gauges call their callback at render time and skip missing values."""
+    registry = Registry()
+    value = [None]
+    registry.gauge("connections", "Open connections", lambda: value[0])
+
+    assert "\nconnections " not in registry.render()
+    value[0] = 5
+    assert "connections 5\n" in registry.render()
+
+
+def test_invalid_use():
+    """Test duplicate names and wrong label counts are rejected."""
+    registry = Registry()
+    registry.counter("events", "Events")
+    with pytest.raises(ValueError):
+        registry.counter("events", "Events")
+    with pytest.raises(ValueError):
+        Counter("other", "Other", ["kind"]).inc()
+
+
+def test_metric_kinds_implement_samples():
+    """Test a metric kind without its samples cannot be created."""
+
+    class Incomplete(_Metric):
+        kind = "untyped"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Incomplete")
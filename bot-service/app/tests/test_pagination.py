@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor, to_naive_utc
+
+
+def test_cursor_round_trip():
+    """Test cursors decode to the sort key they were built from."""
+    created_at = datetime(2025, 5, 24, 8, 19, 16, 997959)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "nope", encode_cursor(datetime.now(), 1)[:-3]])
+def test_decode_invalid_cursor(cursor):
+    """Test malformed cursors raise ValueError."""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_to_naive_utc():
+    """Test aware datetimes are converted to naive UTC."""
+    aware = datetime(2025, 1, 1, 12, tzinfo=timezone(timedelta(hours=-3)))
+
+    assert to_naive_utc(aware) == datetime(2025, 1, 1, 15)
+    assert to_naive_utc(datetime(2025, 1, 1)) == datetime(2025, 1, 1)
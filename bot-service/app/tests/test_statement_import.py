@@ -0,0 +1,305 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlmodel import select
+
+from app.models.expense_imports import ExpenseImports, ImportStatus, StatementColumns
+from app.models.expenses import CategorySource, Expenses
+from app.models.users import Users
+from app.settings import settings
+from app.statement_import import (
+    MAX_RECORD_LENGTH,
+    ImportConflict,
+    InvalidStatement,
+    StatementImporter,
+    column_indices,
+    parse_amount,
+    parse_row,
+    read_records,
+    start_import,
+)
+
+STATEMENT = (
+    "Date,Description,Amount\n"
+    "2025-01-02,STARBUCKS COFFEE #123,-4.50\n"
+    "2025-01-03,Salary ACME,2500.00\n"
+    "2025-01-04,NETFLIX.COM,-15.99\n"
+    "not a date,Refund,-1\n"
+    "2025-01-06,NETFLIX.COM,-15.99\n"
+    "2025-01-07,Transfer to savings,-200\n"
+)
+COLUMNS = StatementColumns(
+    description_column="Description", amount_column="Amount", date_column="Date"
+)
+
+
+async def stream(data: str, size: int = 7):
+    raw = data.encode()
+    for start in range(0, len(raw), size):
+        yield raw[start : start + size]
+
+
+async def collect(chunks, delimiter=",", max_record_length=MAX_RECORD_LENGTH):
+    return [
+        record async for record in read_records(chunks, delimiter, max_record_length)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_records_across_chunks():
+    """Test records split across chunks, quoted newlines and a BOM."""
+    data = '﻿a;b\r\n"multi\nline";"say ""hi"""\r\n\r\nlast;1'
+
+    for size in (1, 3, 1000):
+        assert await collect(stream(data, size), ";") == [
+            ["a", "b"],
+            ["multi\nline", 'say "hi"'],
+            ["last", "1"],
+        ]
+
+
+@pytest.mark.asyncio
+async def test_read_records_unterminated_quote():
+    """Test a stray quote fails instead of buffering the rest of the upload."""
+    data = 'a,b\n"open,1\n' + "x,2\n" * 100
+
+    with pytest.raises(InvalidStatement, match="Unterminated quoted field"):
+        await collect(stream(data, 16), ",", max_record_length=100)
+    # Within the limit, the quote may still close
+    assert len(await collect(stream(data + '"\n', 16), ",", 1000)) == 2
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        ("-4.50", Decimal("-4.50")),
+        ("1.234,56 €", Decimal("1234.56")),
+        ("(12.50)", Decimal("-12.50")),
+        ("12,50-", Decimal("-12.50")),
+        ("$ -1,234.56", Decimal("-1234.56")),
+    ],
+)
+def test_parse_amount(raw, expected):
+    """Test statement amounts with signs, symbols and either locale."""
+    assert parse_amount(raw) == expected
+
+
+def test_parse_amount_invalid():
+    """Test unreadable amounts are rejected."""
+    with pytest.raises(ValueError):
+        parse_amount("n/a")
+
+
+def test_parse_row():
+    """Test debits are expenses and credits are skipped."""
+    columns = COLUMNS.model_copy(
+        update={"category_column": "Type", "date_format": "%d/%m/%Y"}
+    )
+    indices = column_indices(["date", "description", "amount", "type"], columns)
+
+    row = parse_row(
+        ["02/01/2025", " Uber   trip ", "-12.30", "transportation"], indices, columns
+    )
+    assert row.description == "Uber trip"
+    assert row.amount == 12.3
+    assert row.created_at == datetime(2025, 1, 2)
+    assert row.category == "Transportation"
+    assert parse_row(["02/01/2025", "Salary", "100", ""], indices, columns) is None
+    assert (
+        parse_row(
+            ["02/01/2025", "Fee", "3", "bank"],
+            indices,
+            columns.model_copy(update={"debits_negative": False}),
+        ).category
+        is None
+    )
+    with pytest.raises(ValueError):
+        parse_row(["2025-01-02", "Uber", "-1", ""], indices, columns)
+    with pytest.raises(ValueError):
+        parse_row(["02/01/2025", "Uber"], indices, columns)
+
+
+def test_column_indices_missing():
+    """Test statements without a mapped column cannot be imported."""
+    with pytest.raises(InvalidStatement):
+        column_indices(["Date", "Memo", "Amount"], COLUMNS)
+
+
+@pytest.fixture
+def user(session):
+    user = Users(id=1, telegram_id="importer")
+    session.add(user)
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = MagicMock()
+    analyzer.categorize.side_effect = lambda description, telegram_id: (
+        ("Food", CategorySource.FAST_PATH) if "COFFEE" in description else None
+    )
+
+    async def analyze_messages(
+        messages, telegram_id, raise_errors=False, prefilter=True
+    ):
+        return [
+            (
+                None
+                if message.startswith("Transfer")
+                else {
+                    "description": message,
+                    "amount": 1.0,
+                    "category": "Entertainment",
+                }
+            )
+            for message in messages
+        ]
+
+    analyzer.analyze_messages = AsyncMock(side_effect=analyze_messages)
+    return analyzer
+
+
+async def stored_expenses(session_maker):
+    async with session_maker() as session:
+        return (await session.exec(select(Expenses).order_by(Expenses.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_import_statement(session_maker, user, analyzer):
+    """Test rows are categorized locally first and by the LLM once per description."""
+    job = await start_import(session_maker, user.id, COLUMNS)
+    importer = StatementImporter(analyzer, session_maker, job, "importer", chunk_size=2)
+
+    await importer.run(stream(STATEMENT))
+
+    expenses = await stored_expenses(session_maker)
+    assert [(e.description, e.amount, e.category) for e in expenses] == [
+        ("STARBUCKS COFFEE #123", 4.5, "Food"),
+        ("NETFLIX.COM", 15.99, "Entertainment"),
+        ("NETFLIX.COM", 15.99, "Entertainment"),
+    ]
+    assert [e.category_source for e in expenses] == ["fast_path", "llm", "llm"]
+    assert expenses[0].created_at == datetime(2025, 1, 2)
+    # The second NETFLIX.COM reuses the answer of the first
+    assert [call.args[0] for call in analyzer.analyze_messages.call_args_list] == [
+        ["NETFLIX.COM 15.99"],
+        ["Transfer to savings 200.00"],
+    ]
+    response = importer.response(elapsed=0.5)
+    assert response.status == ImportStatus.DONE
+    assert (response.rows, response.rows_done, response.created) == (6, 6, 3)
+    assert (response.llm_rows, response.skipped, response.invalid) == (3, 2, 1)
+    assert response.rows_per_second == 12.0
+
+
+@pytest.mark.asyncio
+async def test_resume_import(session_maker, user, analyzer):
+    """Test a failed import resumes after its last committed chunk."""
+    analyzer.analyze_messages.side_effect = [
+        [{"description": "x", "amount": 1.0, "category": "Entertainment"}],
+        RuntimeError("provider down"),
+    ]
+    job = await start_import(session_maker, user.id, COLUMNS)
+    importer = StatementImporter(analyzer, session_maker, job, "importer", chunk_size=2)
+    with pytest.raises(RuntimeError):
+        await importer.run(stream(STATEMENT))
+
+    async with session_maker() as session:
+        failed = await session.get(ExpenseImports, job.id)
+    assert (failed.status, failed.rows_done, failed.error) == (
+        ImportStatus.FAILED,
+        4,
+        "provider down",
+    )
+    assert len(await stored_expenses(session_maker)) == 2
+
+    # The answer for NETFLIX.COM learned before the failure is gone
+    analyzer.analyze_messages.side_effect = [
+        [{"description": "x", "amount": 1.0, "category": "Entertainment"}, None]
+    ]
+    resumed = await start_import(session_maker, user.id, COLUMNS, job.id)
+    importer = StatementImporter(analyzer, session_maker, resumed, "importer")
+    await importer.run(stream(STATEMENT))
+
+    expenses = await stored_expenses(session_maker)
+    assert [e.description for e in expenses] == [
+        "STARBUCKS COFFEE #123",
+        "NETFLIX.COM",
+        "NETFLIX.COM",
+    ]
+    assert (importer.rows, importer.job.rows_done, importer.job.created) == (2, 6, 3)
+
+
+@pytest.mark.asyncio
+async def test_llm_batches_are_bounded(session_maker, user, analyzer, monkeypatch):
+    """Test an import sends a bounded number of LLM batches at once."""
+    monkeypatch.setattr(settings, "llm_batch_size", 1)
+    monkeypatch.setattr(settings, "import_llm_concurrency", 2)
+    running = peak = 0
+
+    async def analyze_messages(
+        messages, telegram_id, raise_errors=False, prefilter=True
+    ):
+        nonlocal running, peak
+        assert raise_errors is True
+        assert prefilter is False
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return [{"description": "x", "amount": 1.0, "category": "Other"}]
+
+    analyzer.analyze_messages.side_effect = analyze_messages
+    statement = "Description,Amount\n" + "".join(
+        f"Shop {index},-1\n" for index in range(10)
+    )
+    job = await start_import(
+        session_maker,
+        user.id,
+        StatementColumns(description_column="Description", amount_column="Amount"),
+    )
+    importer = StatementImporter(analyzer, session_maker, job, "importer")
+    await importer.run(stream(statement))
+
+    assert analyzer.analyze_messages.await_count == 10
+    assert peak == 2
+    assert len(await stored_expenses(session_maker)) == 10
+
+
+@pytest.mark.asyncio
+async def test_unterminated_quote_fails_import(session_maker, user, analyzer):
+    """Test an import with a stray quote fails with a clear error."""
+    statement = 'Description,Amount\n"Shop,-1\n' + "Shop,-1\n" * MAX_RECORD_LENGTH
+    columns = StatementColumns(description_column="Description", amount_column="Amount")
+    job = await start_import(session_maker, user.id, columns)
+    importer = StatementImporter(analyzer, session_maker, job, "importer")
+
+    with pytest.raises(InvalidStatement):
+        await importer.run(stream(statement, 4096))
+
+    async with session_maker() as session:
+        failed = await session.get(ExpenseImports, job.id)
+    assert failed.status == ImportStatus.FAILED
+    assert failed.error.startswith("Unterminated quoted field")
+
+
+@pytest.mark.asyncio
+async def test_start_import_conflicts(session_maker, user, analyzer):
+    """Test only failed or stale imports with the same columns are resumed."""
+    with pytest.raises(LookupError):
+        await start_import(session_maker, user.id, COLUMNS, import_id=42)
+
+    job = await start_import(session_maker, user.id, COLUMNS)
+    with pytest.raises(ImportConflict):
+        await start_import(session_maker, user.id, COLUMNS, job.id)
+    assert (
+        await start_import(session_maker, user.id, COLUMNS, job.id, stale_after=0)
+    ).id == job.id
+
+    other = COLUMNS.model_copy(update={"delimiter": ";"})
+    with pytest.raises(ImportConflict):
+        await start_import(session_maker, user.id, other, job.id, stale_after=0)
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import tracing
+from app.db import instrument_engine
+from app.tracing import (
+    InMemoryExporter,
+    JsonFileExporter,
+    Trace,
+    Tracer,
+    create_exporter,
+    span,
+)
+
+
+@pytest.fixture
+def trace():
+    """A trace made current for the duration of the test"""
+    current = Trace("abc")
+    token = tracing._trace.set(current)
+    yield current
+    tracing._trace.reset(token)
+
+
+def test_span_outside_trace():
+    """Test spans are not recorded without a current trace."""
+    with span("nothing") as current:
+        assert current is None
+    assert tracing.start_span("nothing") is None
+
+
+def test_max_spans():
+    """Test a trace records its first spans and counts the others."""
+    trace = Trace(max_spans=2)
+    token = tracing._trace.set(trace)
+    with span("request"):
+        for _ in range(3):
+            with span("sql") as current:
+                pass
+    tracing._trace.reset(token)
+
+    assert [recorded.name for recorded in trace.spans] == ["request", "sql"]
+    assert current is None
+    assert trace.as_dict()["dropped_spans"] == 2
+
+
+def test_nested_spans(trace):
+    """Test nested spans record their parent and errors."""
+    with span("request") as root:
+        with span("stage", stage="llm") as child:
+            pass
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+        with pytest.raises(HTTPException):
+            with span("lookup"):
+                raise HTTPException(status_code=404)
+
+    spans = {recorded.name: recorded for recorded in trace.spans}
+    assert trace.root is root
+    assert child.parent_id == root.span_id
+    assert child.attributes == {"stage": "llm"}
+    assert spans["failing"].error == "ValueError"
+    # Client errors are answers, not failures
+    assert spans["lookup"].error is None
+    assert trace.failed is True
+    assert trace.as_dict()["spans"][1]["name"] == "stage"
+
+
+@pytest.mark.asyncio
+async def test_spans_in_tasks(trace):
+    """Test spans of tasks started in a span attach to it."""
+
+    async def work():
+        with span("task"):
+            await asyncio.sleep(0)
+
+    with span("request") as root:
+        await asyncio.gather(work(), work())
+        cancelled = asyncio.ensure_future(work())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    tasks = [recorded for recorded in trace.spans if recorded.name == "task"]
+    assert [task.parent_id for task in tasks] == [root.span_id] * 3
+    assert tasks[2].attributes == {"cancelled": True}
+    assert trace.failed is False
+
+
+@pytest.mark.asyncio
+async def test_sql_spans(trace, tmp_path):
+    """Test statements of an instrumented engine are recorded as spans."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'trace.db'}")
+    instrument_engine(engine)
+
+    with span("request") as root:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            with pytest.raises(Exception):
+                await conn.execute(text("SELECT * FROM missing"))
+    await engine.dispose()
+
+    sql = [recorded for recorded in trace.spans if recorded.name == "sql"]
+    assert [recorded.attributes["statement"] for recorded in sql] == [
+        "SELECT 1",
+        "SELECT * FROM missing",
+    ]
+    assert all(recorded.parent_id == root.span_id for recorded in sql)
+    assert sql[1].error == "OperationalError"
+
+
+def finished_trace(duration: float, error: str = None) -> Trace:
+    trace = Trace()
+    token = tracing._trace.set(trace)
+    with span("request") as root:
+        root.error = error
+    tracing._trace.reset(token)
+    root.end = root.start + duration
+    return trace
+
+
+def test_tail_sampling():
+    """Test slow and failed traces are always kept, others sampled."""
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, slow_threshold=1.0, sample_rate=0.5, rng=lambda: 0.9)
+
+    tracer.finish(finished_trace(0.01))
+    tracer.finish(finished_trace(2.0))
+    tracer.finish(finished_trace(0.01, error="HTTP 500"))
+    tracer.rng = lambda: 0.1
+    tracer.finish(finished_trace(0.01))
+
+    assert [trace["duration_ms"] for trace in exporter.traces] == [2000, 10, 10]
+    assert tracer.stats() == {"traces": 4, "kept": 3, "export_errors": 0}
+
+
+def test_export_errors_are_counted():
+    """Test a failing exporter does not fail the request."""
+
+    class Broken:
+        def export(self, trace):
+            raise OSError("disk full")
+
+    tracer = Tracer(Broken(), slow_threshold=0.0)
+    tracer.finish(finished_trace(0.01))
+
+    assert tracer.stats()["export_errors"] == 1
+
+
+def test_json_file_exporter(tmp_path):
+    """Test traces are appended as JSON lines."""
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonFileExporter(str(path))
+
+    exporter.export(finished_trace(0.01).as_dict())
+    exporter.export(finished_trace(0.02).as_dict())
+    exporter.flush()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["duration_ms"] for line in lines] == [10, 20]
+
+
+def test_json_file_exporter_is_bounded(tmp_path):
+    """Test traces are rejected while too many wait to be written."""
+    exporter = JsonFileExporter(str(tmp_path / "traces.jsonl"), max_pending=1)
+    # The writer is busy with a trace it cannot serialize yet
+    writing, written = threading.Event(), threading.Event()
+
+    class Slow:
+        def __str__(self):
+            writing.set()
+            written.wait()
+            return "slow"
+
+    exporter.export({"value": Slow()})
+    writing.wait()
+    exporter.export({"value": 1})
+    with pytest.raises(RuntimeError):
+        exporter.export({"value": 2})
+    written.set()
+    exporter.flush()
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert [json.loads(line)["value"] for line in lines] == ["slow", 1]
+
+
+def test_create_exporter(tmp_path):
+    """Test exporters are created by name or import path."""
+    assert isinstance(create_exporter("json", "t.jsonl"), JsonFileExporter)
+    assert isinstance(create_exporter("memory", ""), InMemoryExporter)
+    assert isinstance(
+        create_exporter("app.tracing:InMemoryExporter", ""), InMemoryExporter
+    )
+    with pytest.raises(ValueError):
+        create_exporter("zipkin", "")
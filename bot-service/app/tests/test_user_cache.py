@@ -0,0 +1,60 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.models.users import Users
+from app.user_cache import UserCache
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_lookup_caches_users():
+    """Test a cached user is returned without loading it again."""
+    cache = UserCache(maxsize=10, ttl=60, negative_ttl=1)
+    load = AsyncMock(return_value=Users(id=1, telegram_id="john"))
+
+    first = await cache.lookup("john", load)
+    second = await cache.lookup("john", load)
+
+    assert first is second
+    load.assert_awaited_once()
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+async def test_lookup_caches_unknown_users_briefly():
+    """Test unknown users are cached with the negative TTL."""
+    cache = UserCache(maxsize=10, ttl=60, negative_ttl=1)
+    now = [0.0]
+    cache.entries.clock = lambda: now[0]
+    load = AsyncMock(return_value=None)
+
+    assert await cache.lookup("ghost", load) is None
+    assert await cache.lookup("ghost", load) is None
+    assert load.await_count == 1
+
+    now[0] = 2
+    assert await cache.lookup("ghost", load) is None
+    assert load.await_count == 2
+
+
+async def test_invalidate():
+    """Test invalidated entries are loaded again."""
+    cache = UserCache(maxsize=10, ttl=60, negative_ttl=60)
+    load = AsyncMock(side_effect=[None, Users(id=1, telegram_id="john")])
+
+    assert await cache.lookup("john", load) is None
+    cache.invalidate("john")
+
+    assert (await cache.lookup("john", load)).id == 1
+
+
+async def test_disabled():
+    """Test a zero size disables caching."""
+    cache = UserCache(maxsize=0, ttl=60, negative_ttl=60)
+    load = AsyncMock(return_value=Users(id=1, telegram_id="john"))
+
+    await cache.lookup("john", load)
+    await cache.lookup("john", load)
+
+    assert load.await_count == 2
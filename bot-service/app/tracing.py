@@ -0,0 +1,317 @@
+"""
+Per-request tracing with tail-based sampling.
+
+``TracingMiddleware`` starts a trace for every HTTP request, with the trace
+id taken from the ``TRACING_HEADER`` request header or generated, and echoes
+the id in the response. The current trace and span live in context
+variables, so spans opened by tasks the request starts (hedged LLM calls,
+the shared call of coalesced analyses) attach to the right parent without
+threading anything through the call stack. Outside a trace, ``span`` costs
+one context variable read.
+
+Whether a trace is kept is decided once the request finished: slow and
+failed requests are always exported, the rest at ``sample_rate``. A trace
+records at most ``max_spans`` spans and counts the ones it dropped, so a
+request issuing thousands of SQL statements does not hold them all.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Protocol
+
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID = re.compile(r"^[0-9A-Za-z-]{1,64}$")
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def finish(self) -> None:
+        self.end = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Trace:
+    """Spans recorded while serving one request, up to ``max_spans``."""
+
+    def __init__(self, trace_id: Optional[str] = None, max_spans: int = 1000):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    @property
+    def failed(self) -> bool:
+        return any(span.error for span in self.spans)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3) if self.root else 0.0,
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": round((span.start - self.origin) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "attributes": span.attributes,
+                    "error": span.error,
+                }
+                for span in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """
+    Open a span under the current one without making it current, for
+    operations timed by callbacks (SQL statements); call ``finish`` on it.
+    Returns None outside a trace or once it holds ``max_spans`` spans.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return None
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped_spans += 1
+        return None
+    parent = _span.get()
+    span = Span(name, parent.span_id if parent else None, attributes)
+    trace.spans.append(span)
+    return span
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record the block as a child of the current span, if there is a trace."""
+    current = start_span(name, **attributes)
+    if current is None:
+        yield None
+        return
+    token = _span.set(current)
+    try:
+        yield current
+    except asyncio.CancelledError:
+        # Lost hedges and analyses of unknown users are cancelled on purpose
+        current.attributes["cancelled"] = True
+        raise
+    except BaseException as e:
+        # Client errors such as an unknown user are answers, not failures
+        if not isinstance(e, HTTPException) or e.status_code >= 500:
+            current.error = type(e).__name__
+        raise
+    finally:
+        current.finish()
+        _span.reset(token)
+
+
+class Exporter(Protocol):
+    def export(self, trace: Dict[str, Any]) -> None: ...
+
+
+class InMemoryExporter:
+    """Keeps the last ``maxlen`` exported traces, for tests and debugging."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.traces: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        self.traces.append(trace)
+
+
+class JsonFileExporter:
+    """
+    Appends one JSON line per trace to ``path`` from a daemon thread, so a
+    slow disk never blocks the event loop. At most ``max_pending`` traces
+    wait to be written; ``export`` raises when they are all taken, which
+    the tracer counts as an export error.
+    """
+
+    def __init__(self, path: str, max_pending: int = 1000):
+        self.path = path
+        self._pending: "queue.Queue[Dict[str, Any]]" = queue.Queue(max_pending)
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write, name="trace-writer", daemon=True
+            )
+            self._writer.start()
+        try:
+            self._pending.put_nowait(trace)
+        except queue.Full:
+            raise RuntimeError("Too many traces waiting to be written") from None
+
+    def flush(self) -> None:
+        """Wait until every exported trace is written."""
+        self._pending.join()
+
+    def _write(self) -> None:
+        while True:
+            traces = [self._pending.get()]
+            # Append whatever else is waiting with the same open
+            while not self._pending.empty():
+                traces.append(self._pending.get_nowait())
+            try:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(t, default=str) + "\n" for t in traces)
+            except Exception as e:
+                logger.error(f"Failed to write {len(traces)} traces: {e}")
+            finally:
+                for _ in traces:
+                    self._pending.task_done()
+
+
+def create_exporter(name: str, path: str) -> Exporter:
+    """``json`` (to ``path``), ``memory`` or a ``package.module:factory`` path."""
+    if name == "json":
+        return JsonFileExporter(path)
+    if name == "memory":
+        return InMemoryExporter()
+    if ":" in name:
+        module, attribute = name.split(":", 1)
+        return getattr(importlib.import_module(module), attribute)()
+    raise ValueError(f"Unknown trace exporter: {name}")
+
+
+class Tracer:
+    """
+    Tail-based sampler in front of an exporter: traces of failed requests
+    or lasting at least ``slow_threshold`` seconds are always exported,
+    others with probability ``sample_rate``. The traces it is used for
+    record up to ``max_spans`` spans.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        slow_threshold: float,
+        sample_rate: float = 0.0,
+        rng: Callable[[], float] = random.random,
+        max_spans: int = 1000,
+    ):
+        self.exporter = exporter
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        self.rng = rng
+        self.traces = 0
+        self.kept = 0
+        self.export_errors = 0
+
+    def should_keep(self, trace: Trace) -> bool:
+        root = trace.root
+        return (
+            trace.failed
+            or (root is not None and root.duration >= self.slow_threshold)
+            or self.rng() < self.sample_rate
+        )
+
+    def finish(self, trace: Trace) -> None:
+        self.traces += 1
+        if not self.should_keep(trace):
+            return
+        self.kept += 1
+        try:
+            self.exporter.export(trace.as_dict())
+        except Exception as e:
+            self.export_errors += 1
+            logger.error(f"Failed to export trace {trace.trace_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "traces": self.traces,
+            "kept": self.kept,
+            "export_errors": self.export_errors,
+        }
+
+
+class TracingMiddleware:
+    """ASGI middleware running every HTTP request inside a trace."""
+
+    def __init__(self, app: ASGIApp, tracer: Tracer, header: str = "X-Trace-Id"):
+        self.app = app
+        self.tracer = tracer
+        self.header = header.lower().encode()
+
+    def _trace_id(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                trace_id = value.decode("latin-1")
+                return trace_id if TRACE_ID.match(trace_id) else None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(self._trace_id(scope), self.tracer.max_spans)
+        status = 500
+
+        async def send_with_trace_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((self.header, trace.trace_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _trace.set(trace)
+        try:
+            with span("http.request", method=scope["method"]) as root:
+                await self.app(scope, receive, send_with_trace_id)
+                route = scope.get("route")
+                root.attributes["route"] = getattr(route, "path", "unmatched")
+                root.attributes["status"] = status
+                if status >= 500:
+                    root.error = f"HTTP {status}"
+        finally:
+            _trace.reset(token)
+            self.tracer.finish(trace)
@@ -0,0 +1,48 @@
+"""In-process cache of telegram_id to user lookups."""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.cache import MISSING, TTLCache
+from app.models.users import Users
+from app.settings import settings
+
+
+class UserCache:
+    """
+    TTL cache in front of the ``telegram_id`` lookup done by every request.
+
+    Unknown telegram ids are cached too, with a short TTL, so a new user is
+    seen by other workers within ``negative_ttl`` seconds of being created.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def lookup(
+        self, telegram_id: str, load: Callable[[], Awaitable[Optional[Users]]]
+    ) -> Optional[Users]:
+        """Return the cached user, calling ``load`` on a miss."""
+        if self.entries.maxsize <= 0:
+            return await load()
+        user = self.entries.get(telegram_id)
+        if user is MISSING:
+            user = await load()
+            self.entries.set(telegram_id, user, ttl=None if user else self.negative_ttl)
+        return user
+
+    def invalidate(self, telegram_id: str) -> None:
+        self.entries.pop(telegram_id)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.entries.stats()
+
+
+user_cache = UserCache(
+    maxsize=settings.user_cache_size,
+    ttl=settings.user_cache_ttl,
+    negative_ttl=settings.user_cache_negative_ttl,
+)
@@ -0,0 +1,151 @@
+"""Per-stage cost of ``ExpenseAnalyzer``.
+
+Micro-benchmarks of each stage a message goes through (pre-filter, fast
+path, classifier, cache key, response parsing, validation) and of whole
+``analyze_message`` calls answered by the fake chat model, the analysis
+cache and the fast path. Reports nanoseconds per operation.
+
+    python -m benchmarks.analyzer --iterations 20000
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Callable, List
+
+from benchmarks.common import fake_llm, setup_environment, write_results
+
+setup_environment()
+
+from app.cache import AnalysisCache  # noqa: E402
+from app.classifier import CategoryClassifier  # noqa: E402
+from app.expense_analyzer import ExpenseAnalyzer  # noqa: E402
+from app.fast_parser import FastPathParser  # noqa: E402
+from app.prefilter import PreFilter  # noqa: E402
+
+MESSAGES = [
+    "hi there",
+    "gracias!",
+    "spent 25 on lunch",
+    "uber 12",
+    "groceries 85.50",
+    "paid twenty for parking",
+    "netflix 15 dollars",
+    "dinner with friends at the new place 45",
+    "birthday present for mom 60",
+    "random text without numbers",
+]
+
+LLM_RESPONSES = [
+    '{"is_expense": true, "description": "Lunch", "amount": 25, "category": "Food"}',
+    'Output: ```json\n{"is_expense": true, "description": "Dinner with friends", '
+    '"amount": 45.5, "category": "Food"}\n```',
+    '{"is_expense": false}',
+]
+
+EXPENSES = [
+    {"description": "Lunch", "amount": 25, "category": "Food"},
+    {"description": "  Uber home ", "amount": "12.50", "category": "transportation"},
+    {"description": "Gift", "amount": 60.0, "category": "Unknown"},
+]
+
+
+def measure(operation: Callable[[Any], Any], inputs: List[Any], iterations: int):
+    cycle = itertools.islice(itertools.cycle(inputs), iterations)
+    started = time.perf_counter()
+    for item in cycle:
+        operation(item)
+    return round((time.perf_counter() - started) / iterations * 1e9, 1)
+
+
+async def measure_async(operation, inputs: List[Any], iterations: int):
+    cycle = itertools.islice(itertools.cycle(inputs), iterations)
+    started = time.perf_counter()
+    for item in cycle:
+        await operation(item)
+    return round((time.perf_counter() - started) / iterations * 1e9, 1)
+
+
+def analyzer(**flags) -> ExpenseAnalyzer:
+    flags = {
+        "dev": True,
+        "fast_path": False,
+        "cache": False,
+        "admission": False,
+        "classifier": False,
+        **flags,
+    }
+    instance = ExpenseAnalyzer(**flags)
+    instance.llm = fake_llm()
+    return instance
+
+
+async def main(args) -> dict:
+    # Invalid categories and parse errors are logged on every iteration
+    logging.disable(logging.CRITICAL)
+    iterations = args.iterations
+    llm_iterations = max(1, iterations // 10)
+    prefilter = PreFilter()
+    fast_parser = FastPathParser()
+    classifier = CategoryClassifier(min_user_examples=1, min_global_examples=1)
+    for description, category in [
+        ("lunch", "Food"),
+        ("dinner with friends", "Food"),
+        ("uber home", "Transportation"),
+        ("netflix", "Entertainment"),
+    ]:
+        classifier.learn("bench", description, category)
+    cache = AnalysisCache("bench", maxsize=1000, ttl=60, negative_ttl=60)
+    plain = analyzer()
+
+    stages = {
+        "prefilter_ns": measure(prefilter.match, MESSAGES, iterations),
+        "fast_path_ns": measure(fast_parser.parse, MESSAGES, iterations),
+        "classifier_ns": measure(
+            lambda message: classifier.predict("bench", message), MESSAGES, iterations
+        ),
+        "cache_key_ns": measure(cache.key, MESSAGES, iterations),
+        "parse_llm_response_ns": measure(
+            plain._parse_llm_response, LLM_RESPONSES, iterations
+        ),
+        "validate_expense_data_ns": measure(
+            plain._validate_expense_data, EXPENSES, iterations
+        ),
+    }
+
+    expense_messages = [
+        message for message in MESSAGES if prefilter.match(message) is None
+    ]
+    cached = analyzer(cache=True)
+    fast = analyzer(fast_path=True)
+    calls = {
+        "analyze_message_llm_ns": await measure_async(
+            plain.analyze_message, expense_messages, llm_iterations
+        ),
+        "analyze_message_cached_ns": await measure_async(
+            cached.analyze_message, expense_messages, llm_iterations
+        ),
+        "analyze_message_fast_path_ns": await measure_async(
+            fast.analyze_message, ["uber 12", "coffee 3.50"], llm_iterations
+        ),
+    }
+    return {
+        "benchmark": "analyzer",
+        "params": vars(args),
+        "stages": stages,
+        "analyze_message": calls,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
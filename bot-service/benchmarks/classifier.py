@@ -0,0 +1,115 @@
+"""Accuracy and latency of the category classifier.
+
+Generates labelled descriptions from the fast-path keyword map mixed with
+filler words, learns them through ``CategoryClassifier.learn`` (split over
+a few users) and reports test-then-train accuracy, held-out accuracy and
+coverage at the confidence threshold, prediction latency and the size of
+the serialized model.
+
+    python -m benchmarks.classifier --examples 20000 --users 50
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.common import Timer, setup_environment, write_results
+
+setup_environment()
+
+from app.classifier import CategoryClassifier  # noqa: E402
+from app.fast_parser import DEFAULT_CATEGORY_KEYWORDS  # noqa: E402
+from app.settings import settings  # noqa: E402
+
+FILLERS = [
+    "with",
+    "friends",
+    "family",
+    "today",
+    "monthly",
+    "weekend",
+    "the",
+    "new",
+    "big",
+    "quick",
+    "downtown",
+    "office",
+]
+
+
+def examples(count: int, users: int, rng: random.Random):
+    categories = [
+        category
+        for category in settings.expense_categories
+        if category in DEFAULT_CATEGORY_KEYWORDS
+    ]
+    for _ in range(count):
+        category = rng.choice(categories)
+        words = [rng.choice(DEFAULT_CATEGORY_KEYWORDS[category])]
+        words += rng.sample(FILLERS, rng.randint(0, 3))
+        rng.shuffle(words)
+        yield str(rng.randrange(users)), " ".join(words), category
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--examples", type=int, default=20_000)
+    parser.add_argument("--holdout", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    train = list(examples(args.examples, args.users, rng))
+    holdout = list(examples(args.holdout, args.users, rng))
+    classifier = CategoryClassifier()
+
+    with Timer() as training:
+        for telegram_id, description, category in train:
+            classifier.learn(telegram_id, description, category)
+
+    correct = confident = confident_correct = 0
+    with Timer() as predicting:
+        for telegram_id, description, category in holdout:
+            prediction = classifier.predict(telegram_id, description)
+            if prediction is None:
+                continue
+            correct += prediction.category == category
+            if prediction.confidence >= classifier.threshold:
+                confident += 1
+                confident_correct += prediction.category == category
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "classifier.npz")
+        classifier.save(path)
+        model_bytes = os.path.getsize(path)
+
+    report = classifier.report()
+    write_results(
+        {
+            "examples": args.examples,
+            "users": args.users,
+            "train_examples_per_s": round(args.examples / training.elapsed),
+            "predict_us": round(predicting.elapsed / len(holdout) * 1e6, 1),
+            "test_then_train": {
+                "accuracy": report["accuracy"],
+                "confident_accuracy": report["confident_accuracy"],
+                "confident_coverage": report["confident_coverage"],
+            },
+            "holdout": {
+                "accuracy": round(correct / len(holdout), 4),
+                "confident_accuracy": (
+                    round(confident_correct / confident, 4) if confident else 0.0
+                ),
+                "confident_coverage": round(confident / len(holdout), 4),
+            },
+            "model_bytes": model_bytes,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
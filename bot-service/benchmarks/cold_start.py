@@ -0,0 +1,150 @@
+"""Cold start of a uvicorn worker: time to the first healthy ``/health`` and RSS.
+
+Each run starts ``app.main:app`` on a throwaway SQLite file and polls
+``/health`` every ``--poll-ms`` until it answers 200. The worker's resident
+memory is read from ``/proc`` (Linux only) when it first becomes healthy and
+again ``--settle`` seconds later, once the background preload of the LLM
+backend (``LLM_PRELOAD``) had time to finish. The service's own startup
+report from ``/stats`` is included for the last run.
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --env LLM_PRELOAD=false --env DEV=true
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.common import setup_environment, write_results
+
+setup_environment()
+
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.settings import settings  # noqa: E402
+
+SPAWN_ENV = {
+    "DEV": "false",
+    "LOG_LEVEL": "WARNING",
+    "EXPENSE_JOB_WORKERS": "0",
+}
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Current resident memory of ``pid`` in MB, None off Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def wait_until_healthy(
+    client: aiohttp.ClientSession, poll: float, timeout: float
+) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            async with client.get("/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(poll)
+    raise RuntimeError("The service did not become healthy")
+
+
+async def cold_start(args, env: Dict[str, str]) -> Dict[str, Any]:
+    """Start one worker and measure it until it is stopped."""
+    url = f"http://127.0.0.1:{args.port}"
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *[sys.executable, "-m", "uvicorn", "app.main:app"],
+        *["--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        async with aiohttp.ClientSession(
+            base_url=url,
+            headers={settings.api_key_header: settings.api_key_secret},
+        ) as client:
+            await wait_until_healthy(client, args.poll_ms / 1000, args.timeout)
+            healthy = time.perf_counter() - start
+            rss_healthy = rss_mb(process.pid)
+            await asyncio.sleep(args.settle)
+            async with client.get("/stats") as response:
+                startup = (await response.json()).get("startup")
+        return {
+            "healthy_s": round(healthy, 3),
+            "rss_healthy_mb": rss_healthy,
+            "rss_settled_mb": rss_mb(process.pid),
+            "startup": startup,
+        }
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+async def main(args) -> dict:
+    database_url = "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "cold.db"))
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    env = {
+        **os.environ,
+        **SPAWN_ENV,
+        "DATABASE_URL": database_url,
+        **dict(item.split("=", 1) for item in args.env),
+    }
+
+    runs: List[Dict[str, Any]] = []
+    for _ in range(args.runs):
+        runs.append(await cold_start(args, env))
+
+    def median(key: str) -> Optional[float]:
+        values = [run[key] for run in runs if run[key] is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    return {
+        "benchmark": "cold_start",
+        "params": vars(args),
+        "healthy_s": median("healthy_s"),
+        "healthy_s_min": min(run["healthy_s"] for run in runs),
+        "rss_healthy_mb": median("rss_healthy_mb"),
+        "rss_settled_mb": median("rss_settled_mb"),
+        "startup": runs[-1]["startup"],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--poll-ms", type=float, default=20.0)
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra settings of the spawned service",
+    )
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
@@ -0,0 +1,95 @@
+"""Shared helpers for the offline benchmarks."""
+
+import json
+import os
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+# Minimal settings so app modules can be imported without a .env file.
+BENCHMARK_ENV = {
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_DB": "bench",
+    "DATABASE_URL": "sqlite:///bench.db",
+    "OPENAI_API_KEY": "bench",
+    "HUGGINGFACEHUB_API_TOKEN": "bench",
+    "HUGGINGFACEHUB_MODEL": "bench",
+    "LOG_LEVEL": "WARNING",
+    "EXPENSE_CATEGORIES": '["Food","Transportation","Entertainment","Shopping","Bills","Healthcare","Other"]',
+    "API_KEY_HEADER": "X-API-Key",
+    "API_KEY_SECRET": "bench",
+}
+
+
+def setup_environment() -> None:
+    """Fill in missing settings; call before importing ``app`` modules."""
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def fake_answer(message: str) -> str:
+    """JSON answer of the fake LLMs: every message is a Food expense."""
+    amount = re.search(r"\d+(?:\.\d+)?", message)
+    return json.dumps(
+        {
+            "is_expense": True,
+            "description": message[:40],
+            "amount": float(amount.group()) if amount else 1.0,
+            "category": "Food",
+        }
+    )
+
+
+def fake_llm(latency_ms: float = 0.0, seed: int = 7):
+    """Deterministic chat model answering with ``fake_answer``."""
+    from benchmarks.fake_llm import FakeChatModel, constant_latency
+
+    return FakeChatModel(
+        lambda messages: fake_answer(messages[-1].content),
+        latency=constant_latency(latency_ms / 1000),
+        seed=seed,
+    )
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (ms) for a list of durations (s)."""
+    ordered = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "requests": len(ordered),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+    }
+
+
+def write_results(results: Dict[str, Any], output: Optional[str]) -> None:
+    """Print results as JSON and optionally store them in ``output``."""
+    payload = json.dumps(results, indent=2, default=str)
+    print(payload)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload + "\n")
+
+
+class Timer:
+    """Context manager measuring wall time with ``perf_counter``."""
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,124 @@
+"""Concurrent request throughput: blocking Session vs AsyncSession.
+
+Each simulated request awaits a fake LLM call, then lists the user's expenses,
+the way the expense routes do. The "sync" variant runs the query on a
+blocking ``Session`` inside the coroutine (the previous data path); the
+"async" variant uses ``AsyncSession``. ``--latency-ms`` adds a simulated
+database round trip on top of each query (blocking for sync, awaited for
+async) to model a networked Postgres; use 0 with a real ``--database-url``.
+
+    python -m benchmarks.db_throughput --requests 500 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import Timer, setup_environment, summarize, write_results
+
+setup_environment()
+
+from sqlalchemy import NullPool  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.db import async_database_url  # noqa: E402
+from app.models import Expenses, Users  # noqa: E402
+
+
+def seed(database_url: str, expenses: int) -> None:
+    engine = create_engine(database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Users(id=1, telegram_id="bench"))
+        session.add_all(
+            Expenses(user_id=1, description="Lunch", amount=10, category="Food")
+            for _ in range(expenses)
+        )
+        session.commit()
+    engine.dispose()
+
+
+async def run(handler, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - start)
+
+    with Timer() as timer:
+        await asyncio.gather(*(one() for _ in range(requests)))
+    return summarize(latencies, timer.elapsed)
+
+
+async def main(args) -> dict:
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        database_url = f"sqlite:///{path}"
+    seed(database_url, args.expenses)
+    latency = args.latency_ms / 1000
+    llm_latency = args.llm_ms / 1000
+    query = select(Expenses).where(Expenses.user_id == 1)
+
+    sync_engine = create_engine(database_url, pool_size=args.concurrency)
+
+    async def sync_handler():
+        await asyncio.sleep(llm_latency)
+        with Session(sync_engine) as session:
+            session.exec(query).all()
+            time.sleep(latency)
+
+    async_engine = create_async_engine(
+        async_database_url(database_url),
+        **(
+            {"poolclass": NullPool}
+            if database_url.startswith("sqlite")
+            else {"pool_size": args.concurrency}
+        ),
+    )
+
+    async def async_handler():
+        await asyncio.sleep(llm_latency)
+        async with AsyncSession(async_engine) as session:
+            (await session.exec(query)).all()
+            await asyncio.sleep(latency)
+
+    results = {
+        "benchmark": "db_throughput",
+        "params": vars(args) | {"database_url": database_url},
+        "sync_session": await run(sync_handler, args.requests, args.concurrency),
+        "async_session": await run(async_handler, args.requests, args.concurrency),
+    }
+    results["speedup"] = round(
+        results["async_session"]["throughput_rps"]
+        / results["sync_session"]["throughput_rps"],
+        2,
+    )
+    sync_engine.dispose()
+    await async_engine.dispose()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--expenses", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--llm-ms", type=float, default=20.0)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
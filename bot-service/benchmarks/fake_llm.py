@@ -0,0 +1,62 @@
+"""Local fake chat model with a configurable latency distribution."""
+
+import asyncio
+import math
+import random
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+
+def constant_latency(seconds: float) -> Callable[[random.Random], float]:
+    return lambda rng: seconds
+
+
+def lognormal_latency(median: float, sigma: float) -> Callable[[random.Random], float]:
+    """Latency with a long right tail, like the one of a hosted LLM API."""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+class FakeChatModel:
+    """
+    Stand-in for a LangChain chat model, answering after a sampled delay.
+
+    ``respond`` builds the answer text from the prompt messages, ``latency``
+    samples the delay in seconds and ``error_rate`` is the probability of
+    raising instead of answering. ``seed`` makes runs reproducible.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[List[BaseMessage]], str],
+        latency: Callable[[random.Random], float] = constant_latency(0.0),
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.respond = respond
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        self.calls += 1
+        delay = self.latency(self.rng)
+        failed = self.rng.random() < self.error_rate
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if failed:
+            raise RuntimeError("Fake provider error")
+        return AIMessage(content=self.respond(messages))
+
+    async def astream(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[AIMessage]:
+        answer = await self.ainvoke(messages, **kwargs)
+        for start in range(0, len(answer.content), 8):
+            yield AIMessage(content=answer.content[start : start + 8])
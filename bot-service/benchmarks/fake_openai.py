@@ -0,0 +1,217 @@
+"""Fake OpenAI-compatible chat completions server.
+
+Serves ``POST /v1/chat/completions``, plain and with ``"stream": true``,
+answering the last message with the fake LLM answer after a sampled time
+to first token and a fixed delay per streamed token. A fraction of the
+requests fail with 500 or 429 instead. Point the service at it with
+``OPENAI_BASE_URL=http://127.0.0.1:8081/v1`` and ``DEV=false``.
+
+    python -m benchmarks.fake_openai --port 8081 --llm-ms 800 --llm-sigma 0.5
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+from aiohttp import web
+
+from benchmarks.common import fake_answer, setup_environment
+from benchmarks.fake_llm import constant_latency, lognormal_latency
+
+setup_environment()
+
+
+TOKEN_CHARS = 4
+
+
+def latency(median_ms: float, sigma: float) -> Callable[[random.Random], float]:
+    """Constant latency, or lognormal around the median when ``sigma`` > 0."""
+    if sigma > 0 and median_ms > 0:
+        return lognormal_latency(median_ms / 1000, sigma)
+    return constant_latency(median_ms / 1000)
+
+
+class FakeOpenAIServer:
+    """
+    aiohttp app imitating the chat completions endpoint of the OpenAI API.
+
+    ``latency`` samples the time to first token in seconds, ``token_delay``
+    is added per token of the answer and ``error_rate``/``rate_limit_rate``
+    are the probabilities of answering 500/429. ``seed`` makes the sampled
+    delays and errors reproducible.
+    """
+
+    def __init__(
+        self,
+        latency: Callable[[random.Random], float] = constant_latency(0.0),
+        token_delay: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 7,
+    ):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.counts: Counter = Counter()
+        self.runner: web.AppRunner | None = None
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop; returns the API base URL."""
+        self.runner = web.AppRunner(self.application(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}/v1"
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.counts["requests"] += 1
+        delay = self.latency(self.rng)
+        outcome = self.rng.random()
+        if outcome < self.error_rate:
+            # Server errors take as long as answers, rate limits are immediate
+            await asyncio.sleep(delay)
+            return self._error(500, "server_error")
+        if outcome < self.error_rate + self.rate_limit_rate:
+            return self._error(429, "rate_limit_exceeded")
+
+        answer = fake_answer(str(body["messages"][-1]["content"]))
+        tokens = [
+            answer[start : start + TOKEN_CHARS]
+            for start in range(0, len(answer), TOKEN_CHARS)
+        ]
+        completion = {
+            "id": f"chatcmpl-{next(self.ids)}",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+        try:
+            await asyncio.sleep(delay)
+            if body.get("stream"):
+                return await self._stream(request, completion, tokens)
+            await asyncio.sleep(self.token_delay * len(tokens))
+        except (asyncio.CancelledError, ConnectionResetError):
+            # The client stopped reading, e.g. once the JSON object was complete
+            self.counts["cancelled"] += 1
+            raise
+        self.counts["completed"] += 1
+        return web.json_response(
+            {
+                **completion,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": self._usage(body, tokens),
+            }
+        )
+
+    async def _stream(
+        self, request: web.Request, completion: Dict[str, Any], tokens: List[str]
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": token} for token in tokens]
+        for index, delta in enumerate(deltas):
+            if index > 1:
+                await asyncio.sleep(self.token_delay)
+            await self._event(response, completion, delta, None)
+        await self._event(response, completion, {}, "stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        self.counts["streamed"] += 1
+        return response
+
+    @staticmethod
+    async def _event(response, completion, delta, finish_reason) -> None:
+        chunk = {
+            **completion,
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+    def _error(self, status: int, kind: str) -> web.Response:
+        self.counts[f"errors_{status}"] += 1
+        return web.json_response(
+            {"error": {"message": f"Fake {kind}", "type": kind, "code": kind}},
+            status=status,
+            headers={"Retry-After": "1"} if status == 429 else None,
+        )
+
+    @staticmethod
+    def _usage(body: Dict[str, Any], tokens: List[str]) -> Dict[str, int]:
+        prompt = sum(
+            len(str(message.get("content", ""))) // TOKEN_CHARS
+            for message in body["messages"]
+        )
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt + len(tokens),
+        }
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="Median TTFT")
+    parser.add_argument(
+        "--llm-sigma", type=float, default=0.0, help="Lognormal sigma, 0 = constant"
+    )
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def server_from_args(args) -> FakeOpenAIServer:
+    return FakeOpenAIServer(
+        latency=latency(args.llm_ms, args.llm_sigma),
+        token_delay=args.token_ms / 1000,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_server_arguments(parser)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    web.run_app(
+        server_from_args(arguments).application(),
+        host=arguments.host,
+        port=arguments.port,
+        access_log=None,
+    )
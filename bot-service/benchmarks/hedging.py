@@ -0,0 +1,87 @@
+"""Tail latency of LLM calls with and without hedging.
+
+Sends the same sequence of calls to two fake providers with a lognormal
+latency distribution, once always to the first provider and once through
+``LLMRouter``, and reports latency percentiles and the hedge rate.
+
+    python -m benchmarks.hedging --calls 2000 --median-ms 20 --sigma 1.0
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import setup_environment, summarize, write_results
+from benchmarks.fake_llm import FakeChatModel, lognormal_latency
+
+setup_environment()
+
+from app.llm_router import LLMRouter  # noqa: E402
+
+
+def providers(median: float, sigma: float, seed: int):
+    return [
+        (
+            f"fake{index}",
+            FakeChatModel(
+                lambda messages: '{"is_expense": false}',
+                latency=lognormal_latency(median, sigma),
+                seed=seed + index,
+            ),
+        )
+        for index in range(2)
+    ]
+
+
+async def run(call, calls: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def invoke(llm) -> str:
+    return (await llm.ainvoke([])).content
+
+
+async def main_async(args) -> dict:
+    median = args.median_ms / 1000
+    _, single = providers(median, args.sigma, args.seed)[0]
+    router = LLMRouter(
+        providers(median, args.sigma, args.seed),
+        hedge_budget=args.hedge_budget,
+        initial_hedge_delay=median * 3,
+    )
+    results = {
+        "single": await run(lambda: invoke(single), args.calls, args.concurrency),
+        "hedged": await run(lambda: router.call(invoke), args.calls, args.concurrency),
+    }
+    router_stats = router.stats()
+    results["hedged"]["hedge_rate"] = router_stats["hedge_rate"]
+    results["hedged"]["hedge_wins"] = router_stats["hedge_wins"]
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--median-ms", type=float, default=20.0)
+    parser.add_argument("--sigma", type=float, default=1.0)
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    args = parser.parse_args()
+    write_results(asyncio.run(main_async(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
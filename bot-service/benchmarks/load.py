@@ -0,0 +1,319 @@
+"""Load test of ``POST /v1/expenses/{telegram_id}`` on a running service.
+
+With ``--spawn`` the fake OpenAI server runs in this process and a single
+uvicorn worker of ``app.main:app`` is started against it, on a throwaway
+SQLite file or ``--database-url`` (tables are created if missing); the
+fast path, classifier and cache are off so every request reaches the LLM.
+Without it, ``--url`` must point at a service already configured with
+``OPENAI_BASE_URL``.
+
+Two load models:
+
+- closed loop (``--mode closed``): ``--users`` virtual users, each sending
+  its next request once the previous one is answered (plus ``--think-ms``);
+  throughput adapts to the service, so it finds its capacity.
+- open loop (``--mode open``): requests arrive at ``--rate`` per second
+  whatever the service does, so overload shows up as queueing and errors
+  instead of a lower request rate.
+
+Reports latency percentiles and throughput of successful requests, the
+error breakdown by status or exception, the peak of requests in flight,
+and DB pool and LLM admission saturation sampled from ``/stats``.
+
+    python -m benchmarks.load --spawn --mode closed --users 100 --llm-ms 800
+    python -m benchmarks.load --spawn --mode open --rate 40 --llm-sigma 0.5
+    python -m benchmarks.load --url http://localhost:8000 --mode open --rate 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks.common import Timer, setup_environment, summarize, write_results
+from benchmarks.fake_openai import (
+    FakeOpenAIServer,
+    add_server_arguments,
+    server_from_args,
+)
+
+setup_environment()
+
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.settings import settings  # noqa: E402
+
+MESSAGES = [
+    "dinner with friends {amount}",
+    "birthday present for mom {amount}",
+    "monthly gym membership {amount}",
+    "new running shoes {amount}",
+    "concert tickets for saturday {amount}",
+]
+# Spawned services answer every expense with the LLM
+SPAWN_ENV = {
+    "DEV": "false",
+    "FAST_PATH_ENABLED": "false",
+    "CLASSIFIER_ENABLED": "false",
+    "ANALYSIS_CACHE_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+class LoadRecorder:
+    """Latencies of successful requests, outcomes and requests in flight."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @asynccontextmanager
+    async def request(self) -> AsyncIterator[None]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def record(self, outcome: str, latency: float) -> None:
+        self.outcomes[outcome] += 1
+        if outcome == "200":
+            self.latencies.append(latency)
+
+
+class StatsSampler:
+    """Samples DB pool and admission counters from ``/stats`` periodically."""
+
+    def __init__(self, client: aiohttp.ClientSession, interval: float):
+        self.client = client
+        self.interval = interval
+        self.pool: List[Tuple[int, int]] = []
+        self.admission: List[Tuple[int, int]] = []
+        self.failures = 0
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with self.client.get("/stats") as response:
+                    stats = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.failures += 1
+            else:
+                pool = stats.get("db_pool") or {}
+                # Pools without their own connections report no size
+                if "size" in pool:
+                    capacity = pool["size"] + pool["max_overflow"]
+                    self.pool.append((pool["checked_out"], capacity))
+                admission = stats.get("admission")
+                if admission:
+                    self.admission.append((admission["active"], admission["queued"]))
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"samples": len(self.pool), "failures": self.failures}
+        if self.pool:
+            checked_out = [used for used, _ in self.pool]
+            capacity = self.pool[-1][1]
+            report["db_pool"] = {
+                "capacity": capacity,
+                "peak_checked_out": max(checked_out),
+                "mean_utilization": round(statistics.fmean(checked_out) / capacity, 3),
+                "saturated_samples": sum(used >= capacity for used in checked_out),
+            }
+        if self.admission:
+            report["admission"] = {
+                "peak_active": max(active for active, _ in self.admission),
+                "peak_queued": max(queued for _, queued in self.admission),
+                "mean_queued": round(
+                    statistics.fmean(queued for _, queued in self.admission), 2
+                ),
+            }
+        return report
+
+
+async def closed_loop(send, users: int, duration: float, think: float) -> None:
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int) -> None:
+        while time.perf_counter() < deadline:
+            await send(index)
+            index += users
+            if think:
+                await asyncio.sleep(think)
+
+    await asyncio.gather(*(user(index) for index in range(users)))
+
+
+async def open_loop(send, rate: float, duration: float) -> None:
+    tasks = set()
+    start = time.perf_counter()
+    for index in range(int(rate * duration)):
+        # Sleep until the scheduled arrival; late arrivals are sent at once
+        delay = start + index / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(send(index))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+async def create_users(client: aiohttp.ClientSession, count: int) -> None:
+    for index in range(count):
+        # Existing users make this fail, which is fine
+        async with client.post("/v1/users/", json={"telegram_id": f"load-{index}"}):
+            pass
+
+
+async def wait_until_healthy(client: aiohttp.ClientSession, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            async with client.get("/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError("The service did not become healthy")
+        await asyncio.sleep(0.2)
+
+
+@asynccontextmanager
+async def spawned_service(
+    args,
+) -> AsyncIterator[Tuple[str, Optional[FakeOpenAIServer]]]:
+    """Fake OpenAI server in this process and one uvicorn worker using it."""
+    if not args.spawn:
+        yield args.url, None
+        return
+
+    fake_openai = server_from_args(args)
+    database_url = args.database_url or "sqlite:///{}".format(
+        os.path.join(tempfile.mkdtemp(), "load.db")
+    )
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+
+    env = {
+        **os.environ,
+        **SPAWN_ENV,
+        "OPENAI_BASE_URL": await fake_openai.start(),
+        "DATABASE_URL": database_url,
+        "LLM_STREAMING_ENABLED": str(args.streaming).lower(),
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    process = await asyncio.create_subprocess_exec(
+        *[sys.executable, "-m", "uvicorn", "app.main:app", "--workers", "1"],
+        *["--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        yield f"http://127.0.0.1:{args.port}", fake_openai
+    finally:
+        process.terminate()
+        await process.wait()
+        await fake_openai.stop()
+
+
+async def main(args) -> dict:
+    recorder = LoadRecorder()
+    async with spawned_service(args) as (url, fake_openai):
+        async with aiohttp.ClientSession(
+            base_url=url,
+            headers={settings.api_key_header: settings.api_key_secret},
+            # The driver must not be the bottleneck
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=args.timeout),
+        ) as client:
+            await wait_until_healthy(client, timeout=30)
+            await create_users(client, args.telegram_users)
+
+            async def send(index: int) -> None:
+                telegram_id = f"load-{index % args.telegram_users}"
+                message = MESSAGES[index % len(MESSAGES)].format(amount=index % 500 + 1)
+                async with recorder.request():
+                    start = time.perf_counter()
+                    try:
+                        async with client.post(
+                            f"/v1/expenses/{telegram_id}", json={"message": message}
+                        ) as response:
+                            await response.read()
+                            outcome = str(response.status)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        outcome = type(e).__name__
+                    recorder.record(outcome, time.perf_counter() - start)
+
+            sampler = StatsSampler(client, args.sample_interval)
+            sampling = asyncio.create_task(sampler.run())
+            with Timer() as timer:
+                if args.mode == "open":
+                    await open_loop(send, args.rate, args.duration)
+                else:
+                    await closed_loop(
+                        send, args.users, args.duration, args.think_ms / 1000
+                    )
+            sampling.cancel()
+
+    sent = sum(recorder.outcomes.values())
+    results = {
+        "benchmark": "load",
+        "params": vars(args) | {"url": url},
+        "sent": sent,
+        "offered_rps": round(sent / timer.elapsed, 2),
+        "success": summarize(recorder.latencies, timer.elapsed),
+        "outcomes": dict(recorder.outcomes),
+        "error_rate": round(1 - recorder.outcomes["200"] / sent, 4) if sent else 0.0,
+        "peak_in_flight": recorder.peak_in_flight,
+        "saturation": sampler.report(),
+    }
+    if fake_openai:
+        results["fake_openai"] = fake_openai.stats()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--spawn", action="store_true", help="Start the service and fake OpenAI"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Spawned service")
+    parser.add_argument("--database-url", default=None, help="Spawned service")
+    parser.add_argument("--streaming", action="store_true", help="Spawned service")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra settings of the spawned service",
+    )
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--users", type=int, default=50, help="Closed loop")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Closed loop")
+    parser.add_argument("--rate", type=float, default=20.0, help="Open loop, req/s")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--telegram-users", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    add_server_arguments(parser)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
@@ -0,0 +1,137 @@
+"""Concurrent checkout latency and throughput of the DB pool profiles.
+
+Each simulated request checks out a connection, lists the user's expenses
+and holds the connection for ``--hold-ms`` more (the rest of a transaction),
+with ``--concurrency`` requests in flight. Every profile of
+``app.db.POOL_PROFILES`` (or those given with ``--profile``) gets its own
+engine built by ``engine_options``, so pool sizes, timeouts and pre-ping
+strategies are the ones the service would use. Reports request and checkout
+latency percentiles, and the waits, timeouts and new connections counted by
+the pool.
+
+On SQLite opening a connection is nearly free, which flatters the
+``pgbouncer`` profile; use ``--database-url`` with Postgres (or PgBouncer)
+to see the cost of a connection per checkout.
+
+    python -m benchmarks.pool_profiles --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import Timer, setup_environment, summarize, write_results
+
+setup_environment()
+
+from sqlalchemy import exc  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app import metrics  # noqa: E402
+from app.db import (  # noqa: E402
+    POOL_PROFILES,
+    async_database_url,
+    engine_options,
+    instrument_engine,
+    ping_idle_connections,
+)
+from app.models import Expenses  # noqa: E402
+from benchmarks.db_throughput import seed  # noqa: E402
+
+COUNTERS = {
+    "waits": metrics.DB_POOL_WAITS,
+    "timeouts": metrics.DB_POOL_TIMEOUTS,
+    "connects": metrics.DB_POOL_CONNECTS,
+}
+
+
+async def run_profile(name: str, database_url: str, args) -> dict:
+    profile = POOL_PROFILES[name]
+    engine = create_async_engine(
+        async_database_url(database_url), **engine_options(profile, database_url)
+    )
+    instrument_engine(engine)
+    if profile.pre_ping == "idle" and not profile.null_pool:
+        ping_idle_connections(engine, profile.pre_ping_idle)
+
+    query = select(Expenses).where(Expenses.user_id == 1)
+    hold = args.hold_ms / 1000
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, checkouts = [], []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with AsyncSession(engine) as session:
+                    await session.connection()
+                    checkouts.append(time.perf_counter() - start)
+                    (await session.exec(query)).all()
+                    await asyncio.sleep(hold)
+            except exc.TimeoutError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    before = {key: counter.value() for key, counter in COUNTERS.items()}
+    with Timer() as timer:
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+    await engine.dispose()
+
+    checkout = summarize(checkouts, timer.elapsed)
+    return {
+        "profile": profile._asdict(),
+        "requests": summarize(latencies, timer.elapsed),
+        "checkout": {
+            key: checkout[key] for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+        },
+        "errors": errors,
+        **{
+            key: int(counter.value() - before[key]) for key, counter in COUNTERS.items()
+        },
+    }
+
+
+async def main(args) -> dict:
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        database_url = f"sqlite:///{path}"
+    seed(database_url, args.expenses)
+
+    return {
+        "benchmark": "pool_profiles",
+        "params": vars(args) | {"database_url": database_url},
+        **{
+            name: await run_profile(name, database_url, args)
+            for name in args.profile or POOL_PROFILES
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=list(POOL_PROFILES),
+        help="Profiles to compare, all by default",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=20)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
@@ -0,0 +1,99 @@
+"""Per-message cost of the pre-filter.
+
+Runs the same message mix through the previous ``_is_obviously_not_expense``
+(a list of six patterns rebuilt and tried one by one on every call) and
+through the compiled ``PreFilter``, and reports nanoseconds per message and
+how many messages each one kept away from the LLM.
+
+    python -m benchmarks.prefilter --messages 100000
+"""
+
+import argparse
+import itertools
+import re
+
+from benchmarks.common import Timer, setup_environment, write_results
+
+setup_environment()
+
+from app.prefilter import PreFilter  # noqa: E402
+
+MESSAGES = [
+    "hi there",
+    "hola",
+    "buenas tardes",
+    "gracias!",
+    "thanks a lot",
+    "👍",
+    "ok",
+    "how are you",
+    "spent 25 on lunch",
+    "uber 12",
+    "groceries 85.50",
+    "paid twenty for parking",
+    "netflix 15 dollars",
+    "¿qué tal?",
+    "random text without numbers",
+    "history book 20",
+]
+
+
+def legacy_is_obviously_not_expense(message: str) -> bool:
+    """The previous implementation, kept for comparison."""
+    message_lower = message.lower().strip()
+
+    non_expense_patterns = [
+        r"^(hi|hello|hey|good morning|good afternoon|good evening)",
+        r"^(how are you|what\'s up|how\'s it going)",
+        r"^(thank you|thanks|thx)",
+        r"^(yes|no|ok|okay)",
+        r"^\?",
+        r"^(help|start|stop)",
+    ]
+
+    for pattern in non_expense_patterns:
+        if re.match(pattern, message_lower):
+            return True
+
+    if not re.search(r"\d", message):
+        return True
+
+    return False
+
+
+def measure(check, messages) -> dict:
+    filtered = 0
+    with Timer() as timer:
+        for message in messages:
+            if check(message):
+                filtered += 1
+    return {
+        "ns_per_message": round(timer.elapsed / len(messages) * 1e9, 1),
+        "elapsed_s": round(timer.elapsed, 4),
+        "filtered": filtered,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    args = parser.parse_args()
+
+    messages = list(itertools.islice(itertools.cycle(MESSAGES), args.messages))
+    prefilter = PreFilter()
+    results = {
+        "messages": args.messages,
+        "legacy": measure(legacy_is_obviously_not_expense, messages),
+        "prefilter": measure(lambda m: prefilter.match(m) is not None, messages),
+        "prefilter_rules": prefilter.stats.as_dict()["rules"],
+    }
+    results["speedup"] = round(
+        results["legacy"]["ns_per_message"] / results["prefilter"]["ns_per_message"],
+        2,
+    )
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
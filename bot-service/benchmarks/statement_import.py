@@ -0,0 +1,203 @@
+"""Rows per second of the bank statement import vs one message per row.
+
+Generates a statement of ``--rows`` debits and credits, where a
+``--keyword-share`` of the debits have a description the fast path
+keywords categorize and the rest cycle through ``--merchants`` unknown
+merchant names. The statement is streamed from a file into
+``StatementImporter`` against a throwaway SQLite file (or
+``--database-url``, tables are dropped and recreated; Postgres goes
+through ``COPY``). The LLM is a fake chat model answering packed prompts
+after ``--llm-ms``. The baseline analyzes the first ``--baseline-rows``
+rows one message at a time and commits each expense, the way
+``POST /v1/expenses/{telegram_id}`` would.
+
+    python -m benchmarks.statement_import --rows 100000 --merchants 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+
+from benchmarks.common import Timer, fake_answer, setup_environment, write_results
+from benchmarks.fake_llm import FakeChatModel, constant_latency
+
+setup_environment()
+
+from sqlalchemy import NullPool, func  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.db import async_database_url  # noqa: E402
+from app.expense_analyzer import ExpenseAnalyzer  # noqa: E402
+from app.models import Expenses, Users  # noqa: E402
+from app.models.expense_imports import StatementColumns  # noqa: E402
+from app.statement_import import StatementImporter, start_import  # noqa: E402
+
+TELEGRAM_ID = "bench"
+KEYWORD_DESCRIPTIONS = [
+    "STARBUCKS COFFEE #{n}",
+    "UBER *TRIP {n}",
+    "SHELL PARKING {n}",
+    "CINEMA CITY {n}",
+    "PHARMACY {n}",
+]
+COLUMNS = StatementColumns(
+    description_column="Description", amount_column="Amount", date_column="Date"
+)
+
+
+def respond(messages) -> str:
+    """Answer packed prompts with one ``fake_answer`` per message."""
+    content = messages[-1].content
+    if not content.startswith("["):
+        return fake_answer(content)
+    return json.dumps(
+        [
+            {"id": item["id"], **json.loads(fake_answer(item["message"]))}
+            for item in json.loads(content)
+        ]
+    )
+
+
+def write_statement(path: str, rows: int, merchants: int, keyword_share: float) -> None:
+    rng = random.Random(7)
+    with open(path, "w") as f:
+        f.write("Date,Description,Amount\n")
+        for index in range(rows):
+            day = f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}"
+            if index % 10 == 9:
+                f.write(f"{day},SALARY ACME,{rng.randint(1000, 3000)}.00\n")
+            elif rng.random() < keyword_share:
+                description = rng.choice(KEYWORD_DESCRIPTIONS).format(n=index % 97)
+                f.write(
+                    f"{day},{description},-{rng.randint(1, 200)}.{index % 100:02d}\n"
+                )
+            else:
+                merchant = f"MERCHANT {rng.randrange(merchants):05d} LTD"
+                f.write(f"{day},{merchant},-{rng.randint(1, 200)}.{index % 100:02d}\n")
+
+
+async def read_file(path: str, chunk_size: int = 65536):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+            await asyncio.sleep(0)
+
+
+def seed(database_url: str) -> None:
+    engine = create_engine(database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Users(id=1, telegram_id=TELEGRAM_ID))
+        session.commit()
+    engine.dispose()
+
+
+def analyzer(llm_ms: float) -> ExpenseAnalyzer:
+    analyzer = ExpenseAnalyzer(dev=True, cache=False, classifier=False)
+    analyzer.llm = FakeChatModel(respond, latency=constant_latency(llm_ms / 1000))
+    return analyzer
+
+
+async def count_expenses(maker) -> int:
+    async with maker() as session:
+        return (await session.exec(select(func.count()).select_from(Expenses))).one()
+
+
+async def run_import(maker, path: str, args) -> dict:
+    expense_analyzer = analyzer(args.llm_ms)
+    job = await start_import(maker, 1, COLUMNS)
+    importer = StatementImporter(
+        expense_analyzer, maker, job, TELEGRAM_ID, chunk_size=args.chunk_size
+    )
+    with Timer() as timer:
+        await importer.run(read_file(path))
+    return importer.response(timer.elapsed).model_dump() | {
+        "llm_calls": expense_analyzer.llm.calls
+    }
+
+
+async def run_line_by_line(maker, path: str, args) -> dict:
+    expense_analyzer = analyzer(args.llm_ms)
+    created = 0
+    with open(path) as f:
+        next(f)
+        lines = [next(f) for _ in range(args.baseline_rows)]
+    with Timer() as timer:
+        for line in lines:
+            _, description, amount = line.rstrip("\n").rsplit(",", 2)
+            if not amount.startswith("-"):
+                continue
+            result = await expense_analyzer.analyze_message(
+                f"{description} {amount[1:]}", TELEGRAM_ID
+            )
+            if result:
+                async with maker() as session:
+                    session.add(Expenses(user_id=1, **result))
+                    await session.commit()
+                created += 1
+    return {
+        "rows": len(lines),
+        "created": created,
+        "elapsed_s": round(timer.elapsed, 3),
+        "rows_per_second": round(len(lines) / timer.elapsed, 1),
+        "llm_calls": expense_analyzer.llm.calls,
+    }
+
+
+async def main(args) -> dict:
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    database_url = (
+        args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    )
+    path = os.path.join(directory, "statement.csv")
+    write_statement(path, args.rows, args.merchants, args.keyword_share)
+    seed(database_url)
+
+    engine = create_async_engine(
+        async_database_url(database_url),
+        **({"poolclass": NullPool} if database_url.startswith("sqlite") else {}),
+    )
+    maker = async_sessionmaker(
+        engine, class_=AsyncSession, autoflush=True, expire_on_commit=False
+    )
+    results = {
+        "benchmark": "statement_import",
+        "params": vars(args) | {"database_url": database_url},
+        "statement_bytes": os.path.getsize(path),
+        "import": await run_import(maker, path, args),
+        "stored": await count_expenses(maker),
+        "line_by_line": await run_line_by_line(maker, path, args),
+    }
+    results["speedup"] = round(
+        results["import"]["rows_per_second"]
+        / results["line_by_line"]["rows_per_second"],
+        1,
+    )
+    await engine.dispose()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--merchants", type=int, default=200)
+    parser.add_argument("--keyword-share", type=float, default=0.5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--llm-ms", type=float, default=50.0)
+    parser.add_argument("--baseline-rows", type=int, default=200)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    write_results(asyncio.run(main(arguments)), arguments.output)
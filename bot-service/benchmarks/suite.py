@@ -0,0 +1,164 @@
+"""Benchmark suite with regression checks against a stored baseline.
+
+Runs the analyzer micro-benchmarks and the API benchmark on SQLite (and on
+Postgres with ``--database-url``), stores the results as JSON and compares
+every latency (``*_ns``, ``*_ms``) and throughput (``*_rps``) metric with
+the baseline. A metric regresses when it is worse than the baseline by more
+than its threshold; the exit status is 1 if any does.
+
+Thresholds live in the baseline file as fnmatch patterns over the metric
+names, the first matching pattern wins:
+
+    {"thresholds": {"api_*.p99_ms": 1.0, "*": 0.25}, "results": {...}}
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --update-baseline
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from benchmarks import analyzer, api
+from benchmarks.common import write_results
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Tail latencies of concurrent runs are noisy, averages and medians less so
+DEFAULT_THRESHOLDS = {"*.p95_ms": 0.5, "*.p99_ms": 1.0, "*": 0.25}
+LOWER_IS_BETTER = ("_ns", "_ms")
+HIGHER_IS_BETTER = ("_rps",)
+
+
+async def run_suite(args) -> Dict[str, Any]:
+    results = {
+        "analyzer": await analyzer.main(
+            analyzer.parse_args(["--iterations", str(args.iterations)])
+        ),
+        "api_sqlite": await api.main(
+            api.parse_args(["--requests", str(args.requests)])
+        ),
+    }
+    if args.database_url:
+        results["api_postgres"] = await api.main(
+            api.parse_args(
+                ["--requests", str(args.requests), "--database-url", args.database_url]
+            )
+        )
+    return results
+
+
+def metrics(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten results into ``a.b.c`` names, keeping comparable metrics only."""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        if key == "params":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(metrics(value, f"{name}."))
+        elif isinstance(value, (int, float)) and key.endswith(
+            LOWER_IS_BETTER + HIGHER_IS_BETTER
+        ):
+            flat[name] = float(value)
+    return flat
+
+
+def threshold_for(name: str, thresholds: Dict[str, float]) -> float:
+    for pattern, threshold in thresholds.items():
+        if fnmatch.fnmatch(name, pattern):
+            return threshold
+    return DEFAULT_THRESHOLDS["*"]
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    thresholds: Dict[str, float],
+) -> List[Dict[str, Any]]:
+    """One row per metric present in both runs, flagged when it regressed."""
+    current = metrics(results)
+    rows = []
+    for name, before in metrics(baseline).items():
+        if name not in current or before == 0:
+            continue
+        after = current[name]
+        change = (after - before) / before
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        threshold = threshold_for(name, thresholds)
+        rows.append(
+            {
+                "metric": name,
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "threshold": threshold,
+                "regression": worse > threshold,
+            }
+        )
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    width = max((len(row["metric"]) for row in rows), default=10)
+    for row in rows:
+        status = "REGRESSION" if row["regression"] else "ok"
+        print(
+            f"{row['metric']:<{width}}  {row['baseline']:>14.3f}  "
+            f"{row['current']:>14.3f}  {row['change']:>+8.1%}  {status}",
+            file=sys.stderr,
+        )
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Also run on Postgres")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of comparing",
+    )
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_suite(args))
+    baseline = load_baseline(args.baseline)
+
+    if args.update_baseline:
+        thresholds = baseline["thresholds"] if baseline else DEFAULT_THRESHOLDS
+        with open(args.baseline, "w") as f:
+            json.dump({"thresholds": thresholds, "results": results}, f, indent=2)
+            f.write("\n")
+        write_results(results, args.output)
+        return 0
+
+    if baseline is None:
+        print(f"No baseline at {args.baseline}", file=sys.stderr)
+        write_results(results, args.output)
+        return 0
+
+    rows = compare(results, baseline["results"], baseline["thresholds"])
+    print_report(rows)
+    regressions = [row for row in rows if row["regression"]]
+    write_results({"results": results, "regressions": regressions}, args.output)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())